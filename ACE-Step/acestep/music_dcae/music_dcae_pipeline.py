@@ -352,6 +352,132 @@ class MusicDCAE(ModelMixin, ConfigMixin, FromOriginalModelMixin):
 
         return final_output_sr, processed_pred_wavs
 
+    @torch.no_grad()
+    def decode_overlap_blocks(self, latent, audio_length=None):
+        """
+        Streaming variant of decode_overlap for a single latent (C, H, W_latent).
+
+        Uses the same DCAE and vocoder windows, but yields each finished
+        (C_audio, Samples) float32 CPU block at the native 44.1 kHz rate as soon
+        as its crossfade is resolved, instead of concatenating the whole track.
+        Only the mel spectrogram and one vocoder window are kept in memory.
+        """
+        DCAE_LATENT_TO_MEL_STRIDE = 8
+        VOCODER_AUDIO_SAMPLES_PER_MEL_FRAME = 512
+
+        dcae_win_len_latent = 512
+        dcae_anchor_offset = dcae_win_len_latent // 4
+        dcae_anchor_hop = dcae_win_len_latent // 2
+        dcae_mel_overlap_len = dcae_win_len_latent * 8 // 4
+
+        vocoder_win_len_audio = 512 * 512
+        vocoder_overlap_len_audio = 1024
+        vocoder_hop_len_audio = vocoder_win_len_audio - 2 * vocoder_overlap_len_audio
+        vocoder_input_mel_frames_per_block = vocoder_win_len_audio // VOCODER_AUDIO_SAMPLES_PER_MEL_FRAME
+
+        crossfade_len_audio = 128
+        cf_win_tail = torch.linspace(1, 0, crossfade_len_audio, device=self.device).unsqueeze(0).unsqueeze(0)
+        cf_win_head = torch.linspace(0, 1, crossfade_len_audio, device=self.device).unsqueeze(0).unsqueeze(0)
+
+        latent = latent.to(self.device)
+        current_latent = (latent / self.scale_factor + self.shift_factor).unsqueeze(0)
+        latent_len = current_latent.shape[3]
+        if latent_len == 0:
+            return
+
+        # 1. DCAE: Latent to Mel Spectrogram (Overlapped) - identical to decode_overlap
+        mels_segments = []
+        dcae_anchors = list(range(dcae_anchor_offset, latent_len - dcae_anchor_offset, dcae_anchor_hop))
+        if not dcae_anchors:
+            dcae_anchors = [dcae_anchor_offset]
+        for i, anchor in enumerate(dcae_anchors):
+            win_start_idx = max(0, anchor - dcae_anchor_offset)
+            win_end_idx = min(latent_len, win_start_idx + dcae_win_len_latent)
+            dcae_input_segment = current_latent[:, :, :, win_start_idx:win_end_idx]
+            if dcae_input_segment.shape[3] == 0: continue
+
+            mel_output_full = self.dcae.decoder(dcae_input_segment)
+
+            is_first = (i == 0)
+            is_last = (i == len(dcae_anchors) - 1)
+            if is_first and is_last:
+                true_mel_content_len = dcae_input_segment.shape[3] * DCAE_LATENT_TO_MEL_STRIDE
+                mel_to_keep = mel_output_full[:, :, :, :min(true_mel_content_len, mel_output_full.shape[3])]
+            elif is_first:
+                mel_to_keep = mel_output_full[:, :, :, :-dcae_mel_overlap_len]
+            elif is_last:
+                mel_to_keep = mel_output_full[:, :, :, dcae_mel_overlap_len:]
+            else:
+                mel_to_keep = mel_output_full[:, :, :, dcae_mel_overlap_len:-dcae_mel_overlap_len]
+            if mel_to_keep.shape[3] > 0:
+                mels_segments.append(mel_to_keep)
+
+        if not mels_segments:
+            return
+        concatenated_mels = torch.cat(mels_segments, dim=3)
+        del mels_segments
+        concatenated_mels = concatenated_mels * 0.5 + 0.5
+        concatenated_mels = concatenated_mels * (self.max_mel_value - self.min_mel_value) + self.min_mel_value
+        mel_total_frames = concatenated_mels.shape[3]
+
+        # Same truncation rule as decode_overlap, at the native sample rate
+        max_possible_len = latent_len * DCAE_LATENT_TO_MEL_STRIDE * VOCODER_AUDIO_SAMPLES_PER_MEL_FRAME
+        remaining = max_possible_len if audio_length is None else min(audio_length, max_possible_len)
+
+        def _emit(block):
+            nonlocal remaining
+            block = block[:, :, :remaining]
+            remaining -= block.shape[2]
+            return block.squeeze(1).float().cpu()
+
+        # 2. Vocoder: Mel Spectrogram to Waveform (Overlapped), one window at a time
+        mel_block = concatenated_mels[0, :, :, :vocoder_input_mel_frames_per_block]
+        if 0 < mel_block.shape[2] < vocoder_input_mel_frames_per_block:
+            pad_len = vocoder_input_mel_frames_per_block - mel_block.shape[2]
+            mel_block = torch.nn.functional.pad(mel_block, (0, pad_len), mode='constant', value=0)
+
+        pending = self.vocoder.decode(mel_block)[:, :, :-vocoder_overlap_len_audio]
+
+        p_audio_samples = vocoder_hop_len_audio
+        conceptual_total_audio_len_native_sr = mel_total_frames * VOCODER_AUDIO_SAMPLES_PER_MEL_FRAME
+
+        while p_audio_samples < conceptual_total_audio_len_native_sr and remaining > 0:
+            mel_frame_start = p_audio_samples // VOCODER_AUDIO_SAMPLES_PER_MEL_FRAME
+            mel_frame_end = mel_frame_start + vocoder_input_mel_frames_per_block
+            if mel_frame_start >= mel_total_frames: break
+
+            mel_block = concatenated_mels[0, :, :, mel_frame_start:min(mel_frame_end, mel_total_frames)]
+            if mel_block.shape[2] == 0: break
+            if mel_block.shape[2] < vocoder_input_mel_frames_per_block:
+                pad_len = vocoder_input_mel_frames_per_block - mel_block.shape[2]
+                mel_block = torch.nn.functional.pad(mel_block, (0, pad_len), mode='constant', value=0)
+
+            new_audio_win = self.vocoder.decode(mel_block)
+
+            # Everything before the crossfade region is final → hand it out now
+            actual_cf_len = min(crossfade_len_audio, pending.shape[2], new_audio_win.shape[2] - (vocoder_overlap_len_audio - crossfade_len_audio))
+            if actual_cf_len > 0:
+                if pending.shape[2] > actual_cf_len:
+                    yield _emit(pending[:, :, :-actual_cf_len])
+                tail_part = pending[:, :, -actual_cf_len:]
+                head_part = new_audio_win[:, :, vocoder_overlap_len_audio - actual_cf_len : vocoder_overlap_len_audio]
+                pending = tail_part * cf_win_tail[:,:,:actual_cf_len] + head_part * cf_win_head[:,:,:actual_cf_len]
+            else:
+                yield _emit(pending)
+                pending = pending[:, :, :0]
+
+            is_final_append = (p_audio_samples + vocoder_hop_len_audio >= conceptual_total_audio_len_native_sr)
+            if is_final_append:
+                segment_to_append = new_audio_win[:, :, vocoder_overlap_len_audio:]
+            else:
+                segment_to_append = new_audio_win[:, :, vocoder_overlap_len_audio:-vocoder_overlap_len_audio]
+            pending = torch.cat([pending, segment_to_append], dim=2)
+
+            p_audio_samples += vocoder_hop_len_audio
+
+        if pending.shape[2] > 0 and remaining > 0:
+            yield _emit(pending)
+
     def forward(self, audios, audio_lengths=None, sr=None):
         latents, latent_lengths = self.encode(
             audios=audios, audio_lengths=audio_lengths, sr=sr
@@ -138,6 +138,8 @@ class ACEStepPipeline:
         self.cpu_offload = cpu_offload
         self.quantized = quantized
         self.overlapped_decode = overlapped_decode
+        # Optional object with get(audio_path, encode_fn) -> latents, used to skip re-encoding source audio
+        self.latents_cache = None
 
     def cleanup_memory(self):
         """Clean up GPU and CPU memory to prevent VRAM overflow during multiple generations."""
@@ -1357,6 +1359,16 @@ class ACEStepPipeline:
         output_audio_paths = []
         bs = latents.shape[0]
         pred_latents = latents
+        if self.overlapped_decode and target_wav_duration_second > 48 and format == "wav":
+            # Long-form: write each overlapped decode window to disk as it is finished
+            for i in tqdm(range(bs)):
+                output_audio_path = self.save_wav_file_streaming(
+                    self.music_dcae.decode_overlap_blocks(pred_latents[i]),
+                    i,
+                    save_path=save_path,
+                )
+                output_audio_paths.append(output_audio_path)
+            return output_audio_paths
         with torch.no_grad():
             if self.overlapped_decode and target_wav_duration_second > 48:
                 _, pred_wavs = self.music_dcae.decode_overlap(pred_latents, sr=sample_rate)
@@ -1402,6 +1414,30 @@ class ACEStepPipeline:
         )
         return output_path_wav
 
+    def save_wav_file_streaming(self, wav_blocks, idx, save_path=None, sample_rate=44100):
+        """Write an iterable of (C, Samples) blocks to one WAV without holding the full track.
+
+        Blocks come straight from the vocoder, so the file is written at its native 44.1 kHz.
+        """
+        import soundfile as sf
+
+        if save_path is None:
+            base_path = "./outputs"
+            ensure_directory_exists(base_path)
+            output_path_wav = f"{base_path}/output_{time.strftime('%Y%m%d%H%M%S')}_{idx}.wav"
+        else:
+            ensure_directory_exists(os.path.dirname(save_path))
+            if os.path.isdir(save_path):
+                output_path_wav = os.path.join(save_path, f"output_{time.strftime('%Y%m%d%H%M%S')}_{idx}.wav")
+            else:
+                output_path_wav = save_path
+
+        logger.info(f"Streaming audio to {output_path_wav} @ {sample_rate}Hz")
+        with sf.SoundFile(output_path_wav, "w", samplerate=sample_rate, channels=2, subtype="FLOAT") as f:
+            for block in wav_blocks:
+                f.write(block.numpy().T)
+        return output_path_wav
+
     @cpu_offload("music_dcae")
     def infer_latents(self, input_audio_path):
         if input_audio_path is None:
@@ -1412,6 +1448,12 @@ class ACEStepPipeline:
         latents, _ = self.music_dcae.encode(input_audio, sr=sr)
         return latents
 
+    def infer_latents_cached(self, input_audio_path):
+        if input_audio_path is None or self.latents_cache is None:
+            return self.infer_latents(input_audio_path)
+        latents = self.latents_cache.get(input_audio_path, self.infer_latents)
+        return latents.to(device=self.device, dtype=self.dtype)
+
     def load_lora(self, lora_name_or_path, lora_weight):
         if (lora_name_or_path != self.lora_path or lora_weight != self.lora_weight) and lora_name_or_path != "none":
             if not os.path.exists(lora_name_or_path):
@@ -1555,7 +1597,7 @@ class ACEStepPipeline:
             assert os.path.exists(
                 src_audio_path
             ), f"src_audio_path {src_audio_path} does not exist"
-            src_latents = self.infer_latents(src_audio_path)
+            src_latents = self.infer_latents_cached(src_audio_path)
         
         ref_latents = None
         if ref_audio_input is not None and audio2audio_enable:
@@ -1563,7 +1605,7 @@ class ACEStepPipeline:
             assert os.path.exists(
                 ref_audio_input
             ), f"ref_audio_input {ref_audio_input} does not exist"
-            ref_latents = self.infer_latents(ref_audio_input)
+            ref_latents = self.infer_latents_cached(ref_audio_input)
 
         if task == "edit":
             texts = [edit_target_prompt]
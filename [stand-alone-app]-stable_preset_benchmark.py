@@ -0,0 +1,106 @@
+# [stand-alone-app]-stable_preset_benchmark.py
+"""
+Stable Audio preset benchmark – CLAP score vs wall time for every preset/scheduler.
+
+Runs in-process (close the main app first so the GPU is free):
+    python "[stand-alone-app]-stable_preset_benchmark.py" --device 0 --length 10 --seeds 3
+
+Every preset renders the same prompts with the same seeds, so the CLAP column is a
+fair comparison. Results are printed as a table and written to
+output_tts/stable_preset_benchmark.json.
+"""
+
+import argparse
+import json
+import time
+
+import torch
+
+from config import OUTPUT_DIR
+from models import stable_audio
+from models.stable_audio import PRESETS, SCHEDULERS, clap_score, generate_audio, load_stable_audio, unload_stable_audio
+
+PROMPTS = [
+    "heavy rain on a tin roof with distant thunder",
+    "wooden door creaking open slowly",
+    "sci-fi laser gun shot with metallic echo",
+    "crowd cheering in a stadium",
+    "calm acoustic guitar loop, 90 bpm",
+]
+
+
+def run_case(name, scheduler, steps, prompts, seeds, length):
+    walls, scores = [], []
+    for prompt in prompts:
+        for seed in seeds:
+            if stable_audio.pipe.device.type == "cuda":
+                torch.cuda.synchronize(stable_audio.pipe.device)
+            t0 = time.perf_counter()
+            results, _, _ = generate_audio(
+                prompt=prompt,
+                steps=steps,
+                length_sec=length,
+                seed=seed,
+                num_waveforms_per_prompt=1,
+                scheduler=scheduler,
+            )
+            if stable_audio.pipe.device.type == "cuda":
+                torch.cuda.synchronize(stable_audio.pipe.device)
+            walls.append(time.perf_counter() - t0)
+            scores.append(clap_score(results[0]["audio_np"], prompt))
+    return {
+        "name": name,
+        "scheduler": scheduler,
+        "steps": steps,
+        "clap_mean": round(sum(scores) / len(scores), 4),
+        "clap_min": round(min(scores), 4),
+        "wall_mean": round(sum(walls) / len(walls), 3),
+        "rtf": round(sum(walls) / len(walls) / length, 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stable Audio preset benchmark")
+    ap.add_argument("--device", default="0", help='GPU index or "cpu"')
+    ap.add_argument("--length", type=float, default=10.0, help="Clip length in seconds")
+    ap.add_argument("--seeds", type=int, default=3, help="Seeds per prompt")
+    ap.add_argument("--extra-steps", default="25,30,40",
+                    help="Also try every non-default scheduler at these step counts")
+    args = ap.parse_args()
+
+    ok, msg = load_stable_audio(args.device)
+    if not ok:
+        raise SystemExit(f"Load failed: {msg}")
+
+    seeds = list(range(args.seeds))
+    cases = [(name, p["scheduler"], p["steps"]) for name, p in PRESETS.items()]
+    for steps in (int(x) for x in args.extra_steps.split(",") if x.strip()):
+        for sched in SCHEDULERS:
+            if sched != "cosine_dpm" and (sched, steps) not in {(c[1], c[2]) for c in cases}:
+                cases.append((f"{sched}@{steps}", sched, steps))
+
+    rows = []
+    for name, sched, steps in cases:
+        print(f"\n[BENCH] {name}: {sched} × {steps} steps")
+        rows.append(run_case(name, sched, steps, PROMPTS, seeds, args.length))
+        print(f"[BENCH] → CLAP {rows[-1]['clap_mean']:.4f} | {rows[-1]['wall_mean']:.2f}s")
+
+    unload_stable_audio()
+
+    print("\n" + "=" * 78)
+    print(f"{'case':<24}{'scheduler':<18}{'steps':>6}{'CLAP':>9}{'min':>9}{'wall s':>9}{'RTF':>7}")
+    print("-" * 78)
+    for r in sorted(rows, key=lambda r: r["wall_mean"]):
+        print(f"{r['name']:<24}{r['scheduler']:<18}{r['steps']:>6}{r['clap_mean']:>9.4f}"
+              f"{r['clap_min']:>9.4f}{r['wall_mean']:>9.2f}{r['rtf']:>7.2f}")
+    print("=" * 78)
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    out = OUTPUT_DIR / "stable_preset_benchmark.json"
+    out.write_text(json.dumps({"device": args.device, "length": args.length, "prompts": PROMPTS,
+                               "seeds": seeds, "results": rows}, indent=2), encoding="utf-8")
+    print(f"Saved → {out}")
+
+
+if __name__ == "__main__":
+    main()
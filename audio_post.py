@@ -8,7 +8,7 @@ import torch
 import pyloudnorm as pyln
 from pydub import AudioSegment
 from pydub.silence import detect_silence
-from scipy.signal import butter, sosfiltfilt
+from scipy.signal import butter, sosfilt, sosfiltfilt
 from models.clap import load_clap
 
 def _ts():
@@ -297,6 +297,123 @@ def ace_post_process(wav_path: str) -> str:
     print(f"[{_ts()} ACE_POST] === DONE ===\n")
     return wav_path
 
+def ace_post_process_blocks(wav_path: str, block_seconds: float = 20.0) -> str:
+    """Block-based version of ace_post_process for long-form ACE-Step output.
+
+    Same music chain, but the file is never loaded whole:
+        • Pass 1: stereo upmix + 20 Hz high-pass (stateful sosfilt across blocks),
+          written to a float temp file while collecting peak, 10 ms frame RMS
+          and per-block loudness
+        • Silence trim from the frame RMS (same thresholds as ace_post_process)
+        • Pass 2: gain to -14 LUFS + peak limit to -0.17 dBTP, written as PCM_16
+
+    Integrated loudness is the power-weighted mean of the per-block loudness,
+    skipping silent blocks, which tracks pyloudnorm's gated measurement closely
+    for music.
+
+    Args:
+        wav_path: Path to the input/output WAV file
+        block_seconds: Size of each processing block
+
+    Returns:
+        str: Same path (file is overwritten)
+    """
+    if not os.path.exists(wav_path):
+        print(f"[{_ts()} ACE_POST_BLOCKS] ERROR: File not found: {wav_path}")
+        return wav_path
+
+    print(f"\n[{_ts()} ACE_POST_BLOCKS] === START | MODE: MUSIC (LONG-FORM) ===")
+    print(f"[{_ts()} ACE_POST_BLOCKS] Input: {wav_path}")
+
+    cfg = {
+        "target_lufs": -14.0,
+        "trim_db": -40,
+        "min_silence_ms": 100,
+        "protect_front_ms": 0,
+        "protect_end_ms": 500,
+        "highpass_hz": 20
+    }
+
+    info = sf.info(wav_path)
+    rate = info.samplerate
+    block = max(int(rate * block_seconds), rate)
+    frame = rate // 100  # 10 ms RMS frames for silence detection
+    block -= block % frame
+    print(f"[{_ts()} ACE_POST_BLOCKS] {info.frames:,} samples @ {rate}Hz → {info.frames / rate:.2f}s | block {block_seconds:.0f}s")
+
+    sos = butter(2, cfg["highpass_hz"], 'high', fs=rate, output='sos')
+    zi = None
+    meter = pyln.Meter(rate)
+    peak = 0.0
+    frame_rms = []
+    block_powers = []
+    block_lengths = []
+
+    tmp_path = wav_path + ".hp.wav"
+
+    # PASS 1 – HIGH-PASS + ANALYSIS
+    with sf.SoundFile(tmp_path, "w", samplerate=rate, channels=2, subtype="FLOAT") as out:
+        for data in sf.blocks(wav_path, blocksize=block, always_2d=True):
+            if data.shape[1] == 1:
+                data = np.repeat(data, 2, axis=1)
+            if zi is None:
+                zi = np.zeros((sos.shape[0], 2, data.shape[1]))
+            data, zi = sosfilt(sos, data, axis=0, zi=zi)
+            out.write(data)
+
+            peak = max(peak, float(np.max(np.abs(data))))
+            n_frames = len(data) // frame
+            if n_frames:
+                framed = data[:n_frames * frame].reshape(n_frames, frame, -1)
+                frame_rms.append(np.sqrt(np.mean(framed ** 2, axis=(1, 2))))
+            if len(data) >= int(rate * 0.4):
+                loudness = meter.integrated_loudness(data)
+                if np.isfinite(loudness):
+                    block_powers.append(10 ** ((loudness + 0.691) / 10))
+                    block_lengths.append(len(data))
+
+    # TRIM (RMS relative to peak, like the pydub path)
+    start_trim = end_trim = 0
+    if frame_rms and peak > 0:
+        rms_db = 20 * np.log10(np.maximum(np.concatenate(frame_rms) / peak, 1e-10))
+        loud = np.nonzero(rms_db > cfg["trim_db"])[0]
+        if len(loud):
+            front_ms = int(loud[0]) * 10
+            tail_ms = (len(rms_db) - 1 - int(loud[-1])) * 10
+            if front_ms >= cfg["min_silence_ms"]:
+                start_trim = max(0, front_ms - cfg["protect_front_ms"])
+                print(f"[{_ts()} ACE_POST_BLOCKS] Leading trim: {start_trim}ms")
+            if tail_ms >= cfg["min_silence_ms"]:
+                end_trim = max(0, tail_ms - cfg["protect_end_ms"])
+                print(f"[{_ts()} ACE_POST_BLOCKS] Trailing trim: {end_trim}ms")
+
+    # LOUDNESS + PEAK LIMIT GAIN
+    if block_powers:
+        power = np.average(block_powers, weights=block_lengths)
+        loudness = -0.691 + 10 * np.log10(power)
+        gain = 10 ** ((cfg["target_lufs"] - loudness) / 20)
+        print(f"[{_ts()} ACE_POST_BLOCKS] Measured: {loudness:.2f} LUFS → targeting {cfg['target_lufs']} LUFS")
+    else:
+        gain = 1.0
+        print(f"[{_ts()} ACE_POST_BLOCKS] No measurable loudness, gain unchanged")
+    if peak * gain > 0.98:
+        print(f"[{_ts()} ACE_POST_BLOCKS] Peak limited: {peak * gain:.4f} → 0.98")
+        gain = 0.98 / peak
+
+    # PASS 2 – GAIN + TRIM → PCM_16
+    total = sf.info(tmp_path).frames
+    first = int(rate * start_trim / 1000)
+    last = max(first, total - int(rate * end_trim / 1000))
+    with sf.SoundFile(wav_path, "w", samplerate=rate, channels=2, subtype="PCM_16") as out:
+        for data in sf.blocks(tmp_path, blocksize=block, start=first, stop=last, always_2d=True):
+            out.write(data * gain)
+    os.remove(tmp_path)
+
+    final_dur = (last - first) / rate
+    print(f"[{_ts()} ACE_POST_BLOCKS] FINAL: {final_dur:.2f}s @ {cfg['target_lufs']} LUFS (stereo)")
+    print(f"[{_ts()} ACE_POST_BLOCKS] === DONE ===\n")
+    return wav_path
+
 def score_with_clap(audio_np: np.ndarray, prompt: str, rate: int = 44100) -> float:
     """
     Score audio vs text using the globally loaded CLAP model.
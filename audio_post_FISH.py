@@ -1,7 +1,6 @@
 # audio_post_FISH.py
 
 import os
-import json
 import time
 import numpy as np
 import soundfile as sf
@@ -12,17 +11,15 @@ import pyrubberband as pyrb
 import noisereduce as nr
 from scipy.signal import butter, sosfiltfilt, hilbert
 from scipy.ndimage import gaussian_filter1d
-from difflib import SequenceMatcher
-import whisper
 from pathlib import Path
 from config import (
     FISH_CLIPPING_THRESHOLD, FISH_TARGET_LUFS,
     FISH_TRIM_DB, FISH_MIN_SILENCE,
     FISH_FRONT_PROTECT, FISH_END_PROTECT
 )
-from text_utils import sanitize_for_whisper, prepare_xtts_text
+from text_utils import prepare_xtts_text
 
-import models.whisper as whisper_mod
+from models.whisper_verify import verify_file
 
 
 def _ts():
@@ -146,47 +143,9 @@ def verify_with_whisper(
     job_file: Path = None,
     chunk_idx: int = None,
 ) -> bool:
-    print(f"[{_ts()} FISH_WHISPER] Verifying chunk: {Path(wav_path).name}")
-
-    if whisper_mod.whisper_model is None:
-        return True
-
-    try:
-        data, _ = sf.read(wav_path)
-        if np.max(np.abs(data)) > FISH_CLIPPING_THRESHOLD + 1e-10:
-            return False
-    except:
-        return False
-
-    audio = whisper.load_audio(wav_path)
-    result = whisper_mod.whisper_model.transcribe(audio, language=language, fp16=False, word_timestamps=False)
-    transcribed = result["text"].strip()
-
-    sim = SequenceMatcher(None,
-                         sanitize_for_whisper(original_text).split(),
-                         sanitize_for_whisper(transcribed).split()).ratio()
-    passed = sim >= (tolerance / 100.0)
-
-    if job_file and job_file.exists() and chunk_idx is not None:
-        try:
-            with open(job_file, "r+", encoding="utf-8") as f:
-                j = json.load(f)
-                c = j["chunks"][chunk_idx]
-                c["whisper_transcript"] = transcribed
-                c["verification_passed"] = passed
-                c["whisper_similarity"] = round(sim, 4)
-                c["processing_error"] = (
-                    f"Whisper similarity {sim:.3f} < {tolerance/100:.2f}" if not passed else None
-                )
-                f.seek(0)
-                json.dump(j, f, ensure_ascii=False, indent=2)
-                f.truncate()
-        except: pass
-
-    print(f"[{_ts()} FISH_WHISPER] Expected : \"{original_text}\"")
-    print(f"[{_ts()} FISH_WHISPER] Heard    : \"{transcribed}\"")
-    print(f"[{_ts()} FISH_WHISPER] Similarity {sim:.4f} ≥ {tolerance/100:.2f} → {'PASS' if passed else 'FAIL'}")
-    return passed
+    """Whisper check of one chunk via the shared batched verifier (models/whisper_verify)."""
+    return verify_file(wav_path, original_text, language, tolerance, job_file, chunk_idx,
+                       clip_threshold=FISH_CLIPPING_THRESHOLD, tag="FISH_WHISPER")
 
 
 
@@ -1,6 +1,6 @@
 # audio_post_XTTS.py
 import os
-import re, json
+import re
 import time
 import numpy as np
 import soundfile as sf
@@ -11,15 +11,13 @@ import pyrubberband as pyrb
 import noisereduce as nr
 from scipy.signal import butter, sosfiltfilt, hilbert
 from scipy.ndimage import gaussian_filter1d
-from difflib import SequenceMatcher
-import whisper
 from pathlib import Path
 from config import (
     XTTS_CLIPPING_THRESHOLD, XTTS_TARGET_LUFS, XTTS_MIN_SILENCE,
     XTTS_TRIM_DB, XTTS_FRONT_PROTECT, XTTS_END_PROTECT
 )
-from text_utils import sanitize_for_whisper, prepare_xtts_text
-import models.whisper as whisper_mod
+from text_utils import prepare_xtts_text
+from models.whisper_verify import verify_file
 
 def _ts():
     return time.strftime("%H:%M:%S")
@@ -177,59 +175,9 @@ def verify_with_whisper(
     job_file: Path = None,
     chunk_idx: int = None,
 ) -> bool:
-    print(f"[{_ts()} XTTS_WHISPER] Verifying chunk: {Path(wav_path).name}")
-
-    if whisper_mod.whisper_model is None:
-        print(f"[{_ts()} XTTS_WHISPER] Whisper not loaded → skip verification")
-        return True
-
-    try:
-        data, _ = sf.read(wav_path)
-        if np.max(np.abs(data)) > XTTS_CLIPPING_THRESHOLD + 1e-10:
-            print(f"[{_ts()} WHISPER] CLIPPED → REJECT")
-            return False
-    except Exception as e:
-        print(f"[{_ts()} XTTS_WHISPER] Failed to read audio: {e}")
-        return False
-
-    audio = whisper.load_audio(wav_path)
-    result = whisper_mod.whisper_model.transcribe(
-        audio,
-        language=language,
-        fp16=False,
-        word_timestamps=False
-    )
-    transcribed = result["text"].strip()
-
-    orig_san = sanitize_for_whisper(original_text)
-    trans_san = sanitize_for_whisper(transcribed)
-    sim = SequenceMatcher(None, orig_san.split(), trans_san.split()).ratio()
-    tolerance_norm = tolerance / 100.0
-    passed = sim >= tolerance_norm
-
-    # Write whisper_transcript and result to the CORRECT chunk
-    if job_file and job_file.exists() and chunk_idx is not None:
-        try:
-            with open(job_file, "r+", encoding="utf-8") as f:
-                j = json.load(f)
-                chunk = j["chunks"][chunk_idx]  # ← this is the correct index
-                chunk["whisper_transcript"] = transcribed
-                chunk["verification_passed"] = passed
-                chunk["whisper_similarity"] = round(sim, 4)
-                chunk["processing_error"] = (
-                    f"Whisper similarity {sim:.3f} < {tolerance_norm:.2f}"
-                    if not passed else None
-                )
-                f.seek(0)
-                json.dump(j, f, ensure_ascii=False, indent=2)
-                f.truncate()
-        except Exception as e:
-            print(f"[{_ts()} XTTS_WHISPER] Failed to update job.json: {e}")
-
-    print(f"[{_ts()} XTTS_WHISPER] Expected : \"{original_text}\"")
-    print(f"[{_ts()} XTTS_WHISPER] Heard    : \"{transcribed}\"")
-    print(f"[{_ts()} XTTS_WHISPER] Similarity {sim:.4f} ≥ {tolerance_norm:.2f} → {'PASS' if passed else 'FAIL'}")
-    return passed
+    """Whisper check of one chunk via the shared batched verifier (models/whisper_verify)."""
+    return verify_file(wav_path, original_text, language, tolerance, job_file, chunk_idx,
+                       clip_threshold=XTTS_CLIPPING_THRESHOLD, tag="XTTS_WHISPER")
 
 def post_process_xtts(wav_path: str, speed: float = 1.0, de_reverb: float = 0.7, de_ess: float = 0.0) -> str:
     """
@@ -18,6 +18,12 @@ ESPEAK_DIR = APP_ROOT / "bin" / "espeak-ng" # Kokoro TTS needs this
 #WHISPER_PATH = APP_ROOT / "models" / "base.en.pt" # fast, ~1.5 GB VRAM - use this one for the GPU poors
 WHISPER_PATH = APP_ROOT / "models" / "medium.en.pt" # best quality, ~5 GB VRAM
 # WHISPER_PATH = APP_ROOT / "models" / "large-v3.pt" # ~10 GB VRAM of overkill
+WHISPER_FAST_PATH = APP_ROOT / "models" / "base.en.pt" # first-tier chunk verification model, None = WHISPER_PATH only
+# WHISPER_FAST_PATH = APP_ROOT / "models" / "tiny.en.pt" # even faster, noisier
+WHISPER_BACKEND     = "openai"  # "openai" | "faster-whisper" (CTranslate2, see models/whisper_ct2)
+WHISPER_CT2_DIR     = APP_ROOT / "models" / "faster-whisper"
+WHISPER_CT2_COMPUTE = "auto"    # "auto" = int8 on CPU, float16 on CUDA
+WHISPER_CT2_THREADS = 0         # CPU threads, 0 = all cores
 
 # XTTS v2 TTS model path here
 MODEL_PATH  = APP_ROOT / "models" / "XTTS-v2"
@@ -33,6 +39,69 @@ KOKORO_MODEL_DIR = APP_ROOT / "models" / "kokoro-82m"
 DLL_PATH = ESPEAK_DIR / "libespeak-ng.dll"
 DATA_DIR = ESPEAK_DIR / "espeak-ng-data"
 
+# ACE-Step LoRA adapters kept resident on the GPU at once (least recently used are evicted).
+# A typical ACE-Step LoRA (r=16) is ~50-150 MB in bf16.
+ACE_LORA_CACHE_MB = 1024
+
+# Stable Audio low-VRAM mode: the VAE decodes one variant at a time in overlapping
+# tiles (finished audio is kept on CPU) and the T5 text encoder is parked on CPU
+# between calls. Slower decode, but lets Stable Audio share a GPU with XTTS/ACE-Step.
+STABLE_LOW_VRAM = False
+
+# Stable Audio on CPU (/stable_load with device "cpu"). fp16 is unusable on CPU:
+# "float32" is the safe default, "bfloat16" is ~1.5-2x faster on AVX512-BF16/AMX CPUs.
+# STABLE_CPU_THREADS = 0 keeps torch's default (all physical cores).
+STABLE_CPU_DTYPE   = "float32"
+STABLE_CPU_THREADS = 0
+
+# SFX asset library: every saved Stable Audio / ACE-Step file is indexed with its CLAP
+# embeddings (models/sfx_library). Requests with "library_lookup": true return an existing
+# asset instead of generating when its similarity score reaches SFX_LIBRARY_THRESHOLD.
+SFX_LIBRARY_ENABLED   = True
+SFX_LIBRARY_THRESHOLD = 0.80
+
+# Fish Speech resident engine (models/fish_engine). False keeps the original behaviour:
+# every chunk runs the fish-speech scripts as subprocesses, reloading both models.
+# True keeps text2semantic + the DAC codec loaded in the app between requests.
+# FISH_QUANT = "int8" | "int4" runs a weight-only quantized text2semantic checkpoint,
+# built once with fish-speech/tools/llama/quantize.py into FISH_MODEL_DIR/quantized.
+# int8 works on CPU and CUDA; int4 uses the CUDA int4 kernel (CUDA only).
+FISH_RESIDENT       = False
+FISH_QUANT          = None
+FISH_INT4_GROUPSIZE = 128
+# Resident engine only: /fish_infer generates codes for FISH_DECODE_BATCH chunks, then
+# DAC-decodes them as one padded batch (1 = decode chunk by chunk). Batches are split
+# further so that padded frames (≈21.5 per second of audio) stay ≤ FISH_DECODE_MAX_FRAMES.
+FISH_DECODE_BATCH      = 4
+FISH_DECODE_MAX_FRAMES = 2048
+# Resident engine only: run all chunks of a /fish_infer job through one generate_long
+# session, so the reference prompt is prefilled once per job instead of once per chunk.
+FISH_SINGLE_SESSION    = True
+# torch.compile the resident text2semantic decode step. Compilation and CUDA-graph capture
+# happen during /fish_load (warm-up on a short and a medium text, ~1-3 min), so requests
+# run at full speed from the first one. Hosts without a working compiler (e.g. Windows
+# without Triton) fall back to eager automatically. Implies FISH_RESIDENT.
+FISH_COMPILE           = False
+
+KOKORO_G2P_CACHE = True  # reuse phonemes across retries/recovery (models/kokoro_g2p_cache)
+KOKORO_BATCH_SIZE = 1  # chunks per KModel forward pass on /kokoro_infer (experimental, see models/kokoro_batch)
+KOKORO_BACKEND      = "torch"  # "torch" | "onnx" | "onnx-int8" (CPU only, see models/kokoro_onnx)
+KOKORO_ONNX_THREADS = 0        # ONNX Runtime intra-op threads, 0 = all physical cores
+KOKORO_PRELOAD_VOICES = True  # load the 20 English voice packs with the model (~10 MB)
+KOKORO_POOL_WORKERS = int(os.getenv("KOKORO_POOL_WORKERS", 0))  # CPU worker processes, 0 = in-process (models/kokoro_pool)
+KOKORO_POOL_THREADS = int(os.getenv("KOKORO_POOL_THREADS", 0))  # threads per worker, 0 = physical cores / workers
+
+WHISPER_VERIFY_BATCH   = 8   # chunk clips per verification decode, 1 = clip by clip (models/whisper_verify)
+WHISPER_VERIFY_WAIT_MS = 50  # extra wait to fill a batch when several clips are already queued
+WHISPER_ESCALATE_MARGIN = 10.0  # ± points around the tolerance re-checked with WHISPER_PATH
+# Long-media transcription in silence-cut pieces (models/whisper_vad)
+WHISPER_VAD_MIN_SECONDS = 120   # shorter files are transcribed in one pass
+WHISPER_VAD_SILENCE_DB  = -40   # dBFS below which a frame counts as silence
+WHISPER_VAD_MIN_SILENCE = 0.3   # seconds of silence a cut needs
+WHISPER_VAD_MAX_SECONDS = 28    # longest piece, keeps each in one 30 s window
+WHISPER_VAD_BATCH       = 8     # pieces per decode pass (openai backend)
+WHISPER_VAD_WORKERS     = 2     # parallel transcribe threads (faster-whisper)
+
 # LocalSoundsAPI save directory
 PROJECTS_OUTPUT = APP_ROOT / "projects_output"
 
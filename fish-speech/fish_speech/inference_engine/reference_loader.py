@@ -25,6 +25,10 @@ class ReferenceLoader:
         """
         self.ref_by_id: dict = {}
         self.ref_by_hash: dict = {}
+        # Optional persistent layer behind ref_by_hash: any object with
+        # get(sha256) -> codes | None and put(sha256, codes). Codes are saved per
+        # codec checkpoint, so they survive restarts.
+        self.codes_cache = None
 
         # Make Pylance happy (attribut/method not defined...)
         self.decoder_model: DAC
@@ -84,13 +88,24 @@ class ReferenceLoader:
         prompt_tokens, prompt_texts = [], []
         for i, ref in enumerate(references):
             if use_cache == "off" or audio_hashes[i] not in self.ref_by_hash:
-                # If the references are not already loaded, encode them
-                prompt_tokens.append(
-                    self.encode_reference(
-                        reference_audio=ref.audio,
-                        enable_reference_audio=True,
+                stored = None
+                if use_cache == "on" and self.codes_cache is not None:
+                    stored = self.codes_cache.get(audio_hashes[i])
+
+                if stored is not None:
+                    # Encoded in an earlier session
+                    prompt_tokens.append(torch.as_tensor(stored))
+                    cache_used = True
+                else:
+                    # If the references are not already loaded, encode them
+                    prompt_tokens.append(
+                        self.encode_reference(
+                            reference_audio=ref.audio,
+                            enable_reference_audio=True,
+                        )
                     )
-                )
+                    if self.codes_cache is not None:
+                        self.codes_cache.put(audio_hashes[i], prompt_tokens[-1])
                 prompt_texts.append(ref.text)
                 self.ref_by_hash[audio_hashes[i]] = (prompt_tokens[-1], ref.text)
 
@@ -53,6 +53,32 @@ def load_model(config_name, checkpoint_path, device="cuda"):
     return model
 
 
+@torch.no_grad()
+def decode_batch(model, codes_list):
+    """
+    Decode several code sequences (each num_codebooks x T_i) in one padded batch.
+
+    Sequences are right-padded to the longest and passed with their indices_lens.
+    The modded DAC is causal end to end, so padding never leaks into the frames
+    before it; every output is trimmed back to indices_lens * frame_length samples.
+    Returns one 1-D float tensor per input, in input order.
+    """
+    device = next(model.parameters()).device
+    indices_lens = torch.tensor(
+        [c.shape[-1] for c in codes_list], device=device, dtype=torch.long
+    )
+    indices = torch.zeros(
+        (len(codes_list), codes_list[0].shape[-2], int(indices_lens.max())),
+        device=device,
+        dtype=torch.long,
+    )
+    for i, codes in enumerate(codes_list):
+        indices[i, :, : codes.shape[-1]] = torch.as_tensor(codes).to(device).long()
+
+    fake_audios, audio_lengths = model.decode(indices, indices_lens)
+    return [fake_audios[i, 0, : audio_lengths[i]] for i in range(len(codes_list))]
+
+
 @torch.no_grad()
 @click.command()
 @click.option(
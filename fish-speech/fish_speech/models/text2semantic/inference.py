@@ -241,10 +241,16 @@ def generate(
     audio_parts: torch.Tensor,
     decode_one_token=decode_one_token_ar,
     num_samples: int = 1,
+    reuse_prefix: bool = False,
     **sampling_kwargs,
 ):
     """
     Takes a conditioning sequence (prompt) as input and continues to generate as many tokens as requested.
+
+    With reuse_prefix, the leading tokens this prompt shares with the previous
+    prompt (e.g. the reference text + VQ codes) keep their K/V from that call and
+    only the rest is prefilled. Positions past the shared prefix are rewritten
+    before they are attended to, so the result is the same as a full prefill.
     """
 
     # create an empty tensor of the expected final shape and fill in the current tokens
@@ -276,11 +282,24 @@ def generate(
                 dtype=next(model.parameters()).dtype,
             )
         model._cache_setup_done = True
+        model._cached_prompt = None
 
     codebook_dim = 1 + model.config.num_codebooks
 
+    # Shared prefix with the prompt whose K/V are still in the cache
+    prefix_len = 0
+    cached = getattr(model, "_cached_prompt", None)
+    if reuse_prefix and audio_parts is None and cached is not None:
+        n = min(cached.size(1), T - 1)
+        same = (cached[:, :n] == prompt[0, :, :n]).all(dim=0)
+        mismatch = (~same).nonzero()
+        prefix_len = int(mismatch[0]) if len(mismatch) else n
+        if prefix_len:
+            logger.info(f"Reusing cached prompt prefix: {prefix_len}/{T} tokens")
+    model._cached_prompt = None
+
     # Create new tensor each time, but try to reuse memory
-    input_pos = torch.arange(0, T, device=device, dtype=torch.long)
+    input_pos = torch.arange(prefix_len, T, device=device, dtype=torch.long)
     empty = torch.empty(
         (codebook_dim, model.config.max_seq_len), dtype=dtype, device=device
     )
@@ -316,7 +335,7 @@ def generate(
 
     first_token = prefill_decode(
         model,
-        prompt.view(1, codebook_dim, -1),
+        prompt.view(1, codebook_dim, -1)[:, :, prefix_len:],
         input_pos,
         temperature,
         top_p,
@@ -325,6 +344,7 @@ def generate(
         audio_parts,
     )
     seq[:, T : T + 1] = first_token
+    model._cached_prompt = prompt[0].clone()
 
     # Recreate input_pos
     input_pos = torch.tensor([T], device=device, dtype=torch.int)
@@ -395,7 +415,7 @@ def generate_long(
     model,
     device: Union[str, torch.device],
     decode_one_token: Callable,
-    text: str,
+    text: Union[str, list[str]],
     num_samples: int = 1,
     max_new_tokens: int = 0,
     top_p: float = 0.8,
@@ -406,11 +426,24 @@ def generate_long(
     chunk_length: int = 512,
     prompt_text: Optional[Union[str, list[str]]] = None,
     prompt_tokens: Optional[Union[torch.Tensor, list[torch.Tensor]]] = None,
+    reuse_prompt_prefix: Optional[bool] = None,
 ):
+    """
+    Generate codes for `text`, or for every segment of a list of texts in one session.
+
+    Each segment is conditioned on the same reference prompt and yields its own
+    "sample" response, followed by one "next" per sample. With reuse_prompt_prefix
+    (default: on for lists) the reference part of the prompt is prefilled once and
+    its K/V reused by every following segment.
+    """
     assert 0 < top_p <= 1, "top_p must be in (0, 1]"
     assert 0 < repetition_penalty < 2, "repetition_penalty must be in (0, 2)"
     assert 0 < temperature < 2, "temperature must be in (0, 2)"
 
+    texts = [text] if isinstance(text, str) else list(text)
+    if reuse_prompt_prefix is None:
+        reuse_prompt_prefix = not isinstance(text, str)
+
     use_prompt = prompt_text is not None and prompt_tokens is not None
     if use_prompt and isinstance(prompt_text, str):
         prompt_text = [prompt_text]
@@ -426,91 +459,92 @@ def generate_long(
 
     model_size = sum(p.numel() for p in model.parameters() if p.requires_grad)
     tokenizer = model.tokenizer
-    base_content_sequence = ContentSequence(modality="interleave")
-
     max_length = model.config.max_seq_len
-    if use_prompt:
-        for t, c in zip(prompt_text, prompt_tokens):
-            base_content_sequence.append(
-                [
-                    TextPart(text=t),
-                    VQPart(codes=c),
-                ],
-                add_end=True,
-                speaker=0,
-            )
-    base_content_sequence.append(
-        [
-            TextPart(text=text),
-        ],
-        add_end=False,
-        speaker=0,
-    )
 
-    encoded, audio_masks, audio_parts = base_content_sequence.encode_for_inference(
-        tokenizer, num_codebooks=model.config.num_codebooks
-    )
-    if encoded.size(1) > max_length - 2048:
-        raise ValueError(f"Prompt is too long: {encoded.size(1)} > {max_length - 2048}")
+    def encode_segment(segment_text):
+        content_sequence = ContentSequence(modality="interleave")
+        if use_prompt:
+            for t, c in zip(prompt_text, prompt_tokens):
+                content_sequence.append(
+                    [
+                        TextPart(text=t),
+                        VQPart(codes=c),
+                    ],
+                    add_end=True,
+                    speaker=0,
+                )
+        content_sequence.append(
+            [
+                TextPart(text=segment_text),
+            ],
+            add_end=False,
+            speaker=0,
+        )
+
+        encoded, audio_masks, audio_parts = content_sequence.encode_for_inference(
+            tokenizer, num_codebooks=model.config.num_codebooks
+        )
+        if encoded.size(1) > max_length - 2048:
+            raise ValueError(
+                f"Prompt is too long: {encoded.size(1)} > {max_length - 2048}"
+            )
+        logger.info(f"Encoded text: {segment_text}")
+        return encoded.to(device=device), audio_masks, audio_parts
 
-    encoded = encoded.to(device=device)
-    logger.info(f"Encoded text: {text}")
+    segments = [encode_segment(t) for t in texts]
 
     for sample_idx in range(num_samples):
-        if torch.cuda.is_available():
-            torch.cuda.synchronize()
-
-        global_encoded = []
-        seg_idx = 0
-        prompt_length = encoded.size(1)
-
-        t0 = time.perf_counter()
-
-        y = generate(
-            model=model,
-            prompt=encoded,
-            max_new_tokens=max_new_tokens,
-            audio_masks=audio_masks,
-            audio_parts=audio_parts,
-            decode_one_token=decode_one_token,
-            temperature=temperature,
-            top_p=top_p,
-            repetition_penalty=repetition_penalty,
-        )
+        for seg_idx, (encoded, audio_masks, audio_parts) in enumerate(segments):
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
 
-        if sample_idx == 0 and seg_idx == 0 and compile:
-            logger.info(f"Compilation time: {time.perf_counter() - t0:.2f} seconds")
+            prompt_length = encoded.size(1)
+
+            t0 = time.perf_counter()
+
+            y = generate(
+                model=model,
+                prompt=encoded,
+                max_new_tokens=max_new_tokens,
+                audio_masks=audio_masks,
+                audio_parts=audio_parts,
+                decode_one_token=decode_one_token,
+                reuse_prefix=reuse_prompt_prefix,
+                temperature=temperature,
+                top_p=top_p,
+                repetition_penalty=repetition_penalty,
+            )
 
-        if torch.cuda.is_available():
-            torch.cuda.synchronize()
+            if sample_idx == 0 and seg_idx == 0 and compile:
+                logger.info(f"Compilation time: {time.perf_counter() - t0:.2f} seconds")
 
-        t = time.perf_counter() - t0
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
 
-        tokens_generated = y.size(1) - prompt_length
-        tokens_sec = tokens_generated / t
-        logger.info(
-            f"Generated {tokens_generated} tokens in {t:.02f} seconds, {tokens_sec:.02f} tokens/sec"
-        )
-        logger.info(f"Bandwidth achieved: {model_size * tokens_sec / 1e9:.02f} GB/s")
+            t = time.perf_counter() - t0
 
-        if torch.cuda.is_available():
+            tokens_generated = y.size(1) - prompt_length
+            tokens_sec = tokens_generated / t
+            logger.info(
+                f"Generated {tokens_generated} tokens in {t:.02f} seconds, {tokens_sec:.02f} tokens/sec"
+            )
             logger.info(
-                f"GPU Memory used: {torch.cuda.max_memory_reserved() / 1e9:.02f} GB"
+                f"Bandwidth achieved: {model_size * tokens_sec / 1e9:.02f} GB/s"
             )
 
-        # Put the generated tokens
-        codes = y[1:, prompt_length:-1].clone()
-        assert (codes >= 0).all(), f"Negative code found"
+            if torch.cuda.is_available():
+                logger.info(
+                    f"GPU Memory used: {torch.cuda.max_memory_reserved() / 1e9:.02f} GB"
+                )
 
-        decoded = y[:, prompt_length:].clone()
-        global_encoded.append(decoded.cpu())
-        assert (codes >= 0).all(), f"Negative code found: {codes}"
+            # Put the generated tokens
+            codes = y[1:, prompt_length:-1].clone()
+            assert (codes >= 0).all(), f"Negative code found: {codes}"
 
-        yield GenerateResponse(action="sample", codes=codes, text=text)
-        seg_idx += 1
+            yield GenerateResponse(action="sample", codes=codes, text=texts[seg_idx])
 
-        # Force GPU memory cleanup
-        del y, decoded, codes
+            # Force GPU memory cleanup
+            del y, codes
 
         yield GenerateResponse(action="next")
 
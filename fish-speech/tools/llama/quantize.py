@@ -13,7 +13,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
-from fish_speech.models.text2semantic.inference import load_model
+from fish_speech.models.text2semantic.inference import init_model as load_model
 from fish_speech.models.text2semantic.llama import find_multiple
 
 ##### Quantization Primitives ######
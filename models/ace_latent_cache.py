@@ -0,0 +1,97 @@
+# models/ace_latent_cache.py
+"""
+Persistent DCAE latent cache for ACE-Step audio-conditioned tasks.
+
+repaint / extend / audio2audio all start by encoding the source track through
+music_dcae. Latents are keyed by the SHA-256 of the audio file bytes, kept in a
+small in-memory LRU and saved as CPU tensors under LATENT_DIR, so iterating on
+one section of a song (or restarting the app) never re-encodes the track.
+"""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import torch
+
+from config import APP_ROOT
+from save_utils import file_hash
+
+LATENT_DIR  = APP_ROOT / "models" / "ace_step_latents"
+MEMORY_ITEMS = 8     # ~4 min track ≈ 2.6k frames × 8 × 16 → ~0.6 MB per entry in bf16
+CODEC_TAG   = "music_dcae_f8c8"  # bump if the DCAE checkpoint ever changes
+
+
+class LatentCache:
+    def __init__(self, root: Path = LATENT_DIR, memory_items: int = MEMORY_ITEMS):
+        self.root = Path(root)
+        self.memory_items = memory_items
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, key: str) -> Path:
+        return self.root / f"{key}_{CODEC_TAG}.pt"
+
+    def get(self, audio_path: str, encode_fn) -> torch.Tensor:
+        """Return latents for ``audio_path``; calls ``encode_fn(audio_path)`` only on a miss."""
+        key = file_hash(audio_path)
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                print(f"[ACE-LATENT] Memory hit {key[:12]} ({Path(audio_path).name})")
+                return self._mem[key]
+
+            path = self._file(key)
+            if path.exists():
+                try:
+                    latents = torch.load(path, map_location="cpu")
+                    self.hits += 1
+                    print(f"[ACE-LATENT] Disk hit {key[:12]} ({Path(audio_path).name})")
+                    self._remember(key, latents)
+                    return latents
+                except Exception as e:
+                    print(f"[ACE-LATENT] Corrupt cache file {path.name}, re-encoding: {e}")
+
+        self.misses += 1
+        print(f"[ACE-LATENT] Encoding {Path(audio_path).name} → {key[:12]}")
+        latents = encode_fn(audio_path).detach().cpu()
+
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            torch.save(latents, tmp)
+            tmp.replace(path)
+            self._remember(key, latents)
+        return latents
+
+    def _remember(self, key: str, latents: torch.Tensor) -> None:
+        self._mem[key] = latents
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_items:
+            self._mem.popitem(last=False)
+
+    def clear(self, disk: bool = False) -> int:
+        with self._lock:
+            self._mem.clear()
+            removed = 0
+            if disk and self.root.exists():
+                for f in self.root.glob(f"*_{CODEC_TAG}.pt"):
+                    f.unlink(missing_ok=True)
+                    removed += 1
+            return removed
+
+    def status(self) -> dict:
+        with self._lock:
+            on_disk = list(self.root.glob(f"*_{CODEC_TAG}.pt")) if self.root.exists() else []
+            return {
+                "memory_entries": len(self._mem),
+                "disk_entries": len(on_disk),
+                "disk_mb": round(sum(f.stat().st_size for f in on_disk) / 1024**2, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+latent_cache = LatentCache()
@@ -0,0 +1,196 @@
+# models/ace_lora.py
+"""
+ACE-Step LoRA adapter cache.
+
+Adapters are registered once (local folder or HF repo id, downloaded at
+register time), then loaded into the transformer as named PEFT adapters the
+first time a request needs them. Several adapters stay resident side by side
+up to ACE_LORA_CACHE_MB; least-recently-used ones are deleted when the budget
+is exceeded. Per request the wanted adapters are activated (one → swap,
+several → weighted merge) with set_adapters, so the base weights are never
+touched and switching style costs no pipeline reload.
+"""
+import gc
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import torch
+from huggingface_hub import snapshot_download
+from diffusers.utils.peft_utils import set_weights_and_activate_adapters
+
+from config import APP_ROOT, ACE_LORA_CACHE_MB
+
+LORA_DIR      = APP_ROOT / "models" / "ace_step_loras"
+REGISTRY_FILE = LORA_DIR / "registry.json"
+WEIGHTS_NAME  = "pytorch_lora_weights.safetensors"
+
+_registry = {}              # name -> local folder containing WEIGHTS_NAME
+_resident = OrderedDict()   # name -> bytes on device, LRU order (oldest first)
+_active = []                # [(name, weight), ...] currently set on the transformer
+# Held by ace_step_loader.generate for a whole run, so adapters never change mid-diffusion
+pipeline_lock = threading.RLock()
+
+
+def _pipe():
+    from models import ace_step_loader
+    return ace_step_loader.pipe
+
+
+def _load_registry() -> None:
+    global _registry
+    if REGISTRY_FILE.exists():
+        try:
+            _registry = json.loads(REGISTRY_FILE.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"[ACE-LORA] Registry unreadable, starting empty: {e}")
+            _registry = {}
+
+
+def _save_registry() -> None:
+    LORA_DIR.mkdir(parents=True, exist_ok=True)
+    REGISTRY_FILE.write_text(json.dumps(_registry, indent=2), encoding="utf-8")
+
+
+def register_lora(name: str, path_or_repo: str) -> str:
+    """Register an adapter under ``name``. Downloads HF repo ids into LORA_DIR.
+
+    Returns:
+        str: Local folder holding pytorch_lora_weights.safetensors
+    """
+    name = name.strip()
+    if not name or name == "none":
+        raise ValueError("Invalid LoRA name")
+
+    if os.path.exists(path_or_repo):
+        local = Path(path_or_repo).expanduser().resolve()
+        if local.is_file():
+            local = local.parent
+    else:
+        print(f"[ACE-LORA] Downloading {path_or_repo} → {LORA_DIR}")
+        local = Path(snapshot_download(path_or_repo, cache_dir=str(LORA_DIR)))
+
+    if not (local / WEIGHTS_NAME).exists():
+        raise FileNotFoundError(f"{WEIGHTS_NAME} not found in {local}")
+
+    with pipeline_lock:
+        if name in _registry and _registry[name] != str(local):
+            _forget(name)
+        _registry[name] = str(local)
+        _save_registry()
+    print(f"[ACE-LORA] Registered '{name}' → {local}")
+    return str(local)
+
+
+def unregister_lora(name: str) -> bool:
+    with pipeline_lock:
+        if name not in _registry:
+            return False
+        _forget(name)
+        del _registry[name]
+        _save_registry()
+    print(f"[ACE-LORA] Unregistered '{name}'")
+    return True
+
+
+def _adapter_bytes(transformer, name: str) -> int:
+    tag = f".{name}."
+    return sum(p.numel() * p.element_size() for n, p in transformer.named_parameters() if tag in n)
+
+
+def _forget(name: str) -> None:
+    """Drop an adapter from the device (if resident)."""
+    global _active
+    if name not in _resident:
+        return
+    pipe = _pipe()
+    if pipe is not None:
+        pipe.ace_step_transformer.delete_adapters(name)
+    del _resident[name]
+    _active = [(n, w) for n, w in _active if n != name]
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    print(f"[ACE-LORA] Evicted '{name}'")
+
+
+def _ensure_resident(pipe, name: str) -> None:
+    transformer = pipe.ace_step_transformer
+    if name in _resident:
+        _resident.move_to_end(name)
+        return
+
+    path = Path(_registry[name]) / WEIGHTS_NAME
+    transformer.load_lora_adapter(str(path), adapter_name=name, with_alpha=True, prefix=None)
+    _resident[name] = _adapter_bytes(transformer, name)
+    print(f"[ACE-LORA] Loaded '{name}' ({_resident[name] / 1024**2:.1f} MB)")
+
+
+def _evict_over_budget(keep: set) -> None:
+    budget = ACE_LORA_CACHE_MB * 1024**2
+    for name in list(_resident):
+        if sum(_resident.values()) <= budget:
+            break
+        if name not in keep:
+            _forget(name)
+
+
+def activate_loras(pipe, loras: list[tuple[str, float]]) -> None:
+    """Make exactly ``loras`` the active adapter set on ``pipe``.
+
+    Args:
+        pipe: Loaded ACEStepPipeline
+        loras: [(name, weight), ...]. Empty → LoRA disabled, base model only.
+               More than one → adapters are combined with their weights.
+    """
+    global _active
+    with pipeline_lock:
+        transformer = pipe.ace_step_transformer
+        wanted = [(n, float(w)) for n, w in loras if n and n != "none"]
+
+        for name, _ in wanted:
+            if name not in _registry:
+                raise KeyError(f"LoRA '{name}' is not registered")
+            _ensure_resident(pipe, name)
+        _evict_over_budget({n for n, _ in wanted})
+
+        if wanted == _active:
+            return
+        if not wanted:
+            if _resident:
+                transformer.disable_lora()
+            _active = []
+            print("[ACE-LORA] Base model (no LoRA)")
+            return
+
+        if not _active:
+            transformer.enable_lora()
+        set_weights_and_activate_adapters(
+            transformer, [n for n, _ in wanted], [w for _, w in wanted]
+        )
+        _active = wanted
+        print(f"[ACE-LORA] Active: {', '.join(f'{n}@{w:g}' for n, w in wanted)}")
+
+
+def reset_resident() -> None:
+    """Forget device state after the pipeline itself was unloaded."""
+    global _active
+    with pipeline_lock:
+        _resident.clear()
+        _active = []
+
+
+def lora_status() -> dict:
+    with pipeline_lock:
+        return {
+            "registered": dict(_registry),
+            "resident": {n: round(b / 1024**2, 2) for n, b in _resident.items()},
+            "active": [{"name": n, "weight": w} for n, w in _active],
+            "resident_mb": round(sum(_resident.values()) / 1024**2, 2),
+            "budget_mb": ACE_LORA_CACHE_MB,
+        }
+
+
+_load_registry()
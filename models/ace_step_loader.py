@@ -26,6 +26,8 @@ _current_gpu = None
 
 # NEW: Import CLAP loader (assuming it's in the same models/ dir or adjust path)
 from models.clap import load_clap, unload_clap
+from models.ace_lora import activate_loras, pipeline_lock, reset_resident as reset_lora_resident
+from models.ace_latent_cache import latent_cache
 
 def load_ace(device: str = "0") -> bool:
     global pipe, model_loaded, _current_gpu
@@ -80,6 +82,7 @@ def load_ace(device: str = "0") -> bool:
             cpu_offload=False,
             overlapped_decode=False,
         )
+        pipe.latents_cache = latent_cache
         model_loaded = True
         _current_gpu = gpu_idx
         print(f"[ACE-LOAD] SUCCESS on cuda:{gpu_idx}")
@@ -105,6 +108,7 @@ def unload_ace() -> None:
     torch.cuda.empty_cache()
     model_loaded = False
     _current_gpu = None
+    reset_lora_resident()
     print("[ACE-UNLOAD] Done")
     unload_clap()
 
@@ -131,6 +135,17 @@ def generate(
     oss_steps: str = "",
     guidance_scale_text: float = 0.0,
     guidance_scale_lyric: float = 0.0,
+    long_form: bool = False,
+    loras: list | None = None,
+    task: str = "text2music",
+    src_audio_path: str | None = None,
+    repaint_start: float = 0.0,
+    repaint_end: float = 0.0,
+    retake_seeds: str | None = None,
+    retake_variance: float = 0.5,
+    ref_audio_input: str | None = None,
+    ref_audio_strength: float = 0.5,
+    batch_size: int = 1,
     play: bool = False
 ):
     """Generate music with the loaded ACE-Step pipeline.
@@ -150,10 +165,21 @@ def generate(
         use_erg_tag / use_erg_lyric / use_erg_diffusion: ERG ablation switches
         oss_steps: One-step scheduler step schedule string
         guidance_scale_text / guidance_scale_lyric: Separate text/lyric guidance
+        long_form: Use the overlapped DCAE decode above 48 s and stream the
+            decoded windows straight to ``output`` (written at 44.1 kHz)
+        loras: [(name, weight), ...] registered adapters to activate for this
+            call; None/empty → base model
+        task: text2music / retake / repaint / extend / audio2audio
+        src_audio_path: Source track for repaint / extend (latents cached by hash)
+        repaint_start / repaint_end: Section in seconds (extend: start < 0 or end > length)
+        retake_seeds / retake_variance: Noise seed and mix for retake / repaint / extend
+        ref_audio_input / ref_audio_strength: Reference track for audio2audio
+        batch_size: >1 renders several seeds ("1,2,3") in one diffusion batch;
+            ``output`` is then a directory
         play: On Windows, open the file after generation
 
     Returns:
-        str: Path to the generated WAV file
+        str: Path to the generated WAV file (list[str] in seed order when batch_size > 1)
     """
     global pipe
     if not model_loaded:
@@ -165,25 +191,45 @@ def generate(
 
     print(f"[ACE-GEN] Generating: '{prompt[:60]}...' → {output}")
 
-    pipe(
-        audio_duration=duration,
-        prompt=prompt,
-        lyrics=lyrics,
-        infer_step=infer_step,
-        guidance_scale=guidance_scale,
-        scheduler_type=scheduler_type,
-        cfg_type=cfg_type,
-        omega_scale=omega_scale,
-        manual_seeds=manual_seeds,
-        guidance_interval=guidance_interval,
-        guidance_interval_decay=guidance_interval_decay,
-        min_guidance_scale=min_guidance_scale,
-        use_erg_tag=use_erg_tag,
-        use_erg_lyric=use_erg_lyric,
-        use_erg_diffusion=use_erg_diffusion,
-        oss_steps=oss_steps,
-        guidance_scale_text=guidance_scale_text,
-        guidance_scale_lyric=guidance_scale_lyric,
-        save_path=output
-    )
+    if batch_size > 1:
+        Path(output).mkdir(parents=True, exist_ok=True)
+
+    with pipeline_lock:
+        # Read per call by latents2audio, so long-form and normal jobs can interleave
+        pipe.overlapped_decode = long_form
+        activate_loras(pipe, loras or [])
+
+        outputs = pipe(
+            audio_duration=duration,
+            prompt=prompt,
+            lyrics=lyrics,
+            infer_step=infer_step,
+            guidance_scale=guidance_scale,
+            scheduler_type=scheduler_type,
+            cfg_type=cfg_type,
+            omega_scale=omega_scale,
+            manual_seeds=manual_seeds,
+            guidance_interval=guidance_interval,
+            guidance_interval_decay=guidance_interval_decay,
+            min_guidance_scale=min_guidance_scale,
+            use_erg_tag=use_erg_tag,
+            use_erg_lyric=use_erg_lyric,
+            use_erg_diffusion=use_erg_diffusion,
+            oss_steps=oss_steps,
+            guidance_scale_text=guidance_scale_text,
+            guidance_scale_lyric=guidance_scale_lyric,
+            task=task,
+            src_audio_path=src_audio_path,
+            repaint_start=repaint_start,
+            repaint_end=repaint_end,
+            retake_seeds=retake_seeds,
+            retake_variance=retake_variance,
+            audio2audio_enable=task == "audio2audio",
+            ref_audio_input=ref_audio_input,
+            ref_audio_strength=ref_audio_strength,
+            batch_size=batch_size,
+            save_path=output
+        )
+    if batch_size > 1:
+        return outputs[:-1]
     return output
\ No newline at end of file
@@ -14,8 +14,10 @@ This module manages:
     - Assembles final audio with correct front-pad, inter-chunk pause, and global padding
     - Guarantees cleanup of all temporary files
 
-All heavy lifting is done via the original FishSpeech repository scripts
-invoked as subprocesses in the correct environment.
+By default all heavy lifting is done via the original FishSpeech repository
+scripts invoked as subprocesses in the correct environment. With resident=True
+(FISH_RESIDENT) the models stay loaded in-process instead (models/fish_engine),
+optionally as an int8/int4 quantized text2semantic checkpoint.
 """
 
 import os, sys
@@ -46,7 +48,12 @@ from config import (
     FISH_PADDING_SECONDS,
     FISH_FRONT_PAD,
     FISH_INTER_PAUSE,
+    FISH_RESIDENT,
+    FISH_QUANT,
+    FISH_COMPILE,
 )
+import models.fish_engine as fish_engine
+from models.fish_code_cache import code_cache
 from text_utils import split_text_fish
 
 
@@ -66,26 +73,50 @@ atexit.register(lambda: [shutil.rmtree(p, ignore_errors=True) for p in _global_t
 
 fish_loaded = False
 fish_device_id = None
+fish_resident = False
+fish_quant = None
+fish_compile = False
+fish_checkpoint = FISH_MODEL_DIR   # text2semantic checkpoint the subprocess path runs
 
 def _ts() -> str:
     return time.strftime("%H:%M:%S")
 
-def load_fish(device=None) -> tuple[bool, str]:
-    """Load FishSpeech inference environment (lightweight — just path checks).
+def load_fish(device=None, resident=None, quant=None, compile=None) -> tuple[bool, str]:
+    """Load FishSpeech inference environment.
 
     Args:
         device: Target device string (e.g. "cuda:0"). If None, resolved via config.
+        resident: Keep text2semantic + DAC loaded in-process (models/fish_engine)
+            instead of running the scripts per chunk. None → FISH_RESIDENT.
+        quant: "int8" / "int4" weight-only text2semantic checkpoint, built and cached
+            under FISH_MODEL_DIR/quantized on first use; "none" forces full precision.
+            None → FISH_QUANT. Applies to both the resident and the subprocess path.
+        compile: torch.compile the decode step and warm it up here, at load time
+            (implies resident). Falls back to eager if the host can't compile.
+            None → FISH_COMPILE.
 
     Returns:
         Tuple of (success: bool, message: str).
     """
-    global fish_loaded, fish_device_id
+    global fish_loaded, fish_device_id, fish_resident, fish_quant, fish_compile, fish_checkpoint
     dev = device if device is not None else resolve_device(None)
+    resident = FISH_RESIDENT if resident is None else bool(resident)
+    quant = FISH_QUANT if quant is None else quant
+    quant = None if quant in ("", "none") else quant
+    compile = FISH_COMPILE if compile is None else bool(compile)
+    if compile and not resident:
+        print(f"[{_ts()} FISH] compile needs the resident engine → resident=True")
+        resident = True
 
     if fish_loaded and fish_device_id != dev:
         print(f"[{_ts()} FISH] Device change {fish_device_id} → {dev}, unloading first")
         unload_fish()
 
+    if fish_loaded and (fish_resident, fish_quant, fish_compile) != (resident, quant, compile):
+        print(f"[{_ts()} FISH] Mode change → resident={resident}, quant={quant or 'none'}, "
+              f"compile={compile}, reloading")
+        unload_fish()
+
     if fish_loaded:
         return True, "Fish already loaded"
 
@@ -103,19 +134,36 @@ def load_fish(device=None) -> tuple[bool, str]:
         if not FISH_DAC_CKPT.exists():
             raise FileNotFoundError(f"DAC checkpoint missing: {FISH_DAC_CKPT}")
 
+        checkpoint = fish_engine.ensure_quantized(quant) if quant else FISH_MODEL_DIR
+        compiled = False
+        if resident:
+            compiled = fish_engine.load_engine(dev, quant, compile=compile).compiled
+
         logging.info(f"Fish Speech ready on {dev}")
         fish_loaded = True
         fish_device_id = dev
-        return True, f"Fish loaded on {dev}"
+        fish_resident = resident
+        fish_quant = quant
+        fish_compile = compile
+        fish_checkpoint = checkpoint
+        mode = f"{'resident' if resident else 'subprocess'}, {quant or 'bf16'}"
+        if compile:
+            mode += ", compiled" if compiled else ", eager fallback"
+        return True, f"Fish loaded on {dev} ({mode})"
     except Exception as e:
         err = f"Fish load failed: {e}"
         logging.error(err)
         return False, err
 
 def unload_fish() -> tuple[bool, str]:
-    global fish_loaded, fish_device_id
+    global fish_loaded, fish_device_id, fish_resident, fish_quant, fish_compile, fish_checkpoint
+    fish_engine.unload_engine()
     fish_loaded = False
     fish_device_id = None
+    fish_resident = False
+    fish_quant = None
+    fish_compile = False
+    fish_checkpoint = FISH_MODEL_DIR
     torch.cuda.empty_cache()
     gc.collect()
     logging.info("Fish Speech unloaded")
@@ -164,8 +212,21 @@ class FishSpeechDemo:
 
 
 
-        # ENCODE REFERENCE ONCE
+        # ENCODE REFERENCE ONCE (per voice – codes persist in models/fish_code_cache)
+        self.prompt_tokens = None
+        if fish_engine.engine is not None:
+            print(f"[{_ts()} FISH] Encoding reference audio ONCE (resident engine)...")
+            self.prompt_tokens = fish_engine.engine.encode_reference(self.ref_audio)
+            print(f"[{_ts()} FISH] Reference encoded — codes cached")
+            return
+
         print(f"[{_ts()} FISH] Encoding reference audio ONCE...")
+        codes = code_cache.get_file(self.ref_audio, self._encode_subprocess)
+        # The text2semantic subprocess reads its prompt codes from here
+        np.save(FISH_REPO_DIR / "fake.npy", codes)
+        print(f"[{_ts()} FISH] Reference encoded — codes cached")
+
+    def _encode_subprocess(self, audio_path) -> np.ndarray:
         env = os.environ.copy()
         if self.gpu_id == "cpu":
             env["CUDA_VISIBLE_DEVICES"] = ""
@@ -180,7 +241,7 @@ class FishSpeechDemo:
             [
                 sys.executable,
                 "-m", "fish_speech.models.dac.inference",
-                "-i", str(self.ref_audio),
+                "-i", str(audio_path),
                 "--checkpoint-path", str(FISH_DAC_CKPT),
                 "--device", resolve_device(self.gpu_id),
             ],
@@ -188,7 +249,7 @@ class FishSpeechDemo:
             env=env,
             cwd=self.repo_dir,
         )
-        print(f"[{_ts()} FISH] Reference encoded — codes cached")
+        return np.load(FISH_REPO_DIR / "fake.npy")
 
 
 
@@ -198,10 +259,87 @@ class FishSpeechDemo:
         if not chunk:
             raise ValueError("Empty text chunk")
 
+        engine = fish_engine.engine
+        if engine is not None:
+            wav, sr = engine.decode(self._generate_codes(engine, chunk))
+        else:
+            wav, sr = self._infer_subprocess(chunk)
+        return self._finish(wav, sr, output_wav)
+
+    def infer_batch(self, texts: list[str], output_wavs: list[str], codes=None) -> list[tuple[str, float]]:
+        """Like ``infer`` for several chunks, DAC-decoding their codes as one padded batch.
+
+        ``codes`` (e.g. from ``codes_session``) skips text2semantic for these chunks.
+        Without the resident engine this simply runs ``infer`` per chunk.
+        """
+        engine = fish_engine.engine
+        if engine is None or (len(texts) < 2 and codes is None):
+            return [self.infer(t, o) for t, o in zip(texts, output_wavs)]
+
+        if codes is None:
+            codes = []
+            for text in texts:
+                if not text.strip():
+                    raise ValueError("Empty text chunk")
+                codes.append(self._generate_codes(engine, text.strip()))
+        wavs = engine.decode_batch(codes)
+        return [self._finish(wav, engine.sample_rate, o) for wav, o in zip(wavs, output_wavs)]
+
+    def codes_session(self, texts: list[str], first_index: int = 0):
+        """Generator of (chunk index, codes): all chunks through one generate_long session.
+
+        Needs the resident engine. The reference prompt is prefilled once for the
+        whole job; chunks are produced lazily, so callers can stop at any point.
+        """
+        engine = fish_engine.engine
+        if engine is None:
+            raise RuntimeError("Single-session Fish generation needs the resident engine")
+        if any(not t.strip() for t in texts):
+            raise ValueError("Empty text chunk")
+        self._ensure_prompt_tokens(engine)
+        session = engine.generate_session(
+            [t.strip() for t in texts],
+            prompt_text=self.ref_text,
+            prompt_tokens=self.prompt_tokens,
+            temperature=self.temperature,
+            top_p=self.top_p,
+            max_new_tokens=self.max_tokens,
+        )
+        for i, codes in enumerate(session, start=first_index):
+            yield i, codes
+
+    def _ensure_prompt_tokens(self, engine):
+        # Loaded after this demo was built → reference still needs the in-process encode
+        if self.prompt_tokens is None:
+            self.prompt_tokens = engine.encode_reference(self.ref_audio)
+
+    def _generate_codes(self, engine, chunk: str):
+        self._ensure_prompt_tokens(engine)
+        return engine.generate_codes(
+            chunk,
+            prompt_text=self.ref_text,
+            prompt_tokens=self.prompt_tokens,
+            temperature=self.temperature,
+            top_p=self.top_p,
+            max_new_tokens=self.max_tokens,
+        )
 
+    def _finish(self, wav: np.ndarray, sr: int, output_wav: str) -> tuple[str, float]:
+        wav_24k = resample_poly(wav, 24000, sr) if sr != 24000 else wav
 
+        # Post-process
+        temp_wav = self.temp_dir / f"temp_{uuid.uuid4().hex}.wav"
+        sf.write(temp_wav, wav_24k, 24000, subtype="PCM_16")
+        processed = post_process_fish(str(temp_wav), self.speed, self.de_reverb, self.de_ess)
 
+        # Final output
+        final_path = Path(output_wav)
+        Path(processed).replace(final_path)
+        duration = len(wav_24k) / 24000
 
+        return str(final_path), duration
+
+    def _infer_subprocess(self, chunk: str) -> tuple[np.ndarray, int]:
         # Build environment with PYTHONPATH so Fish scripts can import fish_speech.*
         # Build environment with PYTHONPATH so Fish scripts can import fish_speech.*
         env = os.environ.copy()
@@ -220,7 +358,7 @@ class FishSpeechDemo:
             "--text", chunk,
             "--prompt-text", self.ref_text,
             "--prompt-tokens", str(FISH_REPO_DIR / "fake.npy"),
-            "--checkpoint-path", str(FISH_MODEL_DIR),
+            "--checkpoint-path", str(fish_checkpoint),
             "--device", resolve_device(self.gpu_id),
             "--temperature", str(self.temperature),
             "--top-p", str(self.top_p),
@@ -261,22 +399,9 @@ class FishSpeechDemo:
 
 
 
-        # Load and resample
+        # Load
         wav_path = FISH_REPO_DIR / "fake.wav"
-        wav, sr = sf.read(wav_path)
-        wav_24k = resample_poly(wav, 24000, sr) if sr != 24000 else wav
-
-        # Post-process
-        temp_wav = self.temp_dir / f"temp_{uuid.uuid4().hex}.wav"
-        sf.write(temp_wav, wav_24k, 24000, subtype="PCM_16")
-        processed = post_process_fish(str(temp_wav), self.speed, self.de_reverb, self.de_ess)
-
-        # Final output
-        final_path = Path(output_wav)
-        Path(processed).replace(final_path)
-        duration = len(wav_24k) / 24000
-
-        return str(final_path), duration
+        return sf.read(wav_path)
 
     def __del__(self):
         if hasattr(self, "temp_dir") and self.temp_dir.exists():
@@ -0,0 +1,133 @@
+# models/fish_code_cache.py
+"""
+Persistent VQ prompt-code cache for Fish Speech reference voices.
+
+Every Fish request starts by DAC-encoding its reference clip. Codes are keyed by
+the SHA-256 of the audio bytes actually handed to the codec (the trimmed copy for
+clips over 29 s) and tagged with the codec checkpoint, kept in a small in-memory
+LRU and saved as .npy (the same layout fish_speech writes) under CODES_DIR next
+to the voices. Re-using a voice – or restarting the app – skips the encode.
+
+The same object plugs into fish_speech's ReferenceLoader as ``codes_cache``.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from config import VOICE_DIR, FISH_DAC_CKPT
+from save_utils import file_hash
+
+CODES_DIR    = VOICE_DIR / ".fish_codes"
+MEMORY_ITEMS = 16    # ~30 s reference ≈ 10 × 650 int codes → a few KB each
+
+
+def codec_tag(ckpt: Path = FISH_DAC_CKPT) -> str:
+    """Identify the codec checkpoint by size + first MiB, so swapped weights never reuse codes."""
+    h = hashlib.sha256(str(ckpt.stat().st_size).encode())
+    with open(ckpt, "rb") as f:
+        h.update(f.read(1 << 20))
+    return h.hexdigest()[:12]
+
+
+class FishCodeCache:
+    def __init__(self, root: Path = CODES_DIR, memory_items: int = MEMORY_ITEMS):
+        self.root = Path(root)
+        self.memory_items = memory_items
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._tag = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def tag(self) -> str:
+        if self._tag is None:
+            self._tag = codec_tag()
+        return self._tag
+
+    def _file(self, key: str) -> Path:
+        return self.root / f"{key}_{self.tag}.npy"
+
+    def get(self, key: str) -> np.ndarray | None:
+        """Codes for an audio SHA-256, or None on a miss."""
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                print(f"[FISH-CODES] Memory hit {key[:12]}")
+                return self._mem[key]
+
+            path = self._file(key)
+            if path.exists():
+                try:
+                    codes = np.load(path)
+                    self.hits += 1
+                    print(f"[FISH-CODES] Disk hit {key[:12]}")
+                    self._remember(key, codes)
+                    return codes
+                except Exception as e:
+                    print(f"[FISH-CODES] Corrupt cache file {path.name}, re-encoding: {e}")
+            self.misses += 1
+            return None
+
+    def put(self, key: str, codes) -> None:
+        if hasattr(codes, "detach"):
+            codes = codes.detach().cpu().numpy()
+        codes = np.asarray(codes)
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            path = self._file(key)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, codes)
+            tmp.replace(path)
+            self._remember(key, codes)
+        print(f"[FISH-CODES] Cached {key[:12]} {tuple(codes.shape)}")
+
+    def get_file(self, audio_path: str | Path, encode_fn) -> np.ndarray:
+        """Codes for the file at ``audio_path``; calls ``encode_fn(audio_path)`` only on a miss."""
+        key = file_hash(audio_path)
+        codes = self.get(key)
+        if codes is None:
+            print(f"[FISH-CODES] Encoding {Path(audio_path).name} → {key[:12]}")
+            codes = encode_fn(audio_path)
+            self.put(key, codes)
+            codes = self._mem[key]
+        return codes
+
+    def _remember(self, key: str, codes: np.ndarray) -> None:
+        self._mem[key] = codes
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_items:
+            self._mem.popitem(last=False)
+
+    def clear(self, disk: bool = False) -> int:
+        with self._lock:
+            self._mem.clear()
+            removed = 0
+            if disk and self.root.exists():
+                for f in self.root.glob("*.npy"):
+                    f.unlink(missing_ok=True)
+                    removed += 1
+            return removed
+
+    def status(self) -> dict:
+        """Cache stats. ``codec_tag`` is None until a get/put has read the codec checkpoint
+        (which may not be downloaded yet); until then every cached file is counted."""
+        with self._lock:
+            pattern = f"*_{self._tag}.npy" if self._tag else "*.npy"
+            on_disk = list(self.root.glob(pattern)) if self.root.exists() else []
+            return {
+                "memory_entries": len(self._mem),
+                "disk_entries": len(on_disk),
+                "disk_kb": round(sum(f.stat().st_size for f in on_disk) / 1024, 1),
+                "codec_tag": self._tag,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+code_cache = FishCodeCache()
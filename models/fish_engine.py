@@ -0,0 +1,450 @@
+# models/fish_engine.py
+"""
+Resident FishSpeech engine and cached weight-only quantized checkpoints.
+
+The default Fish path (models/fish.py) runs the fish-speech scripts as
+subprocesses, so text2semantic and the DAC codec are reloaded for every chunk.
+FishEngine keeps both on one device between requests; everything that only pays
+off on a warm model (quantized weights, shared sessions, compile) lives here.
+
+Quantized text2semantic checkpoints are built once with the bundled
+fish-speech/tools/llama/quantize.py and cached under FISH_QUANT_DIR:
+
+    int8 → weight-only, symmetric per-channel (CPU and CUDA)
+    int4 → weight-only, groupwise, packed for the CUDA int4 kernel (CUDA only)
+"""
+import gc
+import hashlib
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from config import (
+    FISH_REPO_DIR, FISH_MODEL_DIR, FISH_DAC_CKPT, FISH_INT4_GROUPSIZE, FISH_DECODE_MAX_FRAMES,
+)
+from models.fish_code_cache import code_cache
+
+if str(FISH_REPO_DIR) not in sys.path:
+    sys.path.append(str(FISH_REPO_DIR))
+
+FISH_QUANT_DIR   = FISH_MODEL_DIR / "quantized"
+QUANT_MODES      = ("int8", "int4")
+QUANTIZE_SCRIPT  = FISH_REPO_DIR / "tools" / "llama" / "quantize.py"
+WARMUP_TEXTS     = (   # short and medium chunk; compiled kernels / CUDA graphs are captured here
+    "Hello world.",
+    "This is a warm-up sentence of about the length of a typical chunk, so the first real request runs at full speed.",
+)
+WARMUP_TOKENS    = 96
+BENCH_TEXT       = ("The quick brown fox jumps over the lazy dog. "
+                    "She sells sea shells by the sea shore, and the shells she sells are surely sea shells.")
+
+_build_lock = threading.Lock()
+
+engine = None
+
+
+def _ts() -> str:
+    return time.strftime("%H:%M:%S")
+
+
+# ─── quantized checkpoints ──────────────────────────────────────────────
+def _source_tag() -> str:
+    """Short id of the full-precision weights, so a replaced model.pth gets a fresh build."""
+    st = (FISH_MODEL_DIR / "model.pth").stat()
+    return hashlib.sha256(f"{st.st_size}:{int(st.st_mtime)}".encode()).hexdigest()[:10]
+
+
+def quantized_path(mode: str, groupsize: int = FISH_INT4_GROUPSIZE) -> Path:
+    # Same naming as the bundled quantizer: fish_speech detects "int8" / "int4-g<N>" in the path
+    if mode == "int8":
+        return FISH_QUANT_DIR / f"fs-1.2-int8-{_source_tag()}"
+    return FISH_QUANT_DIR / f"fs-1.2-int4-g{groupsize}-{_source_tag()}"
+
+
+def ensure_quantized(mode: str, groupsize: int = FISH_INT4_GROUPSIZE) -> Path:
+    """Return the cached quantized checkpoint for ``mode``, building it on first use.
+
+    The quantizer copies its whole --checkpoint-path next to the output, so it is
+    pointed at a staging folder holding only the top-level text2semantic files
+    (hard links where possible) instead of FISH_MODEL_DIR, which contains the cache.
+    """
+    if mode not in QUANT_MODES:
+        raise ValueError(f"Unknown Fish quantization '{mode}' (expected one of {', '.join(QUANT_MODES)})")
+    if mode == "int4" and not torch.cuda.is_available():
+        raise RuntimeError("int4 Fish weights are packed for the CUDA int4 kernel – use int8 on CPU")
+
+    target = quantized_path(mode, groupsize)
+    if (target / "model.pth").exists():
+        return target
+
+    with _build_lock:
+        if (target / "model.pth").exists():
+            return target
+        print(f"[{_ts()} FISH-QUANT] Building {target.name} (one-time)...")
+        t0 = time.time()
+        FISH_QUANT_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=FISH_QUANT_DIR, prefix=".build_") as tmp:
+            stage = Path(tmp) / "source"
+            stage.mkdir()
+            for f in FISH_MODEL_DIR.iterdir():
+                if f.is_file() and f.name != FISH_DAC_CKPT.name:
+                    try:
+                        os.link(f, stage / f.name)
+                    except OSError:
+                        shutil.copy2(f, stage / f.name)
+
+            env = os.environ.copy()
+            env["PYTHONPATH"] = str(FISH_REPO_DIR)
+            cmd = [
+                sys.executable, str(QUANTIZE_SCRIPT),
+                "--checkpoint-path", str(stage),
+                "--mode", mode,
+                "--groupsize", str(groupsize),
+                "--timestamp", _source_tag(),
+            ]
+            result = subprocess.run(cmd, cwd=tmp, env=env, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"Fish quantizer failed: {result.stderr[-500:]}")
+            shutil.move(str(Path(tmp) / "checkpoints" / target.name), str(target))
+
+        size = (target / "model.pth").stat().st_size / 1024**2
+        print(f"[{_ts()} FISH-QUANT] {target.name} ready in {time.time() - t0:.1f}s ({size:.0f} MB)")
+        return target
+
+
+def _register_bundled_quantizer() -> None:
+    """fish_speech imports its quantizer as ``tools.llama.quantize``, which the app's own
+    tools.py shadows in-process – register the bundled file under that name first."""
+    name = "tools.llama.quantize"
+    if name in sys.modules:
+        return
+    spec = importlib.util.spec_from_file_location(name, QUANTIZE_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+
+
+def _tensor_mb(module: torch.nn.Module) -> float:
+    return sum(t.numel() * t.element_size() for t in chain(module.parameters(), module.buffers())) / 1024**2
+
+
+def _memory_mb(device: str) -> dict:
+    if device.startswith("cuda"):
+        return {
+            "peak_allocated_mb": round(torch.cuda.max_memory_allocated(device) / 1024**2, 1),
+            "peak_reserved_mb": round(torch.cuda.max_memory_reserved(device) / 1024**2, 1),
+        }
+    import psutil
+    return {"process_rss_mb": round(psutil.Process().memory_info().rss / 1024**2, 1)}
+
+
+def _reference_loader(codec):
+    """fish_speech's ReferenceLoader + VQManager bound to our codec, backed by code_cache."""
+    from fish_speech.inference_engine.reference_loader import ReferenceLoader
+    from fish_speech.inference_engine.vq_manager import VQManager
+
+    class References(ReferenceLoader, VQManager):
+        def __init__(self):
+            super().__init__()
+            self.decoder_model = codec
+            self.codes_cache = code_cache
+
+    return References()
+
+
+# ─── engine ─────────────────────────────────────────────────────────────
+class FishEngine:
+    """text2semantic + DAC codec kept resident on one device."""
+
+    def __init__(self, device: str, checkpoint: Path = FISH_MODEL_DIR, precision=torch.bfloat16,
+                 compile: bool = False):
+        from fish_speech.models.text2semantic.inference import init_model
+        # dac.inference runs pyrootutils.setup_root() on import, which chdirs into fish-speech
+        cwd = os.getcwd()
+        from fish_speech.models.dac.inference import load_model as load_codec
+        os.chdir(cwd)
+
+        self.device = device
+        self.checkpoint = Path(checkpoint)
+        self.quant = next((m for m in QUANT_MODES if m in self.checkpoint.name), None)
+        if self.quant:
+            _register_bundled_quantizer()
+
+        t0 = time.time()
+        if device.startswith("cuda"):
+            torch.cuda.reset_peak_memory_stats(device)
+        self.model, self.decode_one_token = init_model(self.checkpoint, device, precision, compile=compile)
+        self.weights_mb = round(_tensor_mb(self.model), 1)
+        self.codec = load_codec("modded_dac_vq", str(FISH_DAC_CKPT), device=device)
+        self.sample_rate = self.codec.sample_rate
+        self.references = _reference_loader(self.codec)
+        self.last = None
+        self.compile_requested = compile
+        self.compiled = compile
+        self.compile_error = None
+        self.warmup = []
+        if compile:
+            self._warm_up()
+        self.load_seconds = round(time.time() - t0, 2)
+        mode = f"{self.quant or 'bf16'}{', compiled' if self.compiled else ''}"
+        print(f"[{_ts()} FISH-ENGINE] Resident on {device} ({mode}) – "
+              f"text2semantic {self.weights_mb:.0f} MB, loaded in {self.load_seconds:.1f}s")
+
+    def _warm_up(self) -> None:
+        """Run the warm-up texts so compilation happens at load time, not on the first request.
+
+        Any failure (no Triton / C++ compiler on the host, unsupported op, …) switches
+        the engine back to the eager decode step; the model itself is unaffected.
+        """
+        import torch._dynamo
+        from fish_speech.models.text2semantic.inference import decode_one_token_ar
+
+        for text in WARMUP_TEXTS:
+            try:
+                self.generate_codes(text, max_new_tokens=WARMUP_TOKENS)
+            except Exception as e:
+                print(f"[{_ts()} FISH-ENGINE] torch.compile unavailable ({type(e).__name__}: {e}) → eager")
+                torch._dynamo.reset()
+                self.decode_one_token = decode_one_token_ar
+                self.model._cached_prompt = None
+                self.compiled = False
+                self.compile_error = f"{type(e).__name__}: {e}"[:300]
+                self.warmup = []
+                return
+            self.warmup.append({"text_chars": len(text), **self.last})
+            print(f"[{_ts()} FISH-ENGINE] Warm-up {len(text)} chars: first token {self.last['first_token_s']}s, "
+                  f"steady {self.last['steady_tokens_per_sec']} tok/s")
+
+    @torch.inference_mode()
+    def encode_reference(self, audio_path: str | Path) -> torch.Tensor:
+        """VQ prompt codes (num_codebooks × frames, CPU) for a reference clip.
+
+        Goes through fish_speech's ReferenceLoader, so a voice is encoded once: later
+        calls hit its in-memory ref_by_hash, later sessions the persistent code_cache.
+        """
+        from fish_speech.utils.schema import ServeReferenceAudio
+
+        ref = ServeReferenceAudio(audio=Path(audio_path).read_bytes(), text="")
+        tokens, _ = self.references.load_by_hash([ref], use_cache="on")
+        return torch.as_tensor(tokens[0]).cpu()
+
+    def generate_codes(
+        self,
+        text: str,
+        prompt_text: str | None = None,
+        prompt_tokens: torch.Tensor | None = None,
+        temperature: float = 0.7,
+        top_p: float = 0.7,
+        repetition_penalty: float = 1.1,
+        max_new_tokens: int = 0,
+    ) -> torch.Tensor:
+        """Semantic codes for one text chunk; timing and memory land in ``self.last``."""
+        return next(self.generate_session(
+            [text], prompt_text, prompt_tokens, temperature, top_p, repetition_penalty, max_new_tokens,
+        ))
+
+    def generate_session(
+        self,
+        texts: list[str],
+        prompt_text: str | None = None,
+        prompt_tokens: torch.Tensor | None = None,
+        temperature: float = 0.7,
+        top_p: float = 0.7,
+        repetition_penalty: float = 1.1,
+        max_new_tokens: int = 0,
+    ):
+        """Generator over one generate_long session: yields each text's codes (CPU) in order.
+
+        The reference prompt is prefilled once; every later segment reuses its K/V
+        and only prefills its own text. The prefix is also kept between calls, so
+        separate chunks of the same voice skip the reference prefill as well.
+        """
+        from fish_speech.models.text2semantic.inference import generate_long
+
+        use_prompt = prompt_tokens is not None
+        # Time every decode step: the first one starts right after prefill + first token,
+        # the rest give the steady-state rate (decode_n_tokens syncs on EOS every step)
+        starts, ends = [], []
+        decode_one_token = self.decode_one_token
+
+        def timed_decode(*args, **kwargs):
+            starts.append(time.perf_counter())
+            out = decode_one_token(*args, **kwargs)
+            ends.append(time.perf_counter())
+            return out
+
+        if self.device.startswith("cuda"):
+            torch.cuda.synchronize(self.device)
+        t0 = time.perf_counter()
+        for response in generate_long(
+            model=self.model,
+            device=self.device,
+            decode_one_token=timed_decode,
+            text=list(texts),
+            max_new_tokens=max_new_tokens,
+            top_p=top_p,
+            repetition_penalty=repetition_penalty,
+            temperature=temperature,
+            prompt_text=[prompt_text or ""] if use_prompt else None,
+            prompt_tokens=[prompt_tokens] if use_prompt else None,
+            reuse_prompt_prefix=True,
+        ):
+            if response.action != "sample":
+                continue
+            if self.device.startswith("cuda"):
+                torch.cuda.synchronize(self.device)
+            elapsed = time.perf_counter() - t0
+
+            codes = response.codes.cpu()
+            steady = (len(ends) - 1) / (ends[-1] - ends[0]) if len(ends) > 2 else None
+            self.last = {
+                "tokens": codes.shape[1],
+                "seconds": round(elapsed, 3),
+                "tokens_per_sec": round(codes.shape[1] / elapsed, 2) if elapsed > 0 else None,
+                "first_token_s": round(starts[0] - t0, 3) if starts else round(elapsed, 3),
+                "steady_tokens_per_sec": round(steady, 2) if steady else None,
+                "compiled": self.compiled,
+                **_memory_mb(self.device),
+            }
+            print(f"[{_ts()} FISH-ENGINE] {codes.shape[1]} tokens in {elapsed:.2f}s "
+                  f"({self.last['tokens_per_sec']} tok/s, steady {self.last['steady_tokens_per_sec']})")
+            yield codes
+            starts.clear()
+            ends.clear()
+            t0 = time.perf_counter()
+
+    def decode(self, codes: torch.Tensor) -> tuple[np.ndarray, int]:
+        return self.decode_batch([codes])[0], self.sample_rate
+
+    @torch.inference_mode()
+    def decode_batch(self, codes_list: list[torch.Tensor], max_frames: int = FISH_DECODE_MAX_FRAMES) -> list[np.ndarray]:
+        """Decode several chunks' codes with as few padded DAC passes as fit in ``max_frames``.
+
+        Chunks are grouped longest-first so each batch pads to a similar length;
+        a batch grows while (batch size × its longest chunk) stays within max_frames.
+        Waveforms come back in input order at ``self.sample_rate``.
+        """
+        from fish_speech.models.dac.inference import decode_batch
+
+        order = sorted(range(len(codes_list)), key=lambda i: codes_list[i].shape[1], reverse=True)
+        groups, group = [], []
+        for i in order:
+            if group and codes_list[group[0]].shape[1] * (len(group) + 1) > max_frames:
+                groups.append(group)
+                group = []
+            group.append(i)
+        if group:
+            groups.append(group)
+
+        out = [None] * len(codes_list)
+        t0 = time.perf_counter()
+        for group in groups:
+            audios = decode_batch(self.codec, [codes_list[i] for i in group])
+            for i, audio in zip(group, audios):
+                out[i] = audio.float().cpu().numpy()
+        if len(codes_list) > 1:
+            print(f"[{_ts()} FISH-ENGINE] Decoded {len(codes_list)} chunks in {len(groups)} "
+                  f"DAC batch(es), {time.perf_counter() - t0:.2f}s")
+        return out
+
+    def status(self) -> dict:
+        return {
+            "device": self.device,
+            "checkpoint": self.checkpoint.name,
+            "quant": self.quant,
+            "weights_mb": self.weights_mb,
+            "load_seconds": self.load_seconds,
+            "compiled": self.compiled,
+            "compile_error": self.compile_error,
+            "warmup": self.warmup,
+            "last_generation": self.last,
+        }
+
+
+def load_engine(device: str, quant: str | None = None, compile: bool = False) -> FishEngine:
+    global engine
+    checkpoint = ensure_quantized(quant) if quant else FISH_MODEL_DIR
+    if engine is not None and engine.device == device and engine.checkpoint == checkpoint \
+            and engine.compile_requested == compile:
+        return engine
+    unload_engine()
+    engine = FishEngine(device, checkpoint, compile=compile)
+    return engine
+
+
+def unload_engine() -> None:
+    global engine
+    if engine is None:
+        return
+    engine = None
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    print(f"[{_ts()} FISH-ENGINE] Unloaded")
+
+
+def benchmark(device: str, modes=("none", "int8"), text: str = BENCH_TEXT, runs: int = 2,
+              max_new_tokens: int = 1024, compile: bool = False) -> dict:
+    """Load each mode in turn and time unprompted generation of the same text.
+
+    The resident engine is replaced while this runs – callers unload Fish first.
+    Every mode reports text2semantic weight size, load time (including compile
+    warm-up), tokens/sec, first-token latency and steady-state tokens/sec (means
+    over ``runs`` after one untimed warm-up) and peak memory; ``relative`` compares
+    each mode with "none" (the bf16 baseline) when it was part of the run.
+    """
+    unload_engine()
+    results = []
+    for mode in modes:
+        quant = None if mode in (None, "none") else mode
+        print(f"[{_ts()} FISH-BENCH] Mode {mode} on {device}")
+        eng = FishEngine(device, ensure_quantized(quant) if quant else FISH_MODEL_DIR, compile=compile)
+        try:
+            eng.generate_codes("Warm up.", max_new_tokens=64)
+            runs_stats = []
+            for r in range(runs):
+                torch.manual_seed(r)
+                if device.startswith("cuda"):
+                    torch.cuda.reset_peak_memory_stats(device)
+                eng.generate_codes(text, max_new_tokens=max_new_tokens)
+                runs_stats.append(eng.last)
+
+            def mean(key):
+                vals = [st[key] for st in runs_stats if st[key] is not None]
+                return round(sum(vals) / len(vals), 3) if vals else None
+
+            results.append({
+                "mode": mode,
+                "checkpoint": eng.checkpoint.name,
+                "compiled": eng.compiled,
+                "compile_error": eng.compile_error,
+                "weights_mb": eng.weights_mb,
+                "load_seconds": eng.load_seconds,
+                "tokens_per_sec": mean("tokens_per_sec"),
+                "first_token_s": mean("first_token_s"),
+                "steady_tokens_per_sec": mean("steady_tokens_per_sec"),
+                **{k: v for k, v in eng.last.items() if k.endswith("_mb")},
+            })
+        finally:
+            del eng
+            if device.startswith("cuda"):
+                torch.cuda.empty_cache()
+
+    base = next((r for r in results if r["mode"] in (None, "none")), None)
+    if base:
+        for r in results:
+            r["relative"] = {
+                "speed": round(r["tokens_per_sec"] / base["tokens_per_sec"], 3),
+                "weights": round(r["weights_mb"] / base["weights_mb"], 3),
+            }
+    return {"device": device, "compile": compile, "text_chars": len(text), "runs": runs, "results": results}
@@ -5,19 +5,32 @@ Kokoro TTS model loader and voice manager.
 Handles:
 - Automatic download of the Kokoro-82M model from HuggingFace if missing
 - Proper eSpeak-ng phonemizer setup (required for English phoneme generation)
-- Global pipeline lifecycle (load/unload with GPU memory cleanup)
+- Global model lifecycle (load/unload with GPU memory cleanup): one resident KModel
+  shared by per-language G2P pipelines (get_pipeline), each created on first use –
+  the language comes from the voice prefix (af_/bf_/ef_/... → a/b/e/...) or the
+  request's "lang_code"
+- A shared voice-pack cache, stored on the model's device; the 20 English voices
+  are preloaded on load when KOKORO_PRELOAD_VOICES is set
+- Phoneme caching (models/kokoro_g2p_cache) in front of the pipeline's G2P
+- Backend choice: eager PyTorch, or ONNX Runtime on CPU (models/kokoro_onnx)
+- Optional CPU worker pool (models/kokoro_pool) instead of the in-process pipeline
 - Exposure of the fixed list of 20 high-quality English voices
 
 The actual inference is performed via the `KPipeline` class from the official
 `kokoro` package. This module only manages loading and voice enumeration.
 """
 import os
+import threading
 import torch
 import logging
 from pathlib import Path
-from huggingface_hub import snapshot_download
+from huggingface_hub import snapshot_download, hf_hub_download
 from kokoro import KPipeline
-from config import KOKORO_MODEL_DIR, resolve_device, ESPEAK_DIR
+from config import KOKORO_MODEL_DIR, KOKORO_G2P_CACHE, KOKORO_BACKEND, KOKORO_ONNX_THREADS, resolve_device, ESPEAK_DIR
+from config import KOKORO_POOL_WORKERS, KOKORO_POOL_THREADS, KOKORO_PRELOAD_VOICES
+from models.kokoro_g2p_cache import install as install_g2p_cache
+import models.kokoro_onnx as kokoro_onnx
+import models.kokoro_pool as kokoro_pool
 
 DLL_PATH = ESPEAK_DIR / "libespeak-ng.dll"
 DATA_DIR = ESPEAK_DIR / "espeak-ng-data"
@@ -26,9 +39,18 @@ from phonemizer.backend.espeak.wrapper import EspeakWrapper
 EspeakWrapper.library_path = str(DLL_PATH)
 EspeakWrapper.data_path = str(DATA_DIR)
 
-pipeline = None
+REPO_ID = "hexgrad/Kokoro-82M"
+LANG_CODES = "abefhijpz"   # first letter of every Kokoro voice name: af_heart → a, ff_siwis → f, ...
+
+pipeline = None      # English ('a') pipeline, kept for callers that predate get_pipeline
+kmodel = None        # the one KModel (or OnnxKModel) every language pipeline shares
+pipelines = {}       # lang_code → KPipeline
+voice_packs = None   # VoicePacks shared as KPipeline.voices by every pipeline
 model_loaded = False
 device_id = None
+backend = None
+workers = 0
+_pipelines_lock = threading.Lock()
 
 ENGLISH_VOICES = [
     "af_heart", "af_alloy", "af_aoede", "af_bella", "af_jessica", "af_kore",
@@ -40,28 +62,114 @@ ENGLISH_VOICES = [
 def _debug(msg: str):
     print(f"[KOKORO DEBUG] {msg}")
 
-def load_kokoro(device=None):
+class VoicePacks(dict):
+    """Shared ``KPipeline.voices``: each pack is moved to the model's device once, when stored."""
+
+    def __init__(self, device):
+        super().__init__()
+        self.device = device
+
+    def __setitem__(self, voice, pack):
+        super().__setitem__(voice, pack.to(self.device))
+
+def create_model(backend: str, dev: str, threads: int = KOKORO_ONNX_THREADS):
+    """KModel on ``dev`` for "torch", or an ONNX Runtime stand-in for "onnx" / "onnx-int8"."""
+    if backend == "torch":
+        from kokoro import KModel
+        return KModel(repo_id=REPO_ID).to(dev).eval()
+    if backend not in kokoro_onnx.BACKENDS:
+        raise ValueError(f"Unknown Kokoro backend '{backend}' (use one of {kokoro_onnx.BACKENDS})")
+    missing = kokoro_onnx.missing_packages(int8=backend == "onnx-int8")
+    if missing:
+        raise RuntimeError(f"Kokoro backend '{backend}' not installed: pip install {' '.join(missing)}")
+    return kokoro_onnx.load_session(int8=backend == "onnx-int8", threads=threads)
+
+def make_pipeline(lang_code: str, model, voices: dict | None = None) -> KPipeline:
+    """G2P-only KPipeline for ``lang_code`` that renders with an existing model."""
+    pipe = KPipeline(lang_code=lang_code, repo_id=REPO_ID, model=False)
+    pipe.model = model
+    if voices is not None:
+        pipe.voices = voices
+    pipe.model_dir = str(KOKORO_MODEL_DIR)
+    if KOKORO_G2P_CACHE:
+        install_g2p_cache(pipe)
+    return pipe
+
+def create_pipeline(backend: str, dev: str, threads: int = KOKORO_ONNX_THREADS) -> KPipeline:
+    """Stand-alone English pipeline with its own model (benchmarks)."""
+    return make_pipeline("a", create_model(backend, dev, threads))
+
+def lang_for_voice(voice: str, default: str = "a") -> str:
+    code = (voice or "")[:1].lower()
+    return code if code in LANG_CODES else default
+
+def get_pipeline(lang_code: str = "a") -> KPipeline:
+    """Pipeline for ``lang_code``, created on first use around the shared model and voice packs."""
+    if kmodel is None:
+        raise RuntimeError("Kokoro is not loaded in this process")
+    lang_code = lang_code.lower()
+    with _pipelines_lock:
+        pipe = pipelines.get(lang_code)
+        if pipe is None:
+            _debug(f"Creating '{lang_code}' G2P pipeline on the shared model")
+            pipe = make_pipeline(lang_code, kmodel, voice_packs)
+            pipelines[lang_code] = pipe
+        return pipe
+
+def _voice_file(voice: str) -> str:
+    local = KOKORO_MODEL_DIR / "voices" / f"{voice}.pt"
+    return str(local) if local.exists() else hf_hub_download(repo_id=REPO_ID, filename=f"voices/{voice}.pt")
+
+def preload_voices(voices) -> int:
+    """Load voice packs into the shared cache ahead of the first request; returns how many were new."""
+    loaded = 0
+    for voice in voices:
+        if voice in voice_packs:
+            continue
+        try:
+            voice_packs[voice] = torch.load(_voice_file(voice), weights_only=True)
+            loaded += 1
+        except Exception as e:
+            _debug(f"Voice {voice} not preloaded: {e}")
+    return loaded
+
+def load_kokoro(device=None, backend_name=None, pool_workers=None):
     """Load the Kokoro-82M model and create the inference pipeline.
 
     Automatically downloads the model on first use if not present.
 
     Args:
         device: Target device string (e.g. "cuda:0", "cpu"). Resolved via config if None.
+        backend_name: "torch" | "onnx" | "onnx-int8" (default KOKORO_BACKEND). The ONNX
+            backends run on CPU; the export is built and cached on first use.
+        pool_workers: > 0 starts that many CPU worker processes (models/kokoro_pool)
+            instead of the in-process pipeline; `pipeline` stays None. Default KOKORO_POOL_WORKERS.
 
     Returns:
         Tuple[bool, str]: (success, status message)
     """
-    global pipeline, model_loaded, device_id
+    global pipeline, kmodel, voice_packs, model_loaded, device_id, backend, workers
     dev = device if device is not None else resolve_device(None)
-
-    if model_loaded and device_id != dev:
-        _debug(f"Device change {device_id} to {dev}, unloading")
+    wanted = backend_name or KOKORO_BACKEND
+    n_workers = max(0, int(KOKORO_POOL_WORKERS if pool_workers is None else pool_workers))
+    if (wanted != "torch" or n_workers) and dev != "cpu":
+        _debug(f"Backend {wanted}{' pool' if n_workers else ''} is CPU-only, ignoring device {dev}")
+        dev = "cpu"
+
+    if model_loaded and (device_id != dev or backend != wanted or workers != n_workers):
+        _debug(f"Change {backend}@{device_id} x{workers} to {wanted}@{dev} x{n_workers}, unloading")
         unload_kokoro()
 
     if model_loaded:
         _debug("Already loaded")
         return True, "Kokoro already loaded"
 
+    missing = kokoro_onnx.missing_packages(int8=wanted == "onnx-int8") if wanted != "torch" else []
+    if missing:
+        err = f"Kokoro backend '{wanted}' not installed: pip install {' '.join(missing)}"
+        _debug(err)
+        return False, err
+
     try:
         if not KOKORO_MODEL_DIR.exists() or not any(KOKORO_MODEL_DIR.iterdir()):
             _debug(f"Downloading model to {KOKORO_MODEL_DIR}")
@@ -72,16 +180,25 @@ def load_kokoro(device=None):
             )
             _debug("Download complete")
 
-        _debug(f"Creating KPipeline on {dev}")
-        pipeline = KPipeline(lang_code="a", device=dev)  # 'a' = English
-        pipeline.model_dir = str(KOKORO_MODEL_DIR)
-        _debug(f"Pipeline ready, model_dir = {pipeline.model_dir}")
+        if n_workers:
+            _debug(f"Starting {n_workers} CPU worker(s) ({wanted})")
+            kokoro_pool.start_pool(n_workers, KOKORO_POOL_THREADS, wanted)
+        else:
+            _debug(f"Creating KModel on {dev} ({wanted})")
+            kmodel = create_model(wanted, dev)
+            voice_packs = VoicePacks(kmodel.device)
+            pipeline = get_pipeline("a")  # 'a' = English
+            if KOKORO_PRELOAD_VOICES:
+                _debug(f"Preloaded {preload_voices(ENGLISH_VOICES)} voice pack(s) on {kmodel.device}")
+            _debug(f"Pipeline ready, model_dir = {pipeline.model_dir}")
 
         model_loaded = True
         device_id = dev
-        logging.info(f"Kokoro loaded on {dev} with {len(ENGLISH_VOICES)} English voices")
+        backend = wanted
+        workers = n_workers
+        logging.info(f"Kokoro loaded on {dev} ({wanted}) with {len(ENGLISH_VOICES)} English voices")
         _debug(f"Load complete – type: {type(pipeline)}")
-        return True, f"Loaded on {dev}"
+        return True, f"Loaded on {dev} ({wanted}{f', {n_workers} workers' if n_workers else ''})"
 
     except Exception as e:
         err = f"Load failed: {type(e).__name__}: {e}"
@@ -90,16 +207,27 @@ def load_kokoro(device=None):
         return False, err
 
 def unload_kokoro():
-    global pipeline, model_loaded, device_id
-    if pipeline is not None:
-        _debug("Deleting pipeline")
-        del pipeline
+    global pipeline, kmodel, voice_packs, model_loaded, device_id, backend, workers
+    if kmodel is not None:
+        _debug(f"Deleting model and {len(pipelines)} pipeline(s)")
+        pipelines.clear()
         pipeline = None
+        kmodel = None
+        voice_packs = None
+    kokoro_pool.stop_pool()
     model_loaded = False
     device_id = None
+    backend = None
+    workers = 0
     torch.cuda.empty_cache()
     _debug("Unloaded")
     return True, "Unloaded"
 
 def get_voices():
-    return ENGLISH_VOICES
\ No newline at end of file
+    return ENGLISH_VOICES
+
+def status() -> dict:
+    return {
+        "languages": sorted(pipelines),
+        "voice_packs": sorted(voice_packs) if voice_packs is not None else [],
+    }
\ No newline at end of file
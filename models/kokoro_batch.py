@@ -0,0 +1,189 @@
+# models/kokoro_batch.py
+"""
+Batched Kokoro inference: several phoneme sequences, one KModel forward pass.
+
+KModel.forward_with_tokens only handles batch size 1 (pred_dur.squeeze(), a
+single alignment matrix, unpacked LSTMs, InstanceNorm over the whole time axis).
+``forward_batch`` runs the same graph on a right-padded batch:
+
+- text side (ALBERT, duration encoder, text encoder) with the attention masks
+  and packed LSTMs those modules already support; the duration LSTM is packed too
+- one alignment matrix per item, zero columns past each item's frame count
+- the shared F0/N LSTM packed by frame count
+- every AdaIN1d normalised over each item's valid frames only (and zeroed
+  beyond them), while the batch runs – patched once at class level, inactive
+  for other threads and for the normal KPipeline path
+
+Each item's audio is cut back to its own frame count. Item tails still see
+padding through the conv context at the cut, and the output has not been
+compared against batch-1 renders, so this path is opt-in: /kokoro_infer only
+uses it when KOKORO_BATCH_SIZE (or the request's "batch_size") is above 1.
+It is meant for GPUs; on CPU a batch of 2-4 may keep more cores busy.
+"""
+import re
+import threading
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+_state = threading.local()
+_patched = False
+
+MAX_PHONEMES = 510
+
+
+def _install_masked_adain() -> None:
+    """Route AdaIN1d through a length-aware instance norm while a batch is running."""
+    global _patched
+    if _patched:
+        return
+    from kokoro.istftnet import AdaIN1d
+
+    original = AdaIN1d.forward
+
+    def forward(self, x, s):
+        frames = getattr(_state, "frames", None)
+        if frames is None or x.shape[0] != frames.shape[0]:
+            return original(self, x, s)
+        total = _state.total
+        L = x.shape[-1]
+        valid = ((frames * L + total // 2) // total).clamp(1, L)
+        mask = (torch.arange(L, device=x.device)[None, :] < valid[:, None]).unsqueeze(1).to(x.dtype)
+        n = valid.view(-1, 1, 1).to(x.dtype)
+        mean = (x * mask).sum(-1, keepdim=True) / n
+        var = (((x - mean) * mask) ** 2).sum(-1, keepdim=True) / n
+        norm = (x - mean) * torch.rsqrt(var + self.norm.eps)
+        if self.norm.affine:
+            norm = norm * self.norm.weight.view(1, -1, 1) + self.norm.bias.view(1, -1, 1)
+        h = self.fc(s)
+        h = h.view(h.size(0), h.size(1), 1)
+        gamma, beta = torch.chunk(h, chunks=2, dim=1)
+        return ((1 + gamma) * norm + beta) * mask
+
+    AdaIN1d.forward = forward
+    _patched = True
+
+
+def _packed_lstm(lstm: nn.LSTM, x: torch.Tensor, lengths: torch.Tensor, total: int) -> torch.Tensor:
+    """Bidirectional LSTM over [B, T, C] that ignores the padded steps of each row."""
+    packed = nn.utils.rnn.pack_padded_sequence(x, lengths.cpu(), batch_first=True, enforce_sorted=False)
+    lstm.flatten_parameters()
+    out, _ = lstm(packed)
+    out, _ = nn.utils.rnn.pad_packed_sequence(out, batch_first=True, total_length=total)
+    return out
+
+
+@torch.no_grad()
+def forward_batch(model, phonemes: list[str], ref_s: torch.Tensor, speed: float = 1.0) -> list[np.ndarray]:
+    """Render ``phonemes`` (one string per item) with per-item style rows ``ref_s`` [B, 256].
+
+    Returns one float32 waveform per item, in input order.
+    """
+    _install_masked_adain()
+    device = model.device
+    ids = []
+    for ps in phonemes:
+        tok = [i for i in (model.vocab.get(p) for p in ps) if i is not None]
+        assert len(tok) + 2 <= model.context_length, (len(tok) + 2, model.context_length)
+        ids.append([0, *tok, 0])
+
+    B = len(ids)
+    T = max(len(t) for t in ids)
+    input_ids = torch.zeros((B, T), dtype=torch.long, device=device)
+    for b, t in enumerate(ids):
+        input_ids[b, :len(t)] = torch.tensor(t, device=device)
+    input_lengths = torch.tensor([len(t) for t in ids], dtype=torch.long, device=device)
+    text_mask = torch.arange(T, device=device)[None, :] >= input_lengths[:, None]
+    ref_s = ref_s.to(device)
+    s = ref_s[:, 128:]
+
+    # ─── text side: durations ─────────────────────────────────────────
+    bert_dur = model.bert(input_ids, attention_mask=(~text_mask).int())
+    d_en = model.bert_encoder(bert_dur).transpose(-1, -2)
+    d = model.predictor.text_encoder(d_en, s, input_lengths, text_mask)
+    x = _packed_lstm(model.predictor.lstm, d, input_lengths, T)
+    duration = torch.sigmoid(model.predictor.duration_proj(x)).sum(axis=-1) / speed
+    pred_dur = torch.round(duration).clamp(min=1).long()
+    pred_dur = pred_dur.masked_fill(text_mask, 0)
+    frames = pred_dur.sum(-1)
+    F = int(frames.max())
+
+    aln = torch.zeros((B, T, F), device=device)
+    for b in range(B):
+        n = int(input_lengths[b])
+        idx = torch.repeat_interleave(torch.arange(n, device=device), pred_dur[b, :n])
+        aln[b, idx, torch.arange(idx.shape[0], device=device)] = 1
+
+    # ─── frame side: prosody + decoder with per-item frame masks ──────
+    _state.frames, _state.total = frames, F
+    try:
+        en = d.transpose(-1, -2) @ aln
+        shared = _packed_lstm(model.predictor.shared, en.transpose(-1, -2), frames, F).transpose(-1, -2)
+        F0, N = shared, shared
+        for block in model.predictor.F0:
+            F0 = block(F0, s)
+        for block in model.predictor.N:
+            N = block(N, s)
+        f0_mask = (torch.arange(2 * F, device=device)[None, :] < 2 * frames[:, None]).to(en.dtype)
+        F0_pred = model.predictor.F0_proj(F0).squeeze(1) * f0_mask
+        N_pred = model.predictor.N_proj(N).squeeze(1) * f0_mask
+
+        t_en = model.text_encoder(input_ids, input_lengths, text_mask)
+        asr = t_en @ aln
+        audio = model.decoder(asr, F0_pred, N_pred, ref_s[:, :128])
+    finally:
+        _state.frames = _state.total = None
+
+    audio = audio.reshape(B, -1).float().cpu()
+    per_frame = audio.shape[-1] / F
+    return [audio[b, :int(round(int(frames[b]) * per_frame))].numpy() for b in range(B)]
+
+
+def phonemize(pipeline, text: str) -> list[str]:
+    """Phoneme strings KPipeline would render for ``text`` (same splitting, no audio)."""
+    out = []
+    for segment in re.split(r"\n+", text.strip()):
+        if not segment.strip():
+            continue
+        if pipeline.lang_code in "ab":
+            _, tokens = pipeline.g2p(segment)
+            for _, ps, _ in pipeline.en_tokenize(tokens):
+                if ps:
+                    out.append(ps[:MAX_PHONEMES])
+        else:
+            ps, _ = pipeline.g2p(segment)
+            if ps:
+                out.append(ps[:MAX_PHONEMES])
+    return out
+
+
+def infer_chunks(pipeline, texts: list[str], voice: str, speed: float = 1.0,
+                 batch_size: int = 4) -> list[np.ndarray]:
+    """Render several chunks with one voice; returns each chunk's concatenated waveform.
+
+    All segments of all chunks are sorted by length and run ``batch_size`` at a
+    time, so similarly long sequences share a forward pass and padding stays small.
+    """
+    model = pipeline.model
+    pack = pipeline.load_voice(voice).to(model.device)
+    segments = [(c, ps) for c, text in enumerate(texts) for ps in phonemize(pipeline, text)]
+    order = sorted(range(len(segments)), key=lambda k: len(segments[k][1]))
+
+    audio = [None] * len(segments)
+    for start in range(0, len(order), batch_size):
+        group = order[start:start + batch_size]
+        ps_list = [segments[k][1] for k in group]
+        ref_s = torch.cat([pack[len(ps) - 1] for ps in ps_list], dim=0)
+        for k, wav in zip(group, forward_batch(model, ps_list, ref_s, speed)):
+            audio[k] = wav
+
+    results = []
+    for c in range(len(texts)):
+        parts = [audio[k] for k, (owner, _) in enumerate(segments) if owner == c]
+        if not parts:
+            raise ValueError(f"No phonemes for chunk {c}")
+        results.append(np.concatenate(parts, axis=0))
+    print(f"[KOKORO-BATCH] {len(texts)} chunk(s), {len(segments)} segment(s) in "
+          f"{(len(order) + batch_size - 1) // batch_size} forward pass(es)")
+    return results
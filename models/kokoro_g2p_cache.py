@@ -0,0 +1,197 @@
+# models/kokoro_g2p_cache.py
+"""
+Persistent G2P (phonemizer) cache for Kokoro.
+
+KPipeline phonemizes every text segment it is handed – misaki + the eSpeak-ng
+fallback for English, plain eSpeak-ng for the other languages – and it does so
+again on every retry, recovery pass, voice or speed change. The result only
+depends on the language and the text, so it is cached here keyed by
+(lang_code, normalized segment):
+
+- a small in-memory LRU in front of
+- a SQLite file under KOKORO_MODEL_DIR (rows tagged with the misaki/kokoro
+  versions, so upgrading the phonemizer never reuses stale phonemes).
+
+config.KOKORO_G2P_CACHE = False turns it off.
+
+``CachedG2P`` wraps ``pipeline.g2p`` in place and returns exactly what the
+wrapped g2p returns: ``(phonemes, tokens)`` for English (fresh MToken objects
+each call – KPipeline mutates them for timestamps), ``(phonemes, None)`` otherwise.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from importlib.metadata import version, PackageNotFoundError
+from pathlib import Path
+
+from config import KOKORO_MODEL_DIR
+
+DB_PATH      = KOKORO_MODEL_DIR / "g2p_cache.sqlite"
+MEMORY_ITEMS = 4096    # a few hundred bytes per segment
+
+
+def normalize(text: str) -> str:
+    """NFC + collapsed whitespace. Case and punctuation are kept – both change the phonemes."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def g2p_tag() -> str:
+    parts = []
+    for pkg in ("misaki", "kokoro"):
+        try:
+            parts.append(f"{pkg}={version(pkg)}")
+        except PackageNotFoundError:
+            parts.append(f"{pkg}=?")
+    return hashlib.sha256(";".join(parts).encode()).hexdigest()[:12]
+
+
+def _pack_tokens(tokens) -> list | None:
+    if tokens is None:
+        return None
+    return [[t.text, t.tag, t.whitespace, t.phonemes] for t in tokens]
+
+
+def _unpack_tokens(rows: list | None):
+    if rows is None:
+        return None
+    from misaki.token import MToken
+    return [MToken(text=text, tag=tag, whitespace=ws, phonemes=ps) for text, tag, ws, ps in rows]
+
+
+class KokoroG2PCache:
+    def __init__(self, path: Path = DB_PATH, memory_items: int = MEMORY_ITEMS):
+        self.path = Path(path)
+        self.memory_items = memory_items
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._tag = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def tag(self) -> str:
+        if self._tag is None:
+            self._tag = g2p_tag()
+        return self._tag
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS g2p ("
+                " lang TEXT, text TEXT, tag TEXT, phonemes TEXT, tokens TEXT,"
+                " PRIMARY KEY (lang, text, tag))"
+            )
+            self._db.commit()
+        return self._db
+
+    def get(self, lang: str, text: str) -> tuple | None:
+        """``(phonemes, packed_tokens)`` for a normalized segment, or None on a miss."""
+        key = (lang, text)
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return self._mem[key]
+            try:
+                row = self._conn().execute(
+                    "SELECT phonemes, tokens FROM g2p WHERE lang = ? AND text = ? AND tag = ?",
+                    (lang, text, self.tag),
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[KOKORO-G2P] Cache read failed, phonemizing: {e}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            entry = (row[0], json.loads(row[1]) if row[1] is not None else None)
+            self.hits += 1
+            self._remember(key, entry)
+            return entry
+
+    def put(self, lang: str, text: str, phonemes: str, tokens) -> None:
+        entry = (phonemes, _pack_tokens(tokens))
+        with self._lock:
+            self._remember((lang, text), entry)
+            try:
+                db = self._conn()
+                db.execute(
+                    "INSERT OR REPLACE INTO g2p VALUES (?, ?, ?, ?, ?)",
+                    (lang, text, self.tag, phonemes,
+                     json.dumps(entry[1], ensure_ascii=False) if entry[1] is not None else None),
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"[KOKORO-G2P] Cache write failed: {e}")
+
+    def _remember(self, key: tuple, entry: tuple) -> None:
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_items:
+            self._mem.popitem(last=False)
+
+    def clear(self, disk: bool = False) -> int:
+        with self._lock:
+            self._mem.clear()
+            if not disk or not self.path.exists():
+                return 0
+            db = self._conn()
+            removed = db.execute("DELETE FROM g2p").rowcount
+            db.commit()
+            db.execute("VACUUM")
+            return removed
+
+    def status(self) -> dict:
+        with self._lock:
+            disk_entries = 0
+            if self.path.exists():
+                try:
+                    disk_entries = self._conn().execute(
+                        "SELECT COUNT(*) FROM g2p WHERE tag = ?", (self.tag,)
+                    ).fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                "memory_entries": len(self._mem),
+                "disk_entries": disk_entries,
+                "disk_kb": round(self.path.stat().st_size / 1024, 1) if self.path.exists() else 0.0,
+                "g2p_tag": self.tag,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+g2p_cache = KokoroG2PCache()
+
+
+class CachedG2P:
+    """Drop-in replacement for ``KPipeline.g2p`` that consults ``g2p_cache`` first."""
+
+    def __init__(self, g2p, lang_code: str, cache: KokoroG2PCache = g2p_cache):
+        self.g2p = g2p
+        self.lang_code = lang_code
+        self.cache = cache
+
+    def __call__(self, text: str):
+        text = normalize(text)
+        hit = self.cache.get(self.lang_code, text)
+        if hit is not None:
+            return hit[0], _unpack_tokens(hit[1])
+        phonemes, tokens = self.g2p(text)
+        self.cache.put(self.lang_code, text, phonemes, tokens)
+        return phonemes, tokens
+
+    def __getattr__(self, name):
+        return getattr(self.g2p, name)
+
+
+def install(pipeline) -> None:
+    """Wrap ``pipeline.g2p`` once (idempotent)."""
+    if not isinstance(pipeline.g2p, CachedG2P):
+        pipeline.g2p = CachedG2P(pipeline.g2p, pipeline.lang_code)
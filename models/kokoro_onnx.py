@@ -0,0 +1,224 @@
+# models/kokoro_onnx.py
+"""
+ONNX Runtime backend for Kokoro on CPU.
+
+The Kokoro-82M checkpoint in KOKORO_MODEL_DIR is exported once to ONNX
+(KModel with disable_complex=True, the export-friendly STFT) and cached under
+KOKORO_ONNX_DIR, tagged with the checkpoint's size + mtime. The int8 variant is
+built from that export with onnxruntime's dynamic (weight-only) quantization.
+
+``OnnxKModel`` quacks like a KModel for KPipeline – ``vocab``, ``device`` and
+``model(phonemes, ref_s, speed, return_output=True)`` – so models/kokoro.py
+hands it to a G2P-only KPipeline and the rest of the app keeps calling
+``pipeline(text, voice=..., speed=...)`` unchanged.
+
+The backend is picked with config.KOKORO_BACKEND ("torch" | "onnx" |
+"onnx-int8") or "backend" on /kokoro_load; ONNX sessions always run on CPU.
+POST /kokoro_benchmark (``benchmark``) compares the real-time factor of each
+backend on the machine at hand. Needs the optional onnxruntime package (and
+onnx for the int8 build).
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from config import KOKORO_MODEL_DIR, KOKORO_ONNX_THREADS
+
+KOKORO_ONNX_DIR = KOKORO_MODEL_DIR / "onnx"
+OPSET           = 17
+BACKENDS        = ("torch", "onnx", "onnx-int8")
+BENCH_TEXT      = ("The quick brown fox jumps over the lazy dog. "
+                   "She sells seashells by the seashore, and the shells she sells are surely seashells. "
+                   "A journey of a thousand miles begins with a single step.")
+
+
+def _ts() -> str:
+    return time.strftime("%H:%M:%S")
+
+
+def missing_packages(int8: bool = False) -> list[str]:
+    """Optional pip packages the ONNX backend needs that are not installed (onnx for the int8 build)."""
+    needed = ("onnxruntime", "onnx") if int8 else ("onnxruntime",)
+    return [name for name in needed if importlib.util.find_spec(name) is None]
+
+
+def _checkpoint() -> Path:
+    ckpt = KOKORO_MODEL_DIR / "kokoro-v1_0.pth"
+    if not ckpt.exists():
+        found = sorted(KOKORO_MODEL_DIR.glob("*.pth"))
+        if not found:
+            raise FileNotFoundError(f"No Kokoro checkpoint (*.pth) in {KOKORO_MODEL_DIR}")
+        ckpt = found[0]
+    return ckpt
+
+
+def _source_tag() -> str:
+    st = _checkpoint().stat()
+    return hashlib.sha256(f"{st.st_size}:{int(st.st_mtime)}:{OPSET}".encode()).hexdigest()[:12]
+
+
+def onnx_path(int8: bool = False) -> Path:
+    return KOKORO_ONNX_DIR / f"kokoro-{_source_tag()}{'-int8' if int8 else ''}.onnx"
+
+
+def _export(target: Path) -> None:
+    from kokoro.model import KModel, KModelForONNX
+
+    print(f"[{_ts()} KOKORO-ONNX] Exporting {_checkpoint().name} → {target.name} (one-time, ~1 min)")
+    start = time.time()
+    kmodel = KModel(
+        repo_id="hexgrad/Kokoro-82M",
+        config=str(KOKORO_MODEL_DIR / "config.json"),
+        model=str(_checkpoint()),
+        disable_complex=True,
+    ).eval()
+    wrapper = KModelForONNX(kmodel).eval()
+    input_ids = torch.randint(1, 100, (1, 48), dtype=torch.long)
+    input_ids[0, 0] = input_ids[0, -1] = 0
+    style = torch.randn(1, 256)
+    speed = torch.tensor([1.0], dtype=torch.float32)
+
+    tmp = target.with_suffix(".tmp")
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper, (input_ids, style, speed), str(tmp),
+            input_names=["input_ids", "style", "speed"],
+            output_names=["waveform", "duration"],
+            dynamic_axes={"input_ids": {1: "input_ids_len"}, "waveform": {0: "num_samples"}},
+            opset_version=OPSET,
+            do_constant_folding=True,
+        )
+    tmp.replace(target)
+    del wrapper, kmodel
+    print(f"[{_ts()} KOKORO-ONNX] Export done in {time.time() - start:.1f}s "
+          f"({target.stat().st_size / 1024**2:.0f} MB)")
+
+
+def ensure_exported(int8: bool = False) -> Path:
+    """Path to the cached ONNX export (fp32 or int8), building it on first use."""
+    KOKORO_ONNX_DIR.mkdir(parents=True, exist_ok=True)
+    fp32 = onnx_path(False)
+    if not fp32.exists():
+        _export(fp32)
+    if not int8:
+        return fp32
+
+    target = onnx_path(True)
+    if not target.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"[{_ts()} KOKORO-ONNX] Quantizing {fp32.name} → {target.name} (int8 weights)")
+        tmp = target.with_suffix(".tmp")
+        quantize_dynamic(str(fp32), str(tmp), weight_type=QuantType.QInt8)
+        tmp.replace(target)
+        print(f"[{_ts()} KOKORO-ONNX] int8 model {target.stat().st_size / 1024**2:.0f} MB")
+    return target
+
+
+class OnnxKModel:
+    """KModel stand-in backed by an ONNX Runtime CPU session."""
+
+    def __init__(self, path: Path, threads: int = KOKORO_ONNX_THREADS):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.path = Path(path)
+        self.session = ort.InferenceSession(str(self.path), opts, providers=["CPUExecutionProvider"])
+        config = json.loads((KOKORO_MODEL_DIR / "config.json").read_text(encoding="utf-8"))
+        self.vocab = config["vocab"]
+        self.context_length = config["plbert"].get("max_position_embeddings", 512)
+        self.device = torch.device("cpu")
+        self.threads = threads
+
+    def __call__(self, phonemes: str, ref_s: torch.FloatTensor, speed: float = 1, return_output: bool = False):
+        from kokoro.model import KModel
+
+        input_ids = [i for i in (self.vocab.get(p) for p in phonemes) if i is not None]
+        assert len(input_ids) + 2 <= self.context_length, (len(input_ids) + 2, self.context_length)
+        waveform, duration = self.session.run(None, {
+            "input_ids": np.array([[0, *input_ids, 0]], dtype=np.int64),
+            "style": ref_s.detach().cpu().numpy().astype(np.float32).reshape(1, -1),
+            "speed": np.array([speed], dtype=np.float32),
+        })
+        audio = torch.from_numpy(waveform).squeeze()
+        pred_dur = torch.from_numpy(duration).squeeze().long()
+        return KModel.Output(audio=audio, pred_dur=pred_dur) if return_output else audio
+
+    def status(self) -> dict:
+        return {
+            "file": self.path.name,
+            "size_mb": round(self.path.stat().st_size / 1024**2, 1),
+            "threads": self.threads or os.cpu_count(),
+        }
+
+
+def load_session(int8: bool = False, threads: int = KOKORO_ONNX_THREADS) -> OnnxKModel:
+    return OnnxKModel(ensure_exported(int8), threads)
+
+
+def benchmark(backends=BACKENDS, text: str = BENCH_TEXT, voice: str = "af_heart",
+              runs: int = 3, threads: int = KOKORO_ONNX_THREADS) -> dict:
+    """Real-time factor of each backend on CPU for the same text and voice.
+
+    Every backend gets its own pipeline (the app's pipeline is left alone), one
+    untimed warm-up, then ``runs`` timed renders. RTF = render seconds / audio
+    seconds (lower is faster); ``relative`` is the speed-up over "torch".
+    ONNX backends whose packages are not installed are listed under ``skipped``.
+    """
+    from models.kokoro import create_pipeline
+
+    torch_threads = torch.get_num_threads()
+    if threads:
+        torch.set_num_threads(threads)
+    results, skipped = [], []
+    try:
+        for backend in backends:
+            missing = missing_packages(int8=backend == "onnx-int8") if backend != "torch" else []
+            if missing:
+                reason = f"not installed: pip install {' '.join(missing)}"
+                print(f"[{_ts()} KOKORO-BENCH] Skipping {backend} ({reason})")
+                skipped.append({"backend": backend, "reason": reason})
+                continue
+            print(f"[{_ts()} KOKORO-BENCH] Backend {backend}")
+            start = time.time()
+            pipe = create_pipeline(backend, "cpu", threads)
+            load_seconds = round(time.time() - start, 2)
+            try:
+                list(pipe("Warm up.", voice=voice))
+                times, audio_s = [], 0.0
+                for _ in range(runs):
+                    t0 = time.perf_counter()
+                    samples = sum(len(a) for _, _, a in pipe(text, voice=voice) if a is not None)
+                    times.append(time.perf_counter() - t0)
+                    audio_s = samples / 24000
+                mean = sum(times) / len(times)
+                results.append({
+                    "backend": backend,
+                    "load_seconds": load_seconds,
+                    "model_mb": round(pipe.model.path.stat().st_size / 1024**2, 1) if backend != "torch"
+                                else round(sum(p.numel() * p.element_size() for p in pipe.model.parameters()) / 1024**2, 1),
+                    "audio_seconds": round(audio_s, 2),
+                    "render_seconds": round(mean, 3),
+                    "rtf": round(mean / audio_s, 4) if audio_s else None,
+                })
+            finally:
+                del pipe
+        used_threads = torch.get_num_threads()
+    finally:
+        torch.set_num_threads(torch_threads)
+
+    base = next((r for r in results if r["backend"] == "torch"), None)
+    if base and base["rtf"]:
+        for r in results:
+            r["relative"] = {"speed": round(base["rtf"] / r["rtf"], 3) if r["rtf"] else None}
+    return {"device": "cpu", "threads": used_threads, "text_chars": len(text),
+            "voice": voice, "runs": runs, "results": results, "skipped": skipped}
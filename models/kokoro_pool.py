@@ -0,0 +1,256 @@
+# models/kokoro_pool.py
+"""
+Multi-process Kokoro rendering for CPU-only nodes.
+
+One Kokoro pipeline in the Flask process keeps only part of a many-core CPU
+busy (82M parameters, batch 1). KokoroPool starts N worker processes
+(models/kokoro_worker.py), each with its own pipeline, a fixed torch / ONNX
+Runtime thread budget and – where the OS allows – pinned to its own cores, so
+workers don't fight over the same cores.
+
+Jobs go into one shared queue and whichever worker is free takes the next
+chunk. ``submit`` returns a Future of the raw WAV path. /kokoro_infer submits
+every remaining chunk up front, then consumes the futures in chunk order, so
+post-processing, Whisper checks and job.json updates stay sequential and in order.
+
+The pool is used when config.KOKORO_POOL_WORKERS > 0 (environment variable of
+the same name, or "workers" on /kokoro_load, so each instance can pick its
+own). Each worker holds its own model copy, ~350 MB of RAM with torch.
+"""
+import itertools
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from pathlib import Path
+
+from config import KOKORO_G2P_CACHE
+
+WORKER_SCRIPT = Path(__file__).parent / "kokoro_worker.py"
+READY_TIMEOUT = 600    # first start may download the model / build the ONNX export
+RENDER_TIMEOUT = 300   # longest wait for one chunk once it is the next one needed
+
+pool = None
+
+
+def _ts() -> str:
+    return time.strftime("%H:%M:%S")
+
+
+def physical_cores() -> int:
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except ImportError:
+        return os.cpu_count() or 1
+
+
+def _pin(pid: int, cores: list[int]) -> bool:
+    """Restrict a worker to ``cores`` (Windows / Linux; silently skipped elsewhere)."""
+    try:
+        import psutil
+        psutil.Process(pid).cpu_affinity(cores)
+        return True
+    except Exception:
+        return False
+
+
+class KokoroPool:
+    def __init__(self, workers: int, threads: int = 0, backend: str = "torch", pin: bool = True):
+        self.workers = max(1, workers)
+        self.threads = threads or max(1, physical_cores() // self.workers)
+        self.backend = backend
+        self.jobs = queue.Queue()
+        self.procs = []
+        self.pinned = []
+        self._ids = itertools.count()
+        self._serving = []
+        self._live = 0
+        self._live_lock = threading.Lock()
+        self.rendered = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.audio_seconds = 0.0
+
+        if backend != "torch":
+            # Build the shared export once here, not N times in parallel in the workers
+            from models.kokoro_onnx import ensure_exported
+            ensure_exported(int8=backend == "onnx-int8")
+
+        start = time.time()
+        env = dict(os.environ,
+                   OMP_NUM_THREADS=str(self.threads), MKL_NUM_THREADS=str(self.threads),
+                   PYTHONIOENCODING="utf-8")
+        cmd = [sys.executable, str(WORKER_SCRIPT), "--threads", str(self.threads), "--backend", backend]
+        if KOKORO_G2P_CACHE:
+            cmd.append("--g2p-cache")
+        try:
+            try:
+                import psutil
+                available = psutil.Process().cpu_affinity()
+            except Exception:
+                available = list(range(os.cpu_count() or 1))
+            for k in range(self.workers):
+                proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        text=True, encoding="utf-8", bufsize=1, env=env)
+                cores = [available[(k * self.threads + c) % len(available)] for c in range(self.threads)]
+                self.pinned.append(cores if pin and _pin(proc.pid, cores) else None)
+                self.procs.append(proc)
+            for k, proc in enumerate(self.procs):
+                line = self._read_line(proc, READY_TIMEOUT)
+                if not line or not json.loads(line).get("ready"):
+                    raise RuntimeError(f"Kokoro worker {k} failed to start (exit code {proc.poll()})")
+        except Exception:
+            self.close()
+            raise
+        self.load_seconds = round(time.time() - start, 2)
+
+        self._live = len(self.procs)
+        for proc in self.procs:
+            t = threading.Thread(target=self._serve, args=(proc,), daemon=True)
+            t.start()
+            self._serving.append(t)
+        print(f"[{_ts()} KOKORO-POOL] {self.workers} worker(s) × {self.threads} thread(s) "
+              f"({backend}) ready in {self.load_seconds}s")
+
+    @staticmethod
+    def _read_line(proc: subprocess.Popen, timeout: float) -> str:
+        out = []
+        t = threading.Thread(target=lambda: out.append(proc.stdout.readline()), daemon=True)
+        t.start()
+        t.join(timeout)
+        return out[0] if out else ""
+
+    def _serve(self, proc: subprocess.Popen) -> None:
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            fut, req = job
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                proc.stdin.write(json.dumps(req) + "\n")
+                proc.stdin.flush()
+                line = proc.stdout.readline()
+                if not line:
+                    raise RuntimeError(f"Kokoro worker {proc.pid} exited (code {proc.poll()})")
+                reply = json.loads(line)
+            except Exception as e:
+                self.failed += 1
+                fut.set_exception(e)
+                print(f"[{_ts()} KOKORO-POOL] Worker {proc.pid} lost: {e}")
+                with self._live_lock:
+                    self._live -= 1
+                    last = self._live == 0
+                if last:
+                    dropped = self._fail_pending(RuntimeError("All Kokoro workers exited"))
+                    print(f"[{_ts()} KOKORO-POOL] No worker left, failed {dropped} queued chunk(s)")
+                return
+            if reply.get("ok"):
+                self.rendered += 1
+                self.busy_seconds += reply.get("seconds", 0.0)
+                self.audio_seconds += reply.get("audio_seconds", 0.0)
+                fut.set_result(reply["out"])
+            else:
+                self.failed += 1
+                fut.set_exception(RuntimeError(reply.get("error", "render failed")))
+
+    def _fail_pending(self, exc: Exception) -> int:
+        """Fail every queued chunk with ``exc`` (nothing is left to render them)."""
+        failed = 0
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                return failed
+            if job is not None and job[0].set_running_or_notify_cancel():
+                job[0].set_exception(exc)
+                failed += 1
+
+    def alive(self) -> int:
+        return sum(1 for p, t in zip(self.procs, self._serving) if p.poll() is None and t.is_alive())
+
+    def result(self, fut: Future, timeout: float = RENDER_TIMEOUT) -> str:
+        """``fut.result()`` that gives up when every worker is gone or after ``timeout`` seconds."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return fut.result(timeout=1.0)
+            except FutureTimeout:
+                if not self.alive():
+                    fut.cancel()
+                    raise RuntimeError("No Kokoro worker alive")
+                if time.monotonic() > deadline:
+                    fut.cancel()
+                    raise TimeoutError(f"Kokoro worker gave no result within {timeout:.0f}s")
+
+    def submit(self, text: str, voice: str, speed: float, out: str | Path, lang_code: str = "a") -> Future:
+        """Queue one chunk; the Future resolves to the raw WAV path written by a worker."""
+        if not self.alive():
+            raise RuntimeError("No Kokoro worker alive")
+        fut = Future()
+        self.jobs.put((fut, {"id": next(self._ids), "text": text, "voice": voice, "lang": lang_code,
+                             "speed": float(speed), "out": str(out)}))
+        if not self._live:   # the last worker died while this was being queued
+            self._fail_pending(RuntimeError("All Kokoro workers exited"))
+        return fut
+
+    def cancel_pending(self) -> int:
+        """Drop queued chunks (renders already running finish and are discarded)."""
+        dropped = 0
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                return dropped
+            if job is None:
+                self.jobs.put(None)
+                return dropped
+            if job[0].cancel():
+                dropped += 1
+
+    def close(self) -> None:
+        self.cancel_pending()
+        for _ in self._serving:
+            self.jobs.put(None)
+        for proc in self.procs:
+            try:
+                proc.stdin.close()
+                proc.wait(timeout=10)
+            except Exception:
+                proc.kill()
+        self.procs = []
+
+    def status(self) -> dict:
+        return {
+            "workers": self.workers,
+            "alive": self.alive(),
+            "threads_per_worker": self.threads,
+            "backend": self.backend,
+            "pinned_cores": self.pinned,
+            "load_seconds": self.load_seconds,
+            "queued": self.jobs.qsize(),
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "worker_rtf": round(self.busy_seconds / self.audio_seconds, 4) if self.audio_seconds else None,
+        }
+
+
+def start_pool(workers: int, threads: int = 0, backend: str = "torch") -> KokoroPool:
+    global pool
+    stop_pool()
+    pool = KokoroPool(workers, threads, backend)
+    return pool
+
+
+def stop_pool() -> None:
+    global pool
+    if pool is not None:
+        print(f"[{_ts()} KOKORO-POOL] Stopping {pool.workers} worker(s)")
+        pool.close()
+        pool = None
@@ -0,0 +1,105 @@
+# models/kokoro_worker.py
+"""
+One Kokoro render process for models/kokoro_pool (started as a script, never imported).
+
+Runs as `python models/kokoro_worker.py --threads N --backend torch`, so the
+child does not import the Flask app or the models package – only config, the
+G2P cache / ONNX helpers (loaded by path) and kokoro itself.
+
+Protocol, one JSON object per line:
+    stdout ← {"ready": true, "seconds": load time}               once, after loading
+    stdin  → {"id", "text", "voice", "lang", "speed", "out"}       one render
+    stdout ← {"id", "ok": true, "out", "audio_seconds", "seconds"} raw 24 kHz float WAV at "out"
+           | {"id", "ok": false, "error"}
+Everything else the libraries print goes to stderr (the app's console).
+"""
+import argparse
+import importlib.util
+import json
+import sys
+import time
+from pathlib import Path
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+if str(APP_ROOT) not in sys.path:
+    sys.path.insert(0, str(APP_ROOT))
+
+
+def _load(name: str):
+    spec = importlib.util.spec_from_file_location(f"_kokoro_worker_{name}", Path(__file__).parent / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--g2p-cache", action="store_true")
+    args = parser.parse_args()
+
+    proto = sys.stdout
+    sys.stdout = sys.stderr
+
+    start = time.time()
+    import numpy as np
+    import soundfile as sf
+    import torch
+
+    torch.set_num_threads(args.threads)
+    torch.set_num_interop_threads(1)
+
+    from config import ESPEAK_DIR
+    from phonemizer.backend.espeak.wrapper import EspeakWrapper
+    EspeakWrapper.library_path = str(ESPEAK_DIR / "libespeak-ng.dll")
+    EspeakWrapper.data_path = str(ESPEAK_DIR / "espeak-ng-data")
+
+    from kokoro import KPipeline, KModel
+    if args.backend == "torch":
+        model = KModel(repo_id="hexgrad/Kokoro-82M").eval()
+    else:
+        model = _load("kokoro_onnx").load_session(int8=args.backend == "onnx-int8", threads=args.threads)
+    g2p_cache = _load("kokoro_g2p_cache") if args.g2p_cache else None
+    pipelines, voices = {}, {}
+
+    def get_pipeline(lang: str):
+        # Same layout as models/kokoro.py: one model, one G2P pipeline per language, shared voices
+        if lang not in pipelines:
+            pipe = KPipeline(lang_code=lang, repo_id="hexgrad/Kokoro-82M", model=False)
+            pipe.model = model
+            pipe.voices = voices
+            if g2p_cache is not None:
+                g2p_cache.install(pipe)
+            pipelines[lang] = pipe
+        return pipelines[lang]
+
+    get_pipeline("a")
+
+    def reply(obj):
+        proto.write(json.dumps(obj) + "\n")
+        proto.flush()
+
+    reply({"ready": True, "seconds": round(time.time() - start, 2)})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        req = json.loads(line)
+        t0 = time.time()
+        try:
+            with torch.no_grad():
+                pipeline = get_pipeline(req.get("lang", "a"))
+                parts = [a for _, _, a in pipeline(req["text"], voice=req["voice"], speed=float(req["speed"]))]
+            if not parts:
+                raise ValueError("No audio generated")
+            audio = np.concatenate([np.asarray(a, dtype=np.float32) for a in parts])
+            sf.write(req["out"], audio, 24000, subtype="FLOAT")
+            reply({"id": req["id"], "ok": True, "out": req["out"],
+                   "audio_seconds": round(len(audio) / 24000, 3), "seconds": round(time.time() - t0, 3)})
+        except Exception as e:
+            reply({"id": req["id"], "ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# models/sfx_library.py
+"""
+Local semantic asset library for saved Stable Audio / ACE-Step outputs.
+
+Every saved file is indexed with two L2-normalised CLAP embeddings – one of the
+audio, one of its prompt – appended as raw float32 rows to flat files under
+LIBRARY_DIR (read back through np.memmap) plus one JSON line of metadata.
+A lookup embeds the query prompt once and scores every row with two mat-vecs:
+
+    score = PROMPT_WEIGHT · cos(query, prompt) + (1 − PROMPT_WEIGHT) · cos(query, audio)
+
+The prompt term catches rewordings ("door slam" / "wooden door slam"), the
+audio term keeps assets whose sound drifted from their prompt from ranking
+high. Everything stays on disk next to the models; there is no server.
+"""
+import json
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import torch
+import torchaudio.functional as AF
+
+from config import APP_ROOT, FFMPEG_BIN, SFX_LIBRARY_ENABLED, resolve_device
+
+LIBRARY_DIR   = APP_ROOT / "models" / "sfx_library"
+DIM           = 512    # clap-htsat-unfused projection size
+PROMPT_WEIGHT = 0.7
+CLAP_SR       = 48000
+CLAP_SECONDS  = 10.0   # HTSAT window; longer files are embedded from their centre
+
+
+def _clap(device=None):
+    # Reuses the CLAP already loaded by Stable Audio / ACE-Step (load_clap returns the singleton);
+    # ``device`` only decides where it lands when nothing has loaded it yet
+    from models.clap import load_clap
+    return load_clap(resolve_device(device))
+
+
+def _read_audio(path: Path) -> tuple[np.ndarray, int]:
+    """Mono float32 + rate. Formats libsndfile can't open (m4a, old mp3) go through ffmpeg."""
+    try:
+        audio, sr = sf.read(str(path), dtype="float32", always_2d=True)
+    except Exception:
+        with tempfile.TemporaryDirectory() as tmp:
+            wav = Path(tmp) / "decoded.wav"
+            cmd = [str(FFMPEG_BIN / "ffmpeg.exe"), "-i", str(path), "-ac", "1", str(wav), "-y"]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"ffmpeg could not decode {path.name}: {result.stderr[-200:]}")
+            audio, sr = sf.read(str(wav), dtype="float32", always_2d=True)
+    return audio.mean(axis=1), sr
+
+
+@torch.no_grad()
+def embed_text(texts: list[str], device=None) -> np.ndarray:
+    model, processor = _clap(device)
+    inputs = processor(text=texts, return_tensors="pt", padding=True).to(model.device)
+    emb = model.get_text_features(**inputs).float()
+    return torch.nn.functional.normalize(emb, dim=-1).cpu().numpy()
+
+
+@torch.no_grad()
+def embed_audio(path: str | Path, device=None) -> np.ndarray:
+    audio, sr = _read_audio(Path(path))
+    wav = torch.from_numpy(audio)
+    if sr != CLAP_SR:
+        wav = AF.resample(wav, sr, CLAP_SR)
+    window = int(CLAP_SECONDS * CLAP_SR)
+    if wav.shape[0] > window:
+        start = (wav.shape[0] - window) // 2
+        wav = wav[start:start + window]
+
+    model, processor = _clap(device)
+    inputs = processor(audios=wav.numpy(), sampling_rate=CLAP_SR, return_tensors="pt").to(model.device)
+    emb = model.get_audio_features(**inputs).float()
+    return torch.nn.functional.normalize(emb, dim=-1)[0].cpu().numpy()
+
+
+class SfxLibrary:
+    def __init__(self, root: Path = LIBRARY_DIR):
+        self.root = Path(root)
+        self.audio_file = self.root / "audio.f32"
+        self.text_file = self.root / "text.f32"
+        self.entries_file = self.root / "entries.jsonl"
+        self._lock = threading.Lock()
+        self._entries = None
+        self._audio = None
+        self._text = None
+
+    # ─── storage ────────────────────────────────────────────────────────
+    def _rows(self, path: Path) -> int:
+        return path.stat().st_size // (DIM * 4) if path.exists() else 0
+
+    def _map(self, path: Path, n: int) -> np.ndarray:
+        if n == 0:
+            return np.zeros((0, DIM), dtype=np.float32)
+        return np.memmap(path, dtype=np.float32, mode="r", shape=(n, DIM))
+
+    def _load(self) -> None:
+        if self._entries is not None:
+            return
+        entries = []
+        if self.entries_file.exists():
+            for line in self.entries_file.read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    entries.append(json.loads(line))
+        # A crash between the appends can leave one file a row ahead – trust the shortest
+        n = min(len(entries), self._rows(self.audio_file), self._rows(self.text_file))
+        self._entries = entries[:n]
+        self._audio = self._map(self.audio_file, n)
+        self._text = self._map(self.text_file, n)
+
+    def _release(self) -> None:
+        # Windows refuses to grow or replace a file while it is memory-mapped
+        self._entries = self._audio = self._text = None
+
+    # ─── public API ─────────────────────────────────────────────────────
+    def add(self, path: str, prompt: str, source: str, device=None, **extra) -> dict:
+        """Embed and index a saved file. Re-saving the same path supersedes the older row.
+
+        ``device`` is where CLAP is loaded if no model has loaded it yet.
+        """
+        path = str(Path(path).resolve())
+        audio_emb = embed_audio(path, device).astype(np.float32)
+        text_emb = embed_text([prompt], device)[0].astype(np.float32)
+        try:
+            duration = sf.info(path).duration
+        except Exception:
+            duration = None
+
+        entry = {
+            "path": path,
+            "prompt": prompt,
+            "source": source,
+            "duration": round(duration, 3) if duration else None,
+            "added": time.strftime("%Y-%m-%d %H:%M:%S"),
+            **extra,
+        }
+        with self._lock:
+            self._release()
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.audio_file, "ab") as f:
+                f.write(audio_emb.tobytes())
+            with open(self.text_file, "ab") as f:
+                f.write(text_emb.tobytes())
+            with open(self.entries_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        print(f"[SFX-LIB] Indexed {Path(path).name} ({source})")
+        return entry
+
+    def search(
+        self,
+        prompt: str,
+        top_k: int = 5,
+        threshold: float = 0.0,
+        source: str | None = None,
+        length: float | None = None,
+        device=None,
+    ) -> list[dict]:
+        """Best matches for ``prompt`` scoring ≥ threshold, newest row per path, existing files only.
+
+        Args:
+            source: "stable" / "ace" to restrict the search.
+            length: Wanted duration; assets more than ±50 % off are skipped.
+            device: Request device, where CLAP is loaded if no model has loaded it yet.
+        """
+        with self._lock:
+            self._load()
+            if not self._entries:
+                return []
+            entries = self._entries
+            query = embed_text([prompt], device)[0]
+            prompt_sim = self._text @ query
+            audio_sim = self._audio @ query
+        scores = PROMPT_WEIGHT * prompt_sim + (1.0 - PROMPT_WEIGHT) * audio_sim
+        latest = {e["path"]: i for i, e in enumerate(entries)}
+
+        matches = []
+        for i in np.argsort(-scores, kind="stable"):
+            if scores[i] < threshold or len(matches) >= top_k:
+                break
+            e = entries[i]
+            if latest[e["path"]] != i or not Path(e["path"]).exists():
+                continue
+            if source and e.get("source") != source:
+                continue
+            if length and e.get("duration") and abs(e["duration"] - length) > 0.5 * length:
+                continue
+            matches.append({
+                **e,
+                "score": round(float(scores[i]), 4),
+                "prompt_similarity": round(float(prompt_sim[i]), 4),
+                "audio_similarity": round(float(audio_sim[i]), 4),
+            })
+        return matches
+
+    def prune(self) -> int:
+        """Rewrite the index without rows whose file is gone or that a newer row superseded."""
+        with self._lock:
+            self._load()
+            latest = {e["path"]: i for i, e in enumerate(self._entries)}
+            keep = [i for i, e in enumerate(self._entries) if latest[e["path"]] == i and Path(e["path"]).exists()]
+            removed = len(self._entries) - len(keep)
+            if removed == 0:
+                return 0
+
+            entries = [self._entries[i] for i in keep]
+            audio = np.array(self._audio[keep], dtype=np.float32)
+            text = np.array(self._text[keep], dtype=np.float32)
+            self._release()
+            for path, data in ((self.audio_file, audio.tobytes()), (self.text_file, text.tobytes())):
+                tmp = path.with_suffix(".tmp")
+                tmp.write_bytes(data)
+                tmp.replace(path)
+            tmp = self.entries_file.with_suffix(".tmp")
+            tmp.write_text("".join(json.dumps(e) + "\n" for e in entries), encoding="utf-8")
+            tmp.replace(self.entries_file)
+        print(f"[SFX-LIB] Pruned {removed} stale row(s)")
+        return removed
+
+    def status(self) -> dict:
+        with self._lock:
+            self._load()
+            by_source = {}
+            for e in self._entries:
+                by_source[e.get("source")] = by_source.get(e.get("source"), 0) + 1
+            return {
+                "entries": len(self._entries),
+                "by_source": by_source,
+                "index_mb": round((self._rows(self.audio_file) + self._rows(self.text_file)) * DIM * 4 / 1024**2, 2),
+                "path": str(self.root),
+            }
+
+
+sfx_library = SfxLibrary()
+
+
+def index_saved(path: str, prompt: str, source: str, device=None, **extra) -> None:
+    """Best-effort hook for the save paths: never lets indexing break a generation response."""
+    if not SFX_LIBRARY_ENABLED or not path or not prompt:
+        return
+    try:
+        sfx_library.add(path, prompt, source, device, **extra)
+    except Exception as e:
+        print(f"[SFX-LIB] Indexing skipped for {Path(path).name}: {e}")
@@ -10,10 +10,13 @@ import torch
 import soundfile as sf
 import torchaudio.transforms as T
 import numpy as np
-from diffusers import StableAudioPipeline
-from config import OUTPUT_DIR
+from diffusers import StableAudioPipeline, EDMDPMSolverMultistepScheduler
+from diffusers.models.embeddings import get_1d_rotary_pos_embed
+from config import OUTPUT_DIR, STABLE_LOW_VRAM, STABLE_CPU_DTYPE, STABLE_CPU_THREADS
 from pathlib import Path
 import gc
+import math
+import time
 
 from .stable_audio_state import is_model_loaded, set_model_loaded, set_current_device, get_current_device
 
@@ -24,24 +27,67 @@ pipe = None
 clap_processor = None
 clap_model = None
 generation_active = False
+low_vram = False
+dtype = None
+_text_encoder_hook = None
+_default_scheduler = None
+
+# Low-VRAM tiled decode, in latent frames (1 frame = 2048 samples ≈ 46 ms).
+# Each tile is decoded with DECODE_OVERLAP frames of context on both sides that
+# are then cut away, so tile borders never see the decoder's zero padding.
+DECODE_TILE = 128
+DECODE_OVERLAP = 16
+
+def load_stable_audio(
+    device: str = "0",
+    low_vram_mode: bool | None = None,
+    cpu_dtype: str | None = None,
+    cpu_threads: int | None = None,
+) -> tuple[bool, str]:
+    """Load Stable Audio + CLAP on a GPU index or on "cpu".
 
-def load_stable_audio(device: str = "0") -> tuple[bool, str]:
-    global pipe, clap_processor, clap_model
-
-    if not torch.cuda.is_available():
-        return False, "CUDA required"
-
-    try:
-        gpu_idx = int(device)
-    except ValueError:
-        return False, "Device must be integer"
-
-    if gpu_idx < 0 or gpu_idx >= torch.cuda.device_count():
-        return False, f"GPU {gpu_idx} out of range"
-
-    dev = torch.device(f"cuda:{gpu_idx}")
-
-    if is_model_loaded() and get_current_device() != str(dev):
+    Args:
+        device: GPU index ("0", "1", ...) or "cpu".
+        low_vram_mode: GPU only, see STABLE_LOW_VRAM. None → config default.
+        cpu_dtype: CPU only, "float32" or "bfloat16". None → STABLE_CPU_DTYPE.
+        cpu_threads: CPU only, torch intra-op threads (process-wide). None → STABLE_CPU_THREADS, 0 → torch default.
+    """
+    global pipe, clap_processor, clap_model, low_vram, _text_encoder_hook, dtype, _default_scheduler
+
+    if str(device).strip().lower() == "cpu":
+        dev = torch.device("cpu")
+        name = (cpu_dtype or STABLE_CPU_DTYPE).lower()
+        if name in ("bf16", "bfloat16"):
+            want_dtype = torch.bfloat16
+        elif name in ("fp32", "float32"):
+            want_dtype = torch.float32
+        else:
+            return False, f"Unsupported CPU dtype '{name}' (float32 | bfloat16)"
+        low_vram_mode = False
+        threads = STABLE_CPU_THREADS if cpu_threads is None else int(cpu_threads)
+        if threads > 0:
+            torch.set_num_threads(threads)
+        print(f"[STABLE] CPU mode: {want_dtype} | {torch.get_num_threads()} threads")
+    else:
+        if not torch.cuda.is_available():
+            return False, "CUDA not available (use device \"cpu\")"
+
+        try:
+            gpu_idx = int(device)
+        except ValueError:
+            return False, "Device must be integer or \"cpu\""
+
+        if gpu_idx < 0 or gpu_idx >= torch.cuda.device_count():
+            return False, f"GPU {gpu_idx} out of range"
+
+        dev = torch.device(f"cuda:{gpu_idx}")
+        want_dtype = torch.float16
+        if low_vram_mode is None:
+            low_vram_mode = STABLE_LOW_VRAM
+
+    if is_model_loaded() and (
+        get_current_device() != str(dev) or low_vram != low_vram_mode or dtype != want_dtype
+    ):
         unload_stable_audio()
 
     # Auto-download Stable Audio Open 1.0 if missing
@@ -62,9 +108,16 @@ def load_stable_audio(device: str = "0") -> tuple[bool, str]:
         print(f"[LOAD] Loading Stable Audio from {model_dir}...")
         pipe = StableAudioPipeline.from_pretrained(
             str(model_dir),
-            torch_dtype=torch.float16,
+            torch_dtype=want_dtype,
         ).to(dev)
-        print(f"[LOAD] Pipeline loaded on {dev}")
+        dtype = want_dtype
+        _default_scheduler = pipe.scheduler
+        low_vram = bool(low_vram_mode)
+        if low_vram:
+            from accelerate import cpu_offload_with_hook
+            _, _text_encoder_hook = cpu_offload_with_hook(pipe.text_encoder, dev)
+            torch.cuda.empty_cache()
+        print(f"[LOAD] Pipeline loaded on {dev}{' (low-VRAM mode)' if low_vram else ''}")
     except Exception as e:
         set_model_loaded(False)
         return False, f"Pipeline load failed: {e}"
@@ -74,7 +127,8 @@ def load_stable_audio(device: str = "0") -> tuple[bool, str]:
         print("[LOAD] Loading CLAP (auto-download if missing)...")
         from models.clap import load_clap
         clap_model, clap_processor = load_clap(str(dev))
-        torch.cuda.empty_cache()  # Critical for 3090
+        if dev.type == "cuda":
+            torch.cuda.empty_cache()  # Critical for 3090
         print(f"[LOAD] CLAP loaded on {dev}")
     except Exception as e:
         unload_stable_audio()
@@ -95,7 +149,14 @@ def load_stable_audio(device: str = "0") -> tuple[bool, str]:
 
 def unload_stable_audio() -> None:
     """Unload the Stable Audio pipeline and CLAP model from GPU memory."""
-    global pipe, clap_model, clap_processor
+    global pipe, clap_model, clap_processor, _text_encoder_hook, dtype, _default_scheduler
+
+    dtype = None
+    _default_scheduler = None
+    _scheduler_cache.clear()
+    if _text_encoder_hook is not None:
+        _text_encoder_hook.remove()
+        _text_encoder_hook = None
 
     if pipe is not None:
         del pipe
@@ -129,6 +190,307 @@ def cancel_generation() -> None:
     global generation_active
     generation_active = False
 
+
+def _offload_text_encoder() -> None:
+    """Low-VRAM mode: send T5 back to CPU once the prompt is encoded (it moves to the GPU on its own next call)."""
+    if _text_encoder_hook is not None:
+        _text_encoder_hook.offload()
+        torch.cuda.empty_cache()
+
+
+def _decode_one(latent: torch.Tensor) -> torch.Tensor:
+    """(1, C, T) latent → (channels, samples) waveform.
+
+    Normal mode decodes in one shot on the GPU. Low-VRAM mode decodes overlapping
+    tiles of DECODE_TILE frames and moves each finished piece to CPU, so decoder
+    activations never exceed one tile regardless of clip length.
+    """
+    if not low_vram:
+        return pipe.vae.decode(latent).sample[0]
+
+    hop = int(getattr(pipe.vae, "hop_length", 2048))
+    frames = latent.shape[-1]
+    step = DECODE_TILE - 2 * DECODE_OVERLAP
+    pieces = []
+    for start in range(0, frames, step):
+        end = min(start + step, frames)
+        lo, hi = max(0, start - DECODE_OVERLAP), min(frames, end + DECODE_OVERLAP)
+        audio = pipe.vae.decode(latent[:, :, lo:hi]).sample[0]
+        a = (start - lo) * hop
+        pieces.append(audio[:, a:a + (end - start) * hop].float().cpu())
+        del audio
+    return torch.cat(pieces, dim=-1)
+
+
+def _decode_all(latents: torch.Tensor, waveform_end: int):
+    """Decode a (B, C, T) latent batch; low-VRAM mode returns a list of CPU waveforms, one variant at a time."""
+    if not low_vram:
+        return pipe.vae.decode(latents).sample[:, :, :waveform_end]
+    audios = []
+    for b in range(latents.shape[0]):
+        audios.append(_decode_one(latents[b:b + 1])[:, :waveform_end])
+        torch.cuda.empty_cache()
+    return audios
+
+
+def _run_pipe(length_sec: float, callback, **kwargs):
+    """pipe(...) → audios. In low-VRAM mode the pipeline stops at latents and _decode_all takes over."""
+    def step_callback(step: int, timestep: int, latents: torch.Tensor):
+        if step == 0:
+            _offload_text_encoder()
+        return callback(step, timestep, latents)
+
+    if not low_vram:
+        return pipe(audio_end_in_s=length_sec, callback=callback, callback_steps=1, **kwargs).audios
+
+    latents = pipe(
+        audio_end_in_s=length_sec, callback=step_callback, callback_steps=1, output_type="latent", **kwargs
+    ).audios
+    return _decode_all(latents, int(length_sec * pipe.vae.config.sampling_rate))
+
+
+class _CosineTimeEDMDPMSolver(EDMDPMSolverMultistepScheduler):
+    """EDM DPM-Solver(++) that feeds the DiT the same atan(sigma) timesteps as the
+    pipeline's CosineDPMSolverMultistepScheduler (the stock EDM one uses 0.25·log σ,
+    which Stable Audio was not trained on)."""
+
+    def precondition_noise(self, sigma):
+        if not isinstance(sigma, torch.Tensor):
+            sigma = torch.tensor([sigma])
+        return sigma.atan() / math.pi * 2
+
+
+# name → overrides on top of the checkpoint's scheduler config (None = pipeline default)
+SCHEDULERS = {
+    "cosine_dpm":    None,
+    "dpmpp_2m":      {"algorithm_type": "dpmsolver++", "solver_order": 2},
+    "dpmpp_2m_sde":  {"algorithm_type": "sde-dpmsolver++", "solver_order": 2},
+    "dpmpp_3m":      {"algorithm_type": "dpmsolver++", "solver_order": 3},
+    "dpmpp_2m_karras": {"algorithm_type": "dpmsolver++", "solver_order": 2, "sigma_schedule": "karras"},
+}
+
+# Named quality/speed presets for /stable_infer (explicit steps/scheduler still win).
+PRESETS = {
+    "draft":    {"scheduler": "dpmpp_2m", "steps": 25},
+    "fast":     {"scheduler": "dpmpp_2m", "steps": 40},
+    "balanced": {"scheduler": "dpmpp_2m_sde", "steps": 60},
+    "quality":  {"scheduler": "cosine_dpm", "steps": 100},
+    "max":      {"scheduler": "cosine_dpm", "steps": 200},
+}
+
+_scheduler_cache = {}
+
+
+def _use_scheduler(name: str) -> None:
+    """Swap pipe.scheduler to ``name`` (instances are built once per load and reused)."""
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler '{name}' ({', '.join(SCHEDULERS)})")
+    overrides = SCHEDULERS[name]
+    if overrides is None:
+        pipe.scheduler = _default_scheduler
+        return
+    sched = _scheduler_cache.get(name)
+    if sched is None or sched.config.sigma_max != _default_scheduler.config.sigma_max:
+        sched = _CosineTimeEDMDPMSolver.from_config(_default_scheduler.config, **overrides)
+        _scheduler_cache[name] = sched
+    pipe.scheduler = sched
+
+
+def _reset_peak_vram() -> None:
+    if torch.cuda.is_available() and pipe is not None and pipe.device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(pipe.device)
+
+
+def _memory_report() -> dict:
+    """Peak VRAM since the last _reset_peak_vram() (allocator-level, this device only)."""
+    report = {"low_vram": low_vram, "peak_vram_mb": None}
+    if torch.cuda.is_available() and pipe is not None and pipe.device.type == "cuda":
+        report["peak_vram_mb"] = round(torch.cuda.max_memory_allocated(pipe.device) / 1024**2, 1)
+        print(f"[VRAM] Peak during gen: {report['peak_vram_mb']:.0f} MB{' (low-VRAM mode)' if low_vram else ''}")
+    return report
+
+def _clap_score(audio: torch.Tensor, prompt: str, resampler) -> float:
+    """CLAP text/audio similarity for one (channels, samples) 44.1 kHz waveform; 0.0 on failure."""
+    try:
+        if audio.ndim == 3:
+            audio = audio.squeeze(0) 
+        if audio.ndim != 2:
+            raise ValueError(f"Unexpected audio shape: {audio.shape}")
+
+        # Step 2: Convert stereo → mono (CLAP only accepts mono)
+        if audio.shape[0] == 2:
+            audio_mono = audio.mean(dim=0, keepdim=True)  # (1, samples)
+        elif audio.shape[0] == 1:
+            audio_mono = audio
+        else:
+            raise ValueError(f"Unsupported channel count: {audio.shape[0]}")
+
+        # Step 3: Resample on GPU
+        audio_tensor = audio_mono.to(pipe.device, dtype=torch.float32)
+        resampled = resampler(audio_tensor)              # (1, samples_resampled)
+        resampled = resampled.unsqueeze(0)                # (1, 1, samples) → batch + channel
+
+        # Step 4: Convert to exact format CLAP expects: 1D NumPy array (mono)
+        audio_np = resampled.squeeze(0).cpu().numpy()     # → (1, samples)
+        audio_np = audio_np.flatten()                     # → (samples,)
+
+        # Step 5: CLAP processing (now guaranteed to work)
+        text_inputs = clap_processor(text=[prompt], return_tensors="pt").to(pipe.device)
+        audio_inputs = clap_processor(
+            audios=audio_np,
+            sampling_rate=48000,
+            return_tensors="pt",
+            padding=True
+        ).to(pipe.device)
+
+        with torch.no_grad():
+            text_emb = clap_model.get_text_features(**text_inputs)
+            audio_emb = clap_model.get_audio_features(**audio_inputs)
+            similarity = (text_emb @ audio_emb.T).diag().item()
+
+        # Clean up everything
+        del audio_mono, audio_tensor, resampled, audio_np
+        del text_inputs, audio_inputs, text_emb, audio_emb
+        torch.cuda.empty_cache()
+        return float(similarity)
+
+    except Exception as e:
+        print(f"[CLAP] Scoring failed for variant: {e}")
+        return 0.0
+
+
+def clap_score(audio_np: np.ndarray, prompt: str) -> float:
+    """CLAP similarity of a (samples, channels) 44.1 kHz array – the same metric used to rank variants."""
+    resampler = T.Resample(44100, 48000, dtype=torch.float32).to(pipe.device)
+    return _clap_score(torch.from_numpy(np.ascontiguousarray(audio_np.T)), prompt, resampler)
+
+
+@torch.no_grad()
+def _denoise_with_pruning(
+    prompt,
+    negative_prompt,
+    steps,
+    length_sec,
+    guidance_scale,
+    num_waveforms,
+    eta,
+    generator,
+    prune_at_step,
+    prune_keep,
+):
+    """StableAudioPipeline.__call__ with one extra stop: CLAP pruning at ``prune_at_step``.
+
+    At the checkpoint the scheduler's current x0 prediction of every variant is
+    decoded and scored; only the best ``prune_keep`` latents (and their slices of
+    the CFG embeddings, scheduler history and Brownian noise) continue denoising.
+
+    Returns:
+        (audios, pruned): audios is (kept, channels, samples) at 44.1 kHz;
+        pruned is [{"variant", "preview_score", "kept"}, ...] for the log/response.
+    """
+    device = pipe.device
+    sr = pipe.vae.config.sampling_rate
+    waveform_end = int(length_sec * sr)
+    do_cfg = guidance_scale > 1.0
+
+    prompt_embeds = pipe.encode_prompt(prompt, device, do_cfg, negative_prompt)
+    _offload_text_encoder()
+    seconds_start, seconds_end = pipe.encode_duration(
+        0.0, length_sec, device, do_cfg and negative_prompt is not None, 1
+    )
+    text_embeds = torch.cat([prompt_embeds, seconds_start, seconds_end], dim=1)
+    duration_embeds = torch.cat([seconds_start, seconds_end], dim=2)
+    if do_cfg and negative_prompt is None:
+        text_embeds = torch.cat([torch.zeros_like(text_embeds), text_embeds], dim=0)
+        duration_embeds = torch.cat([duration_embeds, duration_embeds], dim=0)
+
+    # [uncond × N, cond × N] – same layout as the pipeline
+    bs_embed, seq_len, hidden = text_embeds.shape
+    text_embeds = text_embeds.repeat(1, num_waveforms, 1).view(bs_embed * num_waveforms, seq_len, hidden)
+    duration_embeds = duration_embeds.repeat(1, num_waveforms, 1).view(
+        bs_embed * num_waveforms, -1, duration_embeds.shape[-1]
+    )
+
+    scheduler = pipe.scheduler
+    scheduler.set_timesteps(steps, device=device)
+    latents = pipe.prepare_latents(
+        num_waveforms,
+        pipe.transformer.config.in_channels,
+        int(pipe.transformer.config.sample_size),
+        text_embeds.dtype,
+        device,
+        generator,
+        num_waveforms_per_prompt=num_waveforms,
+        audio_channels=pipe.vae.config.audio_channels,
+    )
+    extra_step_kwargs = pipe.prepare_extra_step_kwargs(generator, eta)
+    rotary_embedding = get_1d_rotary_pos_embed(
+        pipe.rotary_embed_dim,
+        latents.shape[2] + duration_embeds.shape[1],
+        use_real=True,
+        repeat_interleave_real=False,
+    )
+
+    alive = list(range(num_waveforms))
+    pruned = []
+
+    for i, t in enumerate(scheduler.timesteps):
+        if not generation_active:
+            raise StopIteration
+
+        model_input = torch.cat([latents] * 2) if do_cfg else latents
+        model_input = scheduler.scale_model_input(model_input, t)
+        noise_pred = pipe.transformer(
+            model_input,
+            t.unsqueeze(0),
+            encoder_hidden_states=text_embeds,
+            global_hidden_states=duration_embeds,
+            rotary_embedding=rotary_embedding,
+            return_dict=False,
+        )[0]
+        if do_cfg:
+            noise_uncond, noise_text = noise_pred.chunk(2)
+            noise_pred = noise_uncond + guidance_scale * (noise_text - noise_uncond)
+        latents = scheduler.step(noise_pred, t, latents, **extra_step_kwargs).prev_sample
+
+        if i + 1 != prune_at_step or len(alive) <= prune_keep:
+            continue
+
+        # CHECKPOINT – score the current clean-signal estimate of every variant
+        x0 = scheduler.model_outputs[-1]
+        resampler = T.Resample(44100, 48000, dtype=torch.float32).to(device)
+        scores = []
+        for b in range(len(alive)):
+            audio = _decode_one(x0[b:b + 1])[:, :waveform_end]
+            scores.append(_clap_score(audio, prompt, resampler))
+            del audio
+        keep = sorted(range(len(alive)), key=lambda b: scores[b], reverse=True)[:prune_keep]
+        keep.sort()
+        for b, score in enumerate(scores):
+            pruned.append({"variant": alive[b] + 1, "preview_score": score, "kept": b in keep})
+        print(f"[STABLE-PRUNE] Step {i + 1}/{steps}: scores {[round(x, 4) for x in scores]} → keep variants {[alive[b] + 1 for b in keep]}")
+
+        idx = torch.tensor(keep, device=device)
+        n = len(alive)
+        latents = latents[idx]
+        if do_cfg:
+            embed_idx = torch.cat([idx, idx + n])
+            text_embeds = text_embeds[embed_idx]
+            duration_embeds = duration_embeds[embed_idx]
+        else:
+            text_embeds = text_embeds[idx]
+            duration_embeds = duration_embeds[idx]
+        scheduler.model_outputs = [m[idx] if torch.is_tensor(m) else m for m in scheduler.model_outputs]
+        sampler = getattr(scheduler, "noise_sampler", None)
+        if sampler is not None:
+            # Brownian noise is drawn for the full batch, then sliced → survivors see identical noise
+            scheduler.noise_sampler = lambda s, t_, _f=sampler, _i=idx: _f(s, t_)[_i]
+        alive = [alive[b] for b in keep]
+        torch.cuda.empty_cache()
+
+    audios = _decode_all(latents, waveform_end)
+    return audios, pruned
+
 def generate_audio(
     prompt,
     steps=100,
@@ -138,6 +500,9 @@ def generate_audio(
     guidance_scale=7.0,
     num_waveforms_per_prompt=1,
     eta=0.0,
+    prune_at_step=0,
+    prune_keep=1,
+    scheduler="cosine_dpm",
 ):
     """Generate audio using Stable Audio Open 1.0.
 
@@ -150,11 +515,17 @@ def generate_audio(
         guidance_scale: Classifier-free guidance scale (higher = stricter prompt adherence).
         num_waveforms_per_prompt: Number of variant waveforms to generate per prompt (1–4).
         eta: DDIM eta parameter (0.0 = deterministic, 1.0 = full stochastic).
+        prune_at_step: If > 0 and more than ``prune_keep`` variants are requested,
+            score partially denoised variants with CLAP at this step and finish only
+            the best ``prune_keep``.
+        prune_keep: Variants that survive the pruning checkpoint.
+        scheduler: Key of SCHEDULERS ("cosine_dpm" = the checkpoint's own sampler).
 
     Returns:
         Tuple containing:
         - List[dict]: Each dict has "audio_np" (samples × channels numpy array),
-          "score" (CLAP similarity when >1 waveform), and "is_best" flag.
+          "score" (CLAP similarity when >1 waveform), and "is_best" flag
+          (plus "pruning": checkpoint scores when pruning ran).
         - sample_rate (int): Always 44100 Hz for this model.
         - final_seed (int): The seed actually used.
 
@@ -164,31 +535,40 @@ def generate_audio(
     if pipe is None:
         raise RuntimeError("Stable Audio model not loaded. Call /stable_load32 first.")
 
+    _use_scheduler(scheduler)
+
     global generation_active
     generation_active = True
 
     if seed == -1:
         seed = random.randint(0, 2**32 - 1)
-    generator = torch.Generator("cuda").manual_seed(seed)
+    generator = torch.Generator(pipe.device).manual_seed(seed)
 
     def callback(step: int, timestep: int, latents: torch.Tensor):
         if not generation_active:
             return True
         return False
 
+    pruned = []
+    _reset_peak_vram()
     try:
-        outputs = pipe(
-            prompt=prompt,
-            negative_prompt=negative_prompt,
-            num_inference_steps=steps,
-            audio_end_in_s=length_sec,
-            guidance_scale=guidance_scale,
-            num_waveforms_per_prompt=num_waveforms_per_prompt,
-            eta=eta,
-            generator=generator,
-            callback=callback,
-            callback_steps=1,
-        )
+        if 0 < prune_at_step < steps and num_waveforms_per_prompt > prune_keep:
+            audios, pruned = _denoise_with_pruning(
+                prompt, negative_prompt, steps, length_sec, guidance_scale,
+                num_waveforms_per_prompt, eta, generator, prune_at_step, prune_keep,
+            )
+        else:
+            audios = _run_pipe(
+                length_sec,
+                callback,
+                prompt=prompt,
+                negative_prompt=negative_prompt,
+                num_inference_steps=steps,
+                guidance_scale=guidance_scale,
+                num_waveforms_per_prompt=num_waveforms_per_prompt,
+                eta=eta,
+                generator=generator,
+            )
     except StopIteration:
         print("[STABLE] Generation cancelled")
         return [], 44100, seed
@@ -196,64 +576,18 @@ def generate_audio(
         print(f"[STABLE] Generation failed: {e}")
         raise
 
-    audios = outputs.audios 
     results = []
 
-    if len(audios) > 1 and generation_active:
+    # Pruned runs are always re-scored on the finished audio, even with a single survivor
+    if (len(audios) > 1 or pruned) and generation_active:
         scores = []
         resampler = T.Resample(44100, 48000, dtype=torch.float32).to(pipe.device)
 
         for audio in audios:
             if not generation_active:
                 break
-            try:
-                if audio.ndim == 3:
-                    audio = audio.squeeze(0) 
-                if audio.ndim != 2:
-                    raise ValueError(f"Unexpected audio shape: {audio.shape}")
-
-                # Step 2: Convert stereo → mono (CLAP only accepts mono)
-                if audio.shape[0] == 2:
-                    audio_mono = audio.mean(dim=0, keepdim=True)  # (1, samples)
-                elif audio.shape[0] == 1:
-                    audio_mono = audio
-                else:
-                    raise ValueError(f"Unsupported channel count: {audio.shape[0]}")
-
-                # Step 3: Resample on GPU
-                audio_tensor = audio_mono.to(pipe.device, dtype=torch.float32)
-                resampled = resampler(audio_tensor)              # (1, samples_resampled)
-                resampled = resampled.unsqueeze(0)                # (1, 1, samples) → batch + channel
-
-                # Step 4: Convert to exact format CLAP expects: 1D NumPy array (mono)
-                audio_np = resampled.squeeze(0).cpu().numpy()     # → (1, samples)
-                audio_np = audio_np.flatten()                     # → (samples,)
-
-                # Step 5: CLAP processing (now guaranteed to work)
-                text_inputs = clap_processor(text=[prompt], return_tensors="pt").to(pipe.device)
-                audio_inputs = clap_processor(
-                    audios=audio_np,
-                    sampling_rate=48000,
-                    return_tensors="pt",
-                    padding=True
-                ).to(pipe.device)
-
-                with torch.no_grad():
-                    text_emb = clap_model.get_text_features(**text_inputs)
-                    audio_emb = clap_model.get_audio_features(**audio_inputs)
-                    similarity = (text_emb @ audio_emb.T).diag().item()
-
-                scores.append(float(similarity))
-
-                # Clean up everything
-                del audio_mono, audio_tensor, resampled, audio_np
-                del text_inputs, audio_inputs, text_emb, audio_emb
-                torch.cuda.empty_cache()
-
-            except Exception as e:
-                print(f"[CLAP] Scoring failed for variant: {e}")
-                scores.append(0.0)
-                continue
+            scores.append(_clap_score(audio, prompt, resampler))
+        memory = _memory_report()
 
         if generation_active:
             sorted_idx = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
@@ -265,6 +599,8 @@ def generate_audio(
                     "audio_np": audio_np.T,  # (samples, channels) for soundfile
                     "score": scores[i],
                     "is_best": rank == 0,
+                    "pruning": pruned,
+                    "memory": memory,
                 })
     elif generation_active:
         audio_np = audios[0].cpu().float().numpy()
@@ -273,11 +609,12 @@ def generate_audio(
         results.append({
             "audio_np": audio_np.T,
             "score": None,
-            "is_best": True
+            "is_best": True,
+            "memory": _memory_report(),
         })
 
     # Cleanup
-    del audios, outputs
+    del audios
     torch.cuda.empty_cache()
     generation_active = False
 
@@ -286,4 +623,161 @@ def generate_audio(
         reserved = torch.cuda.memory_reserved(0) / 1e9
         print(f"[VRAM] After gen: {allocated:.2f} GB alloc, {reserved:.2f} GB res")
 
-    return results, 44100, seed
\ No newline at end of file
+    return results, 44100, seed
+
+def generate_audio_batch(
+    items,
+    steps=100,
+    guidance_scale=7.0,
+    num_waveforms_per_prompt=1,
+    eta=0.0,
+    max_batch=8,
+    scheduler="cosine_dpm",
+):
+    """Generate many prompts, batching items that share the same length into one diffusion run.
+
+    Args:
+        items: [{"prompt", "length_sec", "seed", "negative_prompt"}, ...]; seed -1 = random.
+        steps / guidance_scale / eta: Shared by every item.
+        num_waveforms_per_prompt: Variants per item (CLAP-ranked like generate_audio).
+        max_batch: Upper bound on waveforms per pipe() call (prompts × variants).
+        scheduler: Key of SCHEDULERS.
+
+    Yields:
+        (index, results, sample_rate, seed) per item, in completion order. ``results``
+        has the same shape as generate_audio's. Variant k of an item uses seed + k, so
+        every item is reproducible from its own seed regardless of its batch mates.
+    """
+    if pipe is None:
+        raise RuntimeError("Stable Audio model not loaded. Call /stable_load32 first.")
+
+    _use_scheduler(scheduler)
+
+    global generation_active
+    generation_active = True
+
+    def callback(step: int, timestep: int, latents: torch.Tensor):
+        if not generation_active:
+            return True
+        return False
+
+    nw = num_waveforms_per_prompt
+    groups = {}
+    for idx, item in enumerate(items):
+        groups.setdefault(round(float(item["length_sec"]), 3), []).append(idx)
+
+    per_run = max(1, max_batch // nw)
+    resampler = T.Resample(44100, 48000, dtype=torch.float32).to(pipe.device)
+
+    try:
+        for length_sec, indices in groups.items():
+            for start in range(0, len(indices), per_run):
+                if not generation_active:
+                    return
+                chunk = indices[start:start + per_run]
+                seeds = []
+                for idx in chunk:
+                    seed = items[idx].get("seed", -1)
+                    seeds.append(random.randint(0, 2**32 - 1 - nw) if seed in (-1, None) else int(seed))
+                generators = [
+                    torch.Generator(pipe.device).manual_seed(seed + k)
+                    for seed in seeds for k in range(nw)
+                ]
+                print(f"[STABLE-BATCH] {len(chunk)} prompt(s) × {nw} @ {length_sec:.2f}s → items {[i + 1 for i in chunk]}")
+
+                _reset_peak_vram()
+                audios = _run_pipe(  # prompt-major: [p0 v0, p0 v1, ..., p1 v0, ...]
+                    length_sec,
+                    callback,
+                    prompt=[items[idx]["prompt"] for idx in chunk],
+                    negative_prompt=[items[idx].get("negative_prompt") or "" for idx in chunk],
+                    num_inference_steps=steps,
+                    guidance_scale=guidance_scale,
+                    num_waveforms_per_prompt=nw,
+                    eta=eta,
+                    generator=generators,
+                )
+                memory = _memory_report()
+
+                for n, idx in enumerate(chunk):
+                    if not generation_active:
+                        return
+                    variants = audios[n * nw:(n + 1) * nw]
+                    scores = [_clap_score(a, items[idx]["prompt"], resampler) for a in variants] if nw > 1 else [None]
+                    order = sorted(range(nw), key=lambda k: scores[k] or 0.0, reverse=True)
+                    results = []
+                    for rank, k in enumerate(order):
+                        results.append({
+                            "audio_np": variants[k].cpu().float().numpy().T,
+                            "score": scores[k],
+                            "is_best": rank == 0,
+                            "seed": seeds[n] + k,
+                            "memory": memory,
+                        })
+                    yield idx, results, 44100, seeds[n]
+
+                del audios
+                torch.cuda.empty_cache()
+    except StopIteration:
+        print("[STABLE-BATCH] Generation cancelled")
+    finally:
+        generation_active = False
+
+
+def benchmark(steps=20, length_sec=10.0, runs=2, prompt="heavy rain on a tin roof", scheduler="cosine_dpm") -> dict:
+    """Time full generations on the loaded device (one untimed warm-up run first).
+
+    Returns:
+        dict: device, dtype, threads, steps, length, per-run seconds, denoise steps/sec
+              (between the first and last step callbacks) and real-time factor
+              (wall time / audio length, lower is faster).
+    """
+    if pipe is None:
+        raise RuntimeError("Stable Audio model not loaded. Call /stable_load first.")
+
+    _use_scheduler(scheduler)
+    stamps = []
+
+    def callback(step: int, timestep: int, latents: torch.Tensor):
+        stamps.append(time.perf_counter())
+        return False
+
+    def run(n_steps):
+        stamps.clear()
+        _run_pipe(
+            length_sec,
+            callback,
+            prompt=prompt,
+            num_inference_steps=n_steps,
+            num_waveforms_per_prompt=1,
+            generator=torch.Generator(pipe.device).manual_seed(0),
+        )
+
+    print(f"[STABLE-BENCH] Warm-up on {pipe.device} ({dtype})...")
+    run(min(steps, 5))
+
+    walls, rates = [], []
+    for r in range(runs):
+        if pipe.device.type == "cuda":
+            torch.cuda.synchronize(pipe.device)
+        t0 = time.perf_counter()
+        run(steps)
+        if pipe.device.type == "cuda":
+            torch.cuda.synchronize(pipe.device)
+        walls.append(time.perf_counter() - t0)
+        if len(stamps) > 1:
+            rates.append((len(stamps) - 1) / (stamps[-1] - stamps[0]))
+        print(f"[STABLE-BENCH] Run {r + 1}/{runs}: {walls[-1]:.2f}s | {rates[-1] if rates else 0:.2f} steps/s")
+
+    wall = sum(walls) / len(walls)
+    return {
+        "device": str(pipe.device),
+        "dtype": str(dtype).replace("torch.", ""),
+        "threads": torch.get_num_threads() if pipe.device.type == "cpu" else None,
+        "scheduler": scheduler,
+        "steps": steps,
+        "length": length_sec,
+        "runs": [round(w, 3) for w in walls],
+        "steps_per_sec": round(sum(rates) / len(rates), 3) if rates else None,
+        "rtf": round(wall / length_sec, 3),
+    }
@@ -2,7 +2,8 @@
 import whisper
 import torch
 import gc
-from config import WHISPER_PATH, resolve_device
+import threading
+from config import WHISPER_PATH, WHISPER_FAST_PATH, WHISPER_BACKEND, resolve_device
 
 # Valid choices: tiny.en, base.en, small.en, medium.en, large-v3, turbo
 # You set it once in config.py → it works forever
@@ -10,10 +11,48 @@ from config import WHISPER_PATH, resolve_device
 WHISPER_MODEL_NAME = WHISPER_PATH.stem  # extracts "medium.en" or "base.en" etc.
 
 whisper_model = None
+fast_model = None        # cheap first-tier model for chunk verification (WHISPER_FAST_PATH)
 _current_device = None
+backend = None           # "openai" | "faster-whisper" of the loaded models
+load_error = None        # why the last load_whisper() failed, for /whisper_load
+# Held for every load/unload and every pass through whisper_model, so concurrent jobs
+# (verification service, production / voice transcription) never share it mid-call.
+lock = threading.RLock()
 
-def load_whisper(device=None):
-    global whisper_model, _current_device
+def load_whisper(device=None, backend_name=None):
+    """Load WHISPER_PATH (and the WHISPER_FAST_PATH tier) on ``device``.
+
+    backend_name: "openai" | "faster-whisper". None keeps the backend that is
+    loaded now (e.g. on a device change), else WHISPER_BACKEND. Returns
+    False on failure, with the reason in ``load_error``.
+    """
+    with lock:
+        return _load_whisper(device, backend_name or backend or WHISPER_BACKEND)
+
+def create_model(path, dev, backend_name="openai"):
+    """One Whisper model for ``path``'s model name; faster-whisper returns a CT2Whisper stand-in."""
+    if backend_name == "faster-whisper":
+        from models.whisper_ct2 import CT2Whisper, missing_packages
+        missing = missing_packages()
+        if missing:
+            raise RuntimeError(f"Whisper backend 'faster-whisper' not installed: pip install {' '.join(missing)}")
+        print(f"[WHISPER] Loading {path.stem} (faster-whisper) → {dev}")
+        return CT2Whisper(path.stem, dev)
+    if backend_name != "openai":
+        raise ValueError(f"Unknown Whisper backend '{backend_name}' (use openai or faster-whisper)")
+
+    # Auto-download the exact model name you chose in config.py
+    if not path.exists():
+        print(f"[WHISPER] Downloading '{path.stem}' → {path.parent}")
+        whisper.load_model(path.stem, download_root=str(path.parent))
+
+    print(f"[WHISPER] Loading {path.stem} → {dev}")
+    model = whisper.load_model(str(path), device=dev)
+    return model.to(dtype=torch.float32)
+
+def _load_whisper(device, backend_name):
+    global whisper_model, fast_model, _current_device, backend, load_error
+    load_error = None
     if whisper_model is not None:
         print(f"[WHISPER] Unloading from {_current_device}...")
         _force_unload()
@@ -24,37 +63,48 @@ def load_whisper(device=None):
         torch.cuda.reset_peak_memory_stats(gpu_id)
 
     try:
-        # Auto-download the exact model name you chose in config.py
-        if not WHISPER_PATH.exists():
-            print(f"[WHISPER] Downloading '{WHISPER_MODEL_NAME}' → {WHISPER_PATH.parent}")
-            whisper.load_model(WHISPER_MODEL_NAME, download_root=str(WHISPER_PATH.parent))
-
-        print(f"[WHISPER] Loading {WHISPER_MODEL_NAME} → {dev}")
-        whisper_model = whisper.load_model(str(WHISPER_PATH), device=dev)
-        whisper_model = whisper_model.to(dtype=torch.float32)
+        whisper_model = create_model(WHISPER_PATH, dev, backend_name)
         _current_device = dev
+        backend = backend_name
+        if WHISPER_FAST_PATH and WHISPER_FAST_PATH != WHISPER_PATH:
+            try:
+                fast_model = create_model(WHISPER_FAST_PATH, dev, backend_name)
+            except Exception as e:
+                print(f"[WHISPER] Fast tier {WHISPER_FAST_PATH.stem} not loaded ({e}) → single-tier verification")
 
         if gpu_id is not None:
             peak = torch.cuda.max_memory_allocated(gpu_id) / 1024**3
             print(f"[WHISPER] Peak VRAM: {peak:.2f} GB")
 
-        print(f"[WHISPER] Loaded {WHISPER_MODEL_NAME} on {dev}")
+        tiers = f" (+ {WHISPER_FAST_PATH.stem} fast tier)" if fast_model is not None else ""
+        print(f"[WHISPER] Loaded {WHISPER_MODEL_NAME}{tiers} on {dev} ({backend_name})")
         return True
 
     except Exception as e:
+        load_error = str(e)
         print(f"[WHISPER LOAD FAILED] {e}")
         return False
 
 def _force_unload():
-    global whisper_model, _current_device
+    global whisper_model, fast_model, _current_device, backend
     if whisper_model is not None:
         del whisper_model
         whisper_model = None
+    fast_model = None
     if _current_device and "cuda" in _current_device:
         torch.cuda.empty_cache()
     _current_device = None
+    backend = None
     gc.collect()
 
 def unload_whisper():
-    _force_unload()
-    print("[WHISPER] Unloaded")
\ No newline at end of file
+    with lock:
+        _force_unload()
+    print("[WHISPER] Unloaded")
+
+def transcribe(audio, **options) -> dict:
+    """whisper_model.transcribe under the model lock. Raises if Whisper is not loaded."""
+    with lock:
+        if whisper_model is None:
+            raise RuntimeError("Whisper model not loaded")
+        return whisper_model.transcribe(audio, **options)
\ No newline at end of file
@@ -0,0 +1,76 @@
+# models/whisper_audio.py
+"""
+In-process audio loading for Whisper.
+
+whisper.load_audio (and transcribe(str(path))) decodes every file through an
+ffmpeg subprocess, even our own 16-bit WAVs. ``load_audio`` reads
+WAV / FLAC / OGG with soundfile instead, downmixes to mono and resamples to
+16 kHz with a polyphase filter whose FIR taps are built once per rate pair.
+ffmpeg (FFMPEG_BIN) is only used for compressed and video containers
+(mp3, m4a, mp4, webm, ...) or files libsndfile refuses.
+"""
+import subprocess
+import time
+from functools import lru_cache
+from math import gcd
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import firwin, resample_poly
+
+from config import FFMPEG_BIN
+
+SAMPLE_RATE = 16000
+NATIVE_SUFFIXES = {".wav", ".flac", ".ogg"}
+
+
+def _ts() -> str:
+    return time.strftime("%H:%M:%S")
+
+
+def _ffmpeg() -> str:
+    exe = FFMPEG_BIN / "ffmpeg.exe"
+    return str(exe) if exe.is_file() else "ffmpeg"
+
+
+@lru_cache(maxsize=16)
+def _resampler(sr: int) -> tuple[int, int, np.ndarray]:
+    """(up, down, FIR taps) for sr → 16 kHz – the same filter resample_poly designs per call."""
+    g = gcd(sr, SAMPLE_RATE)
+    up, down = SAMPLE_RATE // g, sr // g
+    max_rate = max(up, down)
+    taps = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+    return up, down, taps
+
+
+def to_16k(data: np.ndarray, sr: int) -> np.ndarray:
+    """Mono float32 at 16 kHz, as whisper.load_audio would return it."""
+    audio = np.asarray(data, dtype=np.float32)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    if int(sr) != SAMPLE_RATE:
+        up, down, taps = _resampler(int(sr))
+        audio = resample_poly(audio, up, down, window=taps).astype(np.float32)
+    return np.ascontiguousarray(audio)
+
+
+def _ffmpeg_decode(path: Path) -> np.ndarray:
+    cmd = [_ffmpeg(), "-nostdin", "-threads", "0", "-i", str(path),
+           "-f", "f32le", "-ac", "1", "-acodec", "pcm_f32le", "-ar", str(SAMPLE_RATE), "-"]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode {path.name}: {result.stderr.decode(errors='replace')[-200:]}")
+    return np.frombuffer(result.stdout, dtype=np.float32).copy()
+
+
+def load_audio(path: str | Path) -> np.ndarray:
+    """Whisper input for ``path``: mono float32 at 16 kHz."""
+    path = Path(path)
+    if path.suffix.lower() in NATIVE_SUFFIXES:
+        try:
+            data, sr = sf.read(str(path), dtype="float32")
+            return to_16k(data, sr)
+        except Exception as e:
+            print(f"[{_ts()} WHISPER-AUDIO] soundfile could not read {path.name} ({e}) → ffmpeg")
+    return _ffmpeg_decode(path)
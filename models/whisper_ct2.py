@@ -0,0 +1,161 @@
+# models/whisper_ct2.py
+"""
+faster-whisper (CTranslate2) backend for models/whisper.py.
+
+``CT2Whisper`` quacks like an openai-whisper model for the rest of the app:
+``transcribe(audio, language=..., word_timestamps=..., ...)`` returns the same
+dict shape – {"text", "segments": [{"start", "end", "text", "words": [...]}],
+"language"} – so /production/transcribe, voice transcription and the chunk
+verifier keep working unchanged. The CT2 conversions of the configured model
+names (medium.en, base.en, ...) are downloaded into WHISPER_CT2_DIR on first
+use. WHISPER_CT2_COMPUTE "auto" means int8 on CPU and float16 on CUDA; "int8",
+"int8_float16", "float16" and "float32" are passed through. The model gets
+WHISPER_VAD_WORKERS CTranslate2 workers, so that many threads can transcribe on
+it at once (models/whisper_vad).
+
+Selected with config.WHISPER_BACKEND = "faster-whisper" or "backend" on
+/whisper_load; needs the optional faster-whisper package. ``benchmark``
+(POST /whisper_benchmark) times both backends on the same clips.
+"""
+import gc
+import importlib.util
+import time
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import torch
+
+from config import VOICE_DIR, WHISPER_CT2_COMPUTE, WHISPER_CT2_DIR, WHISPER_CT2_THREADS, WHISPER_VAD_WORKERS
+from text_utils import sanitize_for_whisper
+
+BACKENDS = ("openai", "faster-whisper")
+BENCH_CLIPS = 5
+# openai-whisper options CTranslate2 has no use for
+_IGNORED = {"fp16", "verbose"}
+
+
+def _ts() -> str:
+    return time.strftime("%H:%M:%S")
+
+
+def missing_packages() -> list[str]:
+    """Optional pip packages this backend needs that are not installed."""
+    return [] if importlib.util.find_spec("faster_whisper") else ["faster-whisper"]
+
+
+class CT2Whisper:
+    """openai-whisper stand-in backed by a faster_whisper.WhisperModel."""
+
+    def __init__(self, name: str, dev: str, compute_type: str = WHISPER_CT2_COMPUTE,
+                 threads: int = WHISPER_CT2_THREADS, workers: int = WHISPER_VAD_WORKERS):
+        from faster_whisper import WhisperModel
+
+        device, index = ("cuda", int(dev.split(":")[-1])) if "cuda" in dev else ("cpu", 0)
+        if compute_type == "auto":
+            compute_type = "float16" if device == "cuda" else "int8"
+        self.name = name
+        self.device = dev
+        self.compute_type = compute_type
+        self.model = WhisperModel(name, device=device, device_index=index, compute_type=compute_type,
+                                  cpu_threads=threads, num_workers=max(1, workers),
+                                  download_root=str(WHISPER_CT2_DIR))
+        self.is_multilingual = self.model.model.is_multilingual
+
+    def transcribe(self, audio, language: str | None = None, word_timestamps: bool = False,
+                   condition_on_previous_text: bool = True, **options) -> dict:
+        for key in _IGNORED:
+            options.pop(key, None)
+        options.setdefault("beam_size", 1)   # openai-whisper's transcribe() decodes greedily
+        if isinstance(audio, Path):
+            audio = str(audio)
+        if not self.is_multilingual:
+            language = "en"
+
+        segments, info = self.model.transcribe(audio, language=language, word_timestamps=word_timestamps,
+                                               condition_on_previous_text=condition_on_previous_text,
+                                               **options)
+        out = []
+        for seg in segments:
+            item = {
+                "id": seg.id, "start": seg.start, "end": seg.end, "text": seg.text,
+                "avg_logprob": seg.avg_logprob, "compression_ratio": seg.compression_ratio,
+                "no_speech_prob": seg.no_speech_prob, "temperature": seg.temperature,
+            }
+            if word_timestamps:
+                item["words"] = [{"word": w.word, "start": w.start, "end": w.end, "probability": w.probability}
+                                 for w in seg.words or []]
+            out.append(item)
+        return {"text": "".join(s["text"] for s in out), "segments": out, "language": info.language}
+
+
+def _clips(files) -> list[Path]:
+    if files:
+        return [Path(f) for f in files]
+    found = sorted(p for p in VOICE_DIR.glob("*") if p.suffix.lower() in {".wav", ".flac", ".ogg", ".mp3"})
+    if not found:
+        raise FileNotFoundError(f"No benchmark clips given and none found in {VOICE_DIR}")
+    return found[:BENCH_CLIPS]
+
+
+def benchmark(files=None, backends=BACKENDS, device: str = "cpu", word_timestamps: bool = True) -> dict:
+    """Real-time factor of each backend for WHISPER_PATH's model on the same clips.
+
+    Each backend loads its own model copy on ``device`` (the app's model is left
+    alone), transcribes a short warm-up, then every clip once. RTF = transcribe
+    seconds / audio seconds; ``relative.speed`` is the speed-up over "openai" and
+    ``relative.agreement`` the word-level similarity of the transcripts to it.
+    Backends that are not installed are listed under ``skipped``.
+    """
+    from models.whisper import WHISPER_MODEL_NAME, WHISPER_PATH, create_model
+    from models.whisper_audio import SAMPLE_RATE, load_audio
+
+    clips = [(path.name, load_audio(path)) for path in _clips(files)]
+    audio_s = sum(len(a) for _, a in clips) / SAMPLE_RATE
+    results, skipped = [], []
+    for backend in backends:
+        missing = missing_packages() if backend == "faster-whisper" else []
+        if missing:
+            reason = f"not installed: pip install {' '.join(missing)}"
+            print(f"[{_ts()} WHISPER-BENCH] Skipping {backend} ({reason})")
+            skipped.append({"backend": backend, "reason": reason})
+            continue
+        print(f"[{_ts()} WHISPER-BENCH] Backend {backend} on {device}")
+        start = time.time()
+        model = create_model(WHISPER_PATH, device, backend)
+        load_seconds = round(time.time() - start, 2)
+        try:
+            model.transcribe(clips[0][1][:5 * SAMPLE_RATE], fp16=False)
+            texts = []
+            t0 = time.perf_counter()
+            for _, audio in clips:
+                result = model.transcribe(audio, fp16=False, word_timestamps=word_timestamps)
+                texts.append(result["text"].strip())
+            seconds = time.perf_counter() - t0
+            results.append({
+                "backend": backend,
+                "compute_type": getattr(model, "compute_type", "float32"),
+                "load_seconds": load_seconds,
+                "transcribe_seconds": round(seconds, 3),
+                "rtf": round(seconds / audio_s, 4) if audio_s else None,
+                "texts": texts,
+            })
+        finally:
+            del model
+            gc.collect()
+            if "cuda" in device:
+                torch.cuda.empty_cache()
+
+    base = next((r for r in results if r["backend"] == "openai"), None)
+    if base and base["rtf"]:
+        for r in results:
+            agreement = [
+                SequenceMatcher(None, sanitize_for_whisper(a).split(), sanitize_for_whisper(b).split()).ratio()
+                for a, b in zip(base["texts"], r["texts"])
+            ]
+            r["relative"] = {
+                "speed": round(base["rtf"] / r["rtf"], 3) if r["rtf"] else None,
+                "agreement": round(sum(agreement) / len(agreement), 4) if agreement else None,
+            }
+    return {"model": WHISPER_MODEL_NAME, "device": device, "word_timestamps": word_timestamps,
+            "clips": [name for name, _ in clips], "audio_seconds": round(audio_s, 2), "results": results,
+            "skipped": skipped}
@@ -0,0 +1,194 @@
+# models/whisper_vad.py
+"""
+VAD-segmented transcription of long media for /production/transcribe.
+
+Used for files of WHISPER_VAD_MIN_SECONDS or more; the request field
+"vad": true/false overrides that length rule.
+
+One ``transcribe(..., word_timestamps=True)`` over an hour of narration walks
+the file 30 s window by window, strictly in sequence. ``transcribe_long``
+instead cuts the audio in the middle of silences (a frame-energy VAD: RMS
+below WHISPER_VAD_SILENCE_DB for at least WHISPER_VAD_MIN_SILENCE) into
+pieces of at most WHISPER_VAD_MAX_SECONDS, so every piece fits one Whisper
+window, and transcribes the pieces in parallel:
+
+- openai-whisper: WHISPER_VAD_BATCH pieces per padded log-mel ``whisper.decode``
+  pass, then word timestamps per piece from the same mel (whisper.timing).
+  Unreliable decodes are re-run through transcribe(), as in the chunk verifier.
+- faster-whisper: WHISPER_VAD_WORKERS threads calling transcribe() on the one
+  model (loaded with that many CTranslate2 workers).
+
+The language is resolved once, as transcribe() does it: "en" for English-only
+models, otherwise detected on the first piece and used for all of them.
+
+Word and segment times are shifted by each piece's offset and returned in
+openai-whisper's transcribe() dict shape, so the route writes the usual
+_timing.json and .srt.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+import whisper
+from whisper.timing import add_word_timestamps
+from whisper.tokenizer import get_tokenizer
+
+import models.whisper as whisper_mod
+from config import (
+    WHISPER_VAD_SILENCE_DB, WHISPER_VAD_MIN_SILENCE, WHISPER_VAD_MAX_SECONDS,
+    WHISPER_VAD_BATCH, WHISPER_VAD_WORKERS,
+)
+from models.whisper_audio import SAMPLE_RATE
+from models.whisper_verify import COMPRESSION_RATIO_THRESHOLD, LOGPROB_THRESHOLD
+
+FRAME_SECONDS = 0.02
+NO_SPEECH_THRESHOLD = 0.6   # transcribe() default
+
+
+def _ts() -> str:
+    return time.strftime("%H:%M:%S")
+
+
+def split_at_silence(audio: np.ndarray) -> list[tuple[int, int]]:
+    """(start, end) sample ranges of at most WHISPER_VAD_MAX_SECONDS covering ``audio``.
+
+    Cuts go in the middle of the furthest silence that keeps a piece within the
+    limit (a hard cut only when there is none). Pieces without a single
+    non-silent frame are dropped.
+    """
+    hop = int(FRAME_SECONDS * SAMPLE_RATE)
+    n = len(audio) // hop
+    if n == 0:
+        return []
+    frames = audio[:n * hop].reshape(n, hop)
+    db = 20 * np.log10(np.sqrt((frames ** 2).mean(axis=1)) + 1e-10)
+    silent = db < WHISPER_VAD_SILENCE_DB
+
+    min_run = max(1, int(round(WHISPER_VAD_MIN_SILENCE / FRAME_SECONDS)))
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], silent.astype(np.int8), [0]])))
+    cuts = [(a + b) // 2 * hop for a, b in zip(edges[::2], edges[1::2]) if b - a >= min_run]
+    cuts = [c for c in cuts if 0 < c < len(audio)] + [len(audio)]
+
+    max_len = int(WHISPER_VAD_MAX_SECONDS * SAMPLE_RATE)
+    pieces, start, k = [], 0, 0
+    while start < len(audio):
+        end = None
+        while k < len(cuts) and cuts[k] - start <= max_len:
+            end = cuts[k]
+            k += 1
+        if end is None:
+            end = start + max_len
+        if not silent[start // hop:end // hop + 1].all():
+            pieces.append((start, min(end, len(audio))))
+        start = end
+    return pieces
+
+
+def _detect_language(model, clip: np.ndarray) -> str:
+    """openai-whisper: most likely language of one (≤ 30 s) clip."""
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(clip)),
+                                      model.dims.n_mels, device=model.device)
+    _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+
+def _transcribe_batched(model, audio: np.ndarray, pieces: list, language: str | None) -> list[list[dict]]:
+    """openai-whisper: padded decode batches + per-piece word alignment."""
+    results = [None] * len(pieces)
+    retry = []
+    tokenizers = {}
+    for b in range(0, len(pieces), WHISPER_VAD_BATCH):
+        group = list(range(b, min(b + WHISPER_VAD_BATCH, len(pieces))))
+        clips = [audio[pieces[k][0]:pieces[k][1]] for k in group]
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(clip)),
+                                        model.dims.n_mels, device=model.device)
+            for clip in clips
+        ])
+        options = whisper.DecodingOptions(language=language, without_timestamps=True, fp16=False)
+        for k, clip, mel, result in zip(group, clips, mels, whisper.decode(model, mels, options)):
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                results[k] = []
+                continue
+            if result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD:
+                retry.append(k)
+                continue
+            if result.language not in tokenizers:
+                tokenizers[result.language] = get_tokenizer(
+                    model.is_multilingual, num_languages=model.num_languages,
+                    language=result.language, task="transcribe",
+                )
+            segment = {"seek": 0, "start": 0.0, "end": len(clip) / SAMPLE_RATE,
+                       "text": result.text, "tokens": result.tokens}
+            add_word_timestamps(segments=[segment], model=model, tokenizer=tokenizers[result.language],
+                                mel=mel, num_frames=len(clip) // whisper.audio.HOP_LENGTH,
+                                last_speech_timestamp=0.0)
+            results[k] = [segment]
+
+    for k in retry:
+        start, end = pieces[k]
+        results[k] = model.transcribe(audio[start:end], language=language, word_timestamps=True,
+                                      fp16=False, condition_on_previous_text=False)["segments"]
+    if retry:
+        print(f"[{_ts()} WHISPER-VAD] {len(retry)} piece(s) re-run through transcribe()")
+    return results
+
+
+def _transcribe_threads(model, audio: np.ndarray, pieces: list,
+                        language: str | None) -> tuple[list[list[dict]], str | None]:
+    """faster-whisper: WHISPER_VAD_WORKERS concurrent transcribe() calls on one model.
+
+    Without a language the first piece runs alone and its detected language is
+    used for the rest. Returns (segments per piece, language).
+    """
+    def run(piece):
+        start, end = piece
+        return model.transcribe(audio[start:end], language=language, word_timestamps=True,
+                                condition_on_previous_text=False)
+
+    if not pieces:
+        return [], language
+    first = None
+    if language is None:
+        first = run(pieces[0])
+        language = first["language"]
+    with ThreadPoolExecutor(max_workers=max(1, WHISPER_VAD_WORKERS)) as pool:
+        rest = list(pool.map(run, pieces[1:] if first else pieces))
+    return [r["segments"] for r in ([first] if first else []) + rest], language
+
+
+def transcribe_long(audio: np.ndarray, language: str | None = None) -> dict:
+    """Word-timestamped transcription of a long 16 kHz clip, in transcribe()'s result shape."""
+    start = time.time()
+    pieces = split_at_silence(audio)
+    with whisper_mod.lock:
+        model = whisper_mod.whisper_model
+        if model is None:
+            raise RuntimeError("Whisper model not loaded")
+        if language is None and not model.is_multilingual:
+            language = "en"
+        if isinstance(model, whisper.Whisper):
+            if language is None and pieces:
+                language = _detect_language(model, audio[pieces[0][0]:pieces[0][1]])
+                print(f"[{_ts()} WHISPER-VAD] Detected language: {language}")
+            per_piece = _transcribe_batched(model, audio, pieces, language)
+        else:
+            per_piece, language = _transcribe_threads(model, audio, pieces, language)
+
+    segments = []
+    for (piece_start, _), piece_segments in zip(pieces, per_piece):
+        offset = piece_start / SAMPLE_RATE
+        for seg in piece_segments:
+            segments.append({
+                "id": len(segments),
+                "start": round(seg["start"] + offset, 2),
+                "end": round(seg["end"] + offset, 2),
+                "text": seg["text"].strip(),
+                "words": [{**w, "start": round(w["start"] + offset, 2), "end": round(w["end"] + offset, 2)}
+                          for w in seg.get("words", [])],
+            })
+
+    print(f"[{_ts()} WHISPER-VAD] {len(audio) / SAMPLE_RATE:.0f}s of audio → {len(pieces)} piece(s), "
+          f"{len(segments)} segment(s) in {time.time() - start:.1f}s")
+    return {"text": " ".join(s["text"] for s in segments), "segments": segments, "language": language}
@@ -0,0 +1,304 @@
+# models/whisper_verify.py
+"""
+Batched Whisper verification of generated TTS chunks.
+
+The three ``verify_with_whisper`` functions in audio_post_XTTS / FISH / KOKORO
+are thin wrappers around ``verify_file``, which reads the chunk once with
+soundfile (for the clip check and as Whisper input, no ffmpeg), resamples it
+to 16 kHz (models/whisper_audio.to_16k) and hands the array to the shared
+``WhisperVerifier``.
+
+The verifier is one background thread in front of the global whisper_model.
+Clips from concurrent jobs are queued. A clip that finds the queue
+otherwise empty is decoded straight away (a single job blocks on each chunk,
+so waiting would never find batch-mates); when others are already queued,
+the verifier takes them and waits up to WHISPER_VERIFY_WAIT_MS for more, up
+to WHISPER_VERIFY_BATCH clips. They are padded to 30 s, stacked into one
+log-mel batch per language and decoded in a single ``whisper.decode`` pass.
+Clips that arrive during a decode are picked up together by the next one. Clips longer than 30 s and decodes that Whisper
+itself would retry (compression ratio / avg log-prob past the transcribe()
+defaults) go through ``whisper_model.transcribe`` instead. Every model call
+holds ``models.whisper.lock``. WHISPER_VERIFY_BATCH = 1 decodes clip by clip.
+
+Two tiers: when models.whisper also holds a fast model (WHISPER_FAST_PATH,
+loaded next to WHISPER_PATH; None turns the tier off), each chunk is checked
+with it first. Only a similarity within WHISPER_ESCALATE_MARGIN points of the
+tolerance (70-90 % for tolerance 80 and the default margin) is re-checked with
+the main model; clear passes and clear failures keep the fast verdict.
+Per-chunk tiers and per-job totals (escalations, seconds spent, estimated
+seconds saved against checking everything with the main model) go into
+job.json.
+"""
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import torch
+import whisper
+
+import models.whisper as whisper_mod
+from config import WHISPER_VERIFY_BATCH, WHISPER_VERIFY_WAIT_MS, WHISPER_ESCALATE_MARGIN
+from models.whisper_audio import SAMPLE_RATE, to_16k
+from text_utils import sanitize_for_whisper
+
+MAX_SAMPLES = whisper.audio.N_SAMPLES      # one 30 s window at 16 kHz
+# transcribe() defaults: beyond these it would re-decode at a higher temperature
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+
+verifier = None
+_verifier_lock = threading.Lock()
+# Process-wide [wall seconds, audio seconds] per tier; the main tier's rate prices the
+# checks the fast tier settled on its own.
+_tier_totals = {"fast": [0.0, 0.0], "main": [0.0, 0.0]}
+
+
+def _ts() -> str:
+    return time.strftime("%H:%M:%S")
+
+
+class WhisperVerifier:
+    def __init__(self, batch_size: int = WHISPER_VERIFY_BATCH, wait_ms: float = WHISPER_VERIFY_WAIT_MS):
+        self.batch_size = max(1, batch_size)
+        self.wait = wait_ms / 1000.0
+        self.jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="whisper-verify", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio: np.ndarray, language: str | None = "en", tier: str = "main") -> Future:
+        """Queue one 16 kHz mono clip for the "main" or "fast" model; resolves to the transcript."""
+        fut = Future()
+        self.jobs.put((fut, np.ascontiguousarray(audio, dtype=np.float32), (language, tier)))
+        return fut
+
+    def transcribe(self, audio: np.ndarray, language: str | None = "en", tier: str = "main") -> str:
+        return self.submit(audio, language, tier).result()
+
+    def _collect(self) -> list:
+        batch = [self.jobs.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        # Only wait for batch-mates when there is concurrent work to batch with
+        deadline = time.monotonic() + (self.wait if len(batch) > 1 else 0)
+        while len(batch) < self.batch_size:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                batch.append(self.jobs.get(timeout=left))
+            except queue.Empty:
+                break
+        return [job for job in batch if job[0].set_running_or_notify_cancel()]
+
+    def _run(self) -> None:
+        while True:
+            groups = {}
+            for job in self._collect():
+                groups.setdefault(job[2], []).append(job)
+            for (language, tier), jobs in groups.items():
+                try:
+                    self._decode(language, tier, jobs)
+                except Exception as e:
+                    print(f"[{_ts()} WHISPER-VERIFY] Batch of {len(jobs)} failed: {e}")
+                    for fut, _, _ in jobs:
+                        if not fut.done():
+                            fut.set_exception(e)
+
+    def _decode(self, language: str | None, tier: str, jobs: list) -> None:
+        with whisper_mod.lock:
+            model = whisper_mod.whisper_model
+            if tier == "fast" and whisper_mod.fast_model is not None:
+                model = whisper_mod.fast_model
+            if model is None:
+                raise RuntimeError("Whisper model not loaded")
+
+            # Padded log-mel batches need the openai-whisper model; faster-whisper goes clip by clip
+            batchable = isinstance(model, whisper.Whisper)
+            batch = [job for job in jobs if batchable and len(job[1]) <= MAX_SAMPLES]
+            single = [job for job in jobs if not batchable or len(job[1]) > MAX_SAMPLES]
+            retried = 0
+            start = time.time()
+            if batch:
+                mel = torch.stack([
+                    whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)),
+                                                model.dims.n_mels, device=model.device)
+                    for _, audio, _ in batch
+                ])
+                options = whisper.DecodingOptions(language=language, without_timestamps=True, fp16=False)
+                for job, result in zip(batch, whisper.decode(model, mel, options)):
+                    if (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                            or result.avg_logprob < LOGPROB_THRESHOLD):
+                        single.append(job)
+                        retried += 1
+                    else:
+                        job[0].set_result(result.text.strip())
+
+            for fut, audio, _ in single:
+                result = model.transcribe(audio, language=language, fp16=False, word_timestamps=False)
+                fut.set_result(result["text"].strip())
+
+        if len(jobs) > 1 or retried:
+            print(f"[{_ts()} WHISPER-VERIFY] {tier}: {len(batch)} clip(s) in one decode, "
+                  f"{len(single)} via transcribe ({retried} retried) in {time.time() - start:.2f}s")
+
+
+def get_verifier() -> WhisperVerifier:
+    global verifier
+    with _verifier_lock:
+        if verifier is None:
+            verifier = WhisperVerifier()
+        return verifier
+
+
+def _similarity(original_text: str, transcribed: str) -> float:
+    return SequenceMatcher(
+        None,
+        sanitize_for_whisper(original_text).split(),
+        sanitize_for_whisper(transcribed).split()
+    ).ratio()
+
+
+def _timed_transcribe(audio: np.ndarray, language: str, tier: str) -> tuple[str, float]:
+    start = time.time()
+    text = get_verifier().transcribe(audio, language, tier)
+    seconds = time.time() - start
+    totals = _tier_totals[tier]
+    totals[0] += seconds
+    totals[1] += len(audio) / SAMPLE_RATE
+    return text, seconds
+
+
+def _add_tier_stats(j: dict, tiers: dict) -> None:
+    """Accumulate one tiered check into the job-level "whisper_tiers" block."""
+    stats = j.setdefault("whisper_tiers", {
+        "fast_model": whisper_mod.WHISPER_FAST_PATH.stem,
+        "main_model": whisper_mod.WHISPER_MODEL_NAME,
+        "checks": 0, "escalated": 0,
+        "audio_seconds": 0.0, "fast_seconds": 0.0, "main_seconds": 0.0,
+    })
+    stats["checks"] += 1
+    stats["escalated"] += tiers["tier"] == "main"
+    for key in ("audio_seconds", "fast_seconds", "main_seconds"):
+        stats[key] = round(stats[key] + tiers[key], 3)
+    stats["escalation_rate"] = round(stats["escalated"] / stats["checks"], 4)
+    main_seconds, main_audio = _tier_totals["main"]
+    # None until the main model has been timed at least once in this process
+    stats["saved_seconds"] = (
+        round(main_seconds / main_audio * stats["audio_seconds"]
+              - stats["fast_seconds"] - stats["main_seconds"], 2)
+        if main_audio else None
+    )
+
+
+def _write_result(job_file: Path, chunk_idx: int, transcribed: str, sim: float,
+                  passed: bool, tolerance: float, tag: str, tiers: dict | None = None) -> None:
+    try:
+        with open(job_file, "r+", encoding="utf-8") as f:
+            j = json.load(f)
+            c = j["chunks"][chunk_idx]
+            c["whisper_transcript"] = transcribed
+            c["verification_passed"] = passed
+            c["whisper_similarity"] = round(sim, 4)
+            c["processing_error"] = (
+                f"Whisper similarity {sim:.3f} < {tolerance/100:.2f}" if not passed else None
+            )
+            if tiers:
+                c["whisper_tier"] = tiers["tier"]
+                c["whisper_fast_similarity"] = round(tiers["fast_similarity"], 4)
+                _add_tier_stats(j, tiers)
+            f.seek(0)
+            json.dump(j, f, ensure_ascii=False, indent=2)
+            f.truncate()
+    except Exception as e:
+        print(f"[{_ts()} {tag}] Failed to update job.json: {e}")
+
+
+def verify_audio(
+    data: np.ndarray,
+    sr: int,
+    original_text: str,
+    language: str = "en",
+    tolerance: float = 80.0,
+    job_file: Path = None,
+    chunk_idx: int = None,
+    clip_threshold: float = 0.95,
+    tag: str = "WHISPER",
+) -> bool:
+    """Verify an in-memory chunk: clip check, batched (tiered) transcription, word similarity.
+
+    Writes whisper_transcript / whisper_similarity / verification_passed /
+    processing_error (+ whisper_tier / whisper_fast_similarity and the job's
+    "whisper_tiers" totals when two tiers are loaded) to ``job_file`` chunk
+    ``chunk_idx`` when both are given.
+    """
+    if whisper_mod.whisper_model is None:
+        print(f"[{_ts()} {tag}] Whisper not loaded → skip verification")
+        return True
+
+    if np.max(np.abs(data)) > clip_threshold + 1e-10:
+        print(f"[{_ts()} {tag}] CLIPPED → REJECT")
+        return False
+
+    audio = to_16k(data, sr)
+    tiers = None
+    if whisper_mod.fast_model is not None:
+        fast_text, fast_seconds = _timed_transcribe(audio, language, "fast")
+        fast_sim = _similarity(original_text, fast_text)
+        tiers = {"tier": "fast", "fast_similarity": fast_sim, "audio_seconds": len(audio) / SAMPLE_RATE,
+                 "fast_seconds": fast_seconds, "main_seconds": 0.0}
+        if abs(fast_sim - tolerance / 100.0) <= WHISPER_ESCALATE_MARGIN / 100.0:
+            print(f"[{_ts()} {tag}] Fast tier {fast_sim:.4f} is borderline → escalating to "
+                  f"{whisper_mod.WHISPER_MODEL_NAME}")
+            transcribed, tiers["main_seconds"] = _timed_transcribe(audio, language, "main")
+            tiers["tier"] = "main"
+            sim = _similarity(original_text, transcribed)
+        else:
+            transcribed, sim = fast_text, fast_sim
+    else:
+        transcribed = get_verifier().transcribe(audio, language)
+        sim = _similarity(original_text, transcribed)
+    passed = sim >= (tolerance / 100.0)
+
+    if job_file and job_file.exists() and chunk_idx is not None:
+        _write_result(job_file, chunk_idx, transcribed, sim, passed, tolerance, tag, tiers)
+
+    print(f"[{_ts()} {tag}] Expected : \"{original_text}\"")
+    print(f"[{_ts()} {tag}] Heard    : \"{transcribed}\"" + (f" ({tiers['tier']} tier)" if tiers else ""))
+    print(f"[{_ts()} {tag}] Similarity {sim:.4f} ≥ {tolerance/100:.2f} → {'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+def verify_file(
+    wav_path: str,
+    original_text: str,
+    language: str = "en",
+    tolerance: float = 80.0,
+    job_file: Path = None,
+    chunk_idx: int = None,
+    clip_threshold: float = 0.95,
+    tag: str = "WHISPER",
+) -> bool:
+    """``verify_audio`` for a chunk on disk; the file is read once."""
+    print(f"[{_ts()} {tag}] Verifying chunk: {Path(wav_path).name}")
+
+    if whisper_mod.whisper_model is None:
+        print(f"[{_ts()} {tag}] Whisper not loaded → skip verification")
+        return True
+
+    try:
+        data, sr = sf.read(wav_path, dtype="float32")
+    except Exception as e:
+        print(f"[{_ts()} {tag}] Read failed: {e}")
+        return False
+
+    return verify_audio(data, sr, original_text, language, tolerance, job_file, chunk_idx,
+                        clip_threshold, tag)
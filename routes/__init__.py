@@ -7,6 +7,7 @@ bp = Blueprint('api', __name__)
 from . import static, voice, model, infer_xtts, infer_fish, admin
 from . import stable_audio
 from . import ace_step
+from . import sfx_library
 from .settings_manager import bp as settings_bp
 from .voice_transcribe import bp as voice_transcribe_bp
 from . import infer_kokoro
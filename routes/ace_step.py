@@ -5,19 +5,28 @@ import uuid
 import base64
 import json
 import time
+import shutil
 import subprocess
 import soundfile as sf
 import torch
 from flask import request, jsonify, make_response
 from pathlib import Path
 from . import bp
-from config import OUTPUT_DIR, FFMPEG_BIN, PROJECTS_OUTPUT
+from config import OUTPUT_DIR, FFMPEG_BIN
 from models.ace_step_loader import load_ace, unload_ace, is_model_loaded, generate as ace_generate
-from save_utils import handle_save
-from audio_post import ace_post_process, score_with_clap
+from models.ace_lora import register_lora, unregister_lora, lora_status
+from models.ace_latent_cache import latent_cache
+from save_utils import handle_save, resolve_save_target
+from models.sfx_library import index_saved
+from .sfx_library import library_lookup
+from audio_post import ace_post_process, ace_post_process_blocks, score_with_clap
 
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+ACE_MAX_DURATION = 60.0
+ACE_LONG_FORM_MAX_DURATION = 240.0
+ACE_CLAP_EXCERPT_SECONDS = 30.0
+
 def _ffmpeg_args(fmt: str):
     fmt = fmt.lower()
     if fmt == "mp3":  return ["-c:a", "libmp3lame", "-q:a", "0"]
@@ -26,6 +35,89 @@ def _ffmpeg_args(fmt: str):
     if fmt == "m4a":  return ["-c:a", "aac", "-b:a", "320k"]
     return []  # WAV = no extra args
 
+def _parse_loras(d: dict) -> list[tuple[str, float]]:
+    """Accepts "loras": [{"name", "weight"}, ...] or the short "lora" + "lora_weight"."""
+    if d.get("loras"):
+        return [(str(l["name"]), float(l.get("weight", 1.0))) for l in d["loras"]]
+    if d.get("lora"):
+        return [(str(d["lora"]), float(d.get("lora_weight", 1.0)))]
+    return []
+
+def _ace_respond(results: list, temp_wavs: list, save_dir, stem, output_format: str, extra: dict | None = None,
+                 prompt: str | None = None, device=None):
+    """Sort variants by CLAP, then save them (with format conversion) or return base64 for the browser.
+
+    Saved files are added to the SFX asset library under ``prompt`` (CLAP on ``device``).
+    """
+    results.sort(key=lambda x: x["score"], reverse=True)
+
+    # SAVE WITH FORMAT CONVERSION
+    if save_dir is not None:
+        saved_files = []
+        for idx, res in enumerate(results):
+            is_best = idx == 0
+            suffix = " (BEST)" if is_best else f"_v{idx+1}"
+            filename = f"{stem}{suffix}.{output_format}"
+            dest_path = save_dir / filename
+
+            src_file = res["path"]
+            if output_format != "wav":
+                conv_path = Path(src_file).with_suffix(f".{output_format}")
+                cmd = [
+                    str(FFMPEG_BIN / "ffmpeg.exe"),
+                    "-i", src_file,
+                    *_ffmpeg_args(output_format),
+                    str(conv_path),
+                    "-y"
+                ]
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                if result.returncode == 0:
+                    src_file = str(conv_path)
+                    Path(res["path"]).unlink(missing_ok=True)
+                else:
+                    print(f"FFMPEG failed: {result.stderr}")
+
+            saved_path, saved_rel = handle_save(src_file, str(dest_path), "ace")
+            index_saved(saved_path, prompt, "ace", device, score=res["score"], is_best=is_best, seed=res["seed"])
+
+            saved_files.append({
+                "filename": Path(saved_path).name,
+                "rel_path": saved_rel,
+                "score": res["score"],        # ← this makes your UI show CLAP score
+                "clap_score": res["score"],   # ← kept for backward compatibility
+                "is_best": is_best,
+                "seed": res["seed"]
+            })
+
+            if not is_best and Path(src_file).exists() and src_file != res["path"]:
+                Path(src_file).unlink()
+
+        for p in temp_wavs:
+            if p.exists():
+                p.unlink()
+
+        return jsonify({"saved_files": saved_files, "num_generated": len(results), **(extra or {})})
+
+    # PLAY IN BROWSER
+    audios = []
+    for idx, res in enumerate(results):
+        is_best = idx == 0
+        with open(res["path"], "rb") as f:
+            b64 = base64.b64encode(f.read()).decode()
+        audios.append({
+            "audio_base64": b64,
+            "score": res["score"],
+            "is_best": is_best,
+            "seed": res["seed"]
+        })
+        os.remove(res["path"])
+
+    for p in temp_wavs:
+        if p.exists():
+            os.remove(p)
+
+    return jsonify({"audios": audios, **(extra or {})})
+
 @bp.route("/ace_load", methods=["POST"])
 def ace_load():
     """Load the ACE-Step model onto the specified GPU.
@@ -61,6 +153,45 @@ def ace_status():
     from models.ace_step_loader import is_model_loaded
     return jsonify({"loaded": is_model_loaded()})
 
+@bp.route("/ace_lora_register", methods=["POST"])
+def ace_lora_register():
+    """Register a LoRA adapter for ACE-Step (no model reload, loaded on first use).
+
+    Request JSON:
+        { "name": "rap", "path": "ACE-Step/ACE-Step-v1-chinese-rap-LoRA" }
+        path = local folder / .safetensors file, or HF repo id (downloaded now)
+
+    Response:
+        200 → { "success": true, "name", "path" }
+    """
+    d = request.json or {}
+    name = str(d.get("name", "")).strip()
+    path = str(d.get("path", "")).strip()
+    if not name or not path:
+        return jsonify({"success": False, "error": "name and path required"}), 400
+    try:
+        local = register_lora(name, path)
+    except Exception as e:
+        print(f"[ACE-LORA] Register failed: {e}")
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "name": name, "path": local})
+
+
+@bp.route("/ace_lora_unregister", methods=["POST"])
+def ace_lora_unregister():
+    """Remove a registered LoRA (also drops it from the GPU if resident)."""
+    name = str((request.json or {}).get("name", "")).strip()
+    if not unregister_lora(name):
+        return jsonify({"success": False, "error": f"Unknown LoRA '{name}'"}), 404
+    return jsonify({"success": True})
+
+
+@bp.route("/ace_lora_list", methods=["GET"])
+def ace_lora_list():
+    """Registered adapters, which are resident on the GPU (MB), the active set and the cache budget."""
+    return jsonify(lora_status())
+
+
 @bp.route("/ace_infer", methods=["POST"])
 def ace_infer():
     """Generate music using ACE-Step.
@@ -69,7 +200,9 @@ def ace_infer():
 
     Key request fields:
         prompt (str)                     – Required multi-line prompt (STYLE line + lyrics)
-        duration (float)                 – 1.0–60.0 seconds
+        duration (float)                 – 1.0–60.0 seconds (1.0–240.0 with long_form)
+        long_form (bool)                 – Overlapped decode above 48 s, decoded windows
+                                           streamed to disk and block-based post chain
         steps (int)                      – Inference steps (10–200)
         guidance (float)                 – Main CFG scale
         min_guidance (float)             – Minimum guidance during decay
@@ -81,9 +214,14 @@ def ace_infer():
         erg_tag / erg_lyric / erg_diffusion – ERG ablation flags
         oss_steps (str)                  – One-step scheduler steps string
         num_waveforms_per_prompt (int)   – 1–4 variants (sorted by CLAP score)
+        loras (list)                     – [{ "name", "weight" }, ...] registered adapters;
+                                           several are merged by weight (or "lora" + "lora_weight")
         seed (int/str)                   – Fixed seed or "-1" for random
         output_format (str)              – wav (default), mp3, ogg, flac, m4a
         save_path (str)                  – If present → files saved on disk
+        library_lookup (bool)            – Return an existing ACE asset from the SFX library
+                                           instead of generating when one scores ≥ library_threshold
+        library_threshold (float)        – Default config.SFX_LIBRARY_THRESHOLD
 
     Returns (when save_path given):
         { "saved_files": [ { "filename", "rel_path", "clap_score", "is_best", "seed" }, ... ], "num_generated": N }
@@ -107,27 +245,18 @@ def ace_infer():
             return jsonify({"error": "Missing prompt"}), 400
 
         # SAVE PATH
-        raw_save_path = d.get("save_path")
-        save_path = "" if raw_save_path is None else str(raw_save_path).strip().rstrip("/\\ ")
+        save_path, save_dir, stem = resolve_save_target(d.get("save_path"))
         should_save = bool(save_path)
 
-        if should_save:
-            p = Path(save_path)
-            if "/" in save_path or "\\" in save_path or p.is_absolute():
-                save_dir = p.expanduser().resolve()
-                stem = p.stem.split(".")[0] if p.suffix else p.name
-                if p.suffix:
-                    save_dir = save_dir.parent
-            else:
-                save_dir = PROJECTS_OUTPUT / save_path
-                stem = save_path
-            save_dir.mkdir(parents=True, exist_ok=True)
-        else:
-            save_dir = None
-            stem = None
-
         # ALL ACE PARAMS (STRICT ORDER)
-        duration = max(1.0, min(60.0, float(d.get("duration", 10.0))))
+        long_form = bool(d.get("long_form", False))
+        max_duration = ACE_LONG_FORM_MAX_DURATION if long_form else ACE_MAX_DURATION
+        duration = max(1.0, min(max_duration, float(d.get("duration", 10.0))))
+
+        hit = library_lookup(d, prompt, "ace", save_dir, stem, duration)
+        if hit is not None:
+            return jsonify(hit)
+
         steps = max(10, min(200, int(d.get("steps", 60))))
         guidance = max(1.0, min(10.0, float(d.get("guidance", 3.5))))
         scheduler = d.get("scheduler", "euler")
@@ -144,6 +273,10 @@ def ace_infer():
         oss_steps = d.get("oss_steps", "")
         num_waveforms = max(1, min(4, int(d.get("num_waveforms_per_prompt", 3))))
         output_format = d.get("output_format", "wav").lower()
+        loras = _parse_loras(d)
+        unknown = [n for n, _ in loras if n not in lora_status()["registered"]]
+        if unknown:
+            return jsonify({"error": f"LoRA not registered: {', '.join(unknown)}"}), 400
 
         # SEED
         raw_seed = d.get("seed", "-1")
@@ -160,6 +293,7 @@ def ace_infer():
 
         print("\n[PARAMETERS]")
         print(f"   Duration           : {duration:.1f}s")
+        print(f"   Long-form          : {long_form}")
         print(f"   Steps              : {steps}")
         print(f"   Guidance Scale     : {guidance:.2f}")
         print(f"   Min Guidance       : {min_guidance:.2f}")
@@ -176,6 +310,7 @@ def ace_infer():
         print(f"   OSS Steps          : {oss_steps or 'None'}")
         print(f"   Seed               : {raw_seed} → {'RANDOM' if use_random_seed else 'FIXED'}")
         print(f"   Variants           : {num_waveforms}")
+        print(f"   LoRA               : {', '.join(f'{n}@{w:g}' for n, w in loras) or 'None'}")
         print(f"   Output Format      : {output_format.upper()}")
         print(f"   Save Path          : {save_path or 'Play in browser'}")
 
@@ -217,10 +352,20 @@ def ace_infer():
                 oss_steps=oss_steps,
                 guidance_scale_text=guidance_text,
                 guidance_scale_lyric=guidance_lyric,
+                long_form=long_form,
+                loras=loras,
             )
 
-            processed = ace_post_process(str(tmp))
-            data, rate = sf.read(processed)
+            if long_form:
+                # Never pull the whole track into RAM: post in blocks, score a centre excerpt
+                processed = ace_post_process_blocks(str(tmp))
+                info = sf.info(processed)
+                excerpt = int(ACE_CLAP_EXCERPT_SECONDS * info.samplerate)
+                start = max(0, (info.frames - excerpt) // 2)
+                data, rate = sf.read(processed, start=start, frames=excerpt)
+            else:
+                processed = ace_post_process(str(tmp))
+                data, rate = sf.read(processed)
             score = score_with_clap(data, prompt, rate)
 
             results.append({
@@ -233,73 +378,8 @@ def ace_infer():
             print(f"[VARIANT {i+1}] CLAP: {score:.4f} | {Path(tmp).name}")
             torch.cuda.empty_cache()
 
-        results.sort(key=lambda x: x["score"], reverse=True)
-
-        # SAVE WITH FORMAT CONVERSION
-        if should_save:
-            saved_files = []
-            for idx, res in enumerate(results):
-                is_best = idx == 0
-                suffix = " (BEST)" if is_best else f"_v{idx+1}"
-                filename = f"{stem}{suffix}.{output_format}"
-                dest_path = save_dir / filename
-
-                src_file = res["path"]
-                if output_format != "wav":
-                    conv_path = Path(src_file).with_suffix(f".{output_format}")
-                    cmd = [
-                        str(FFMPEG_BIN / "ffmpeg.exe"),
-                        "-i", src_file,
-                        *_ffmpeg_args(output_format),
-                        str(conv_path),
-                        "-y"
-                    ]
-                    result = subprocess.run(cmd, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        src_file = str(conv_path)
-                        Path(res["path"]).unlink(missing_ok=True)
-                    else:
-                        print(f"FFMPEG failed: {result.stderr}")
-
-                saved_path, saved_rel = handle_save(src_file, str(dest_path), "ace")
-
-                saved_files.append({
-                    "filename": Path(saved_path).name,
-                    "rel_path": saved_rel,
-                    "score": res["score"],        # ← this makes your UI show CLAP score
-                    "clap_score": res["score"],   # ← kept for backward compatibility
-                    "is_best": is_best,
-                    "seed": res["seed"]
-                })
-
-                if not is_best and Path(src_file).exists() and src_file != res["path"]:
-                    Path(src_file).unlink()
-
-            for p in temp_wavs:
-                if p.exists():
-                    p.unlink()
-
-            return jsonify({"saved_files": saved_files, "num_generated": len(results)})
-
-        # PLAY IN BROWSER
-        audios = []
-        for idx, res in enumerate(results):
-            is_best = idx == 0
-            with open(res["path"], "rb") as f:
-                b64 = base64.b64encode(f.read()).decode()
-            audios.append({
-                "audio_base64": b64,
-                "score": res["score"],
-                "is_best": is_best,
-                "seed": res["seed"]
-            })
-            os.remove(res["path"])
-
-        for p in temp_wavs:
-            if p.exists():
-                os.remove(p)
-
-        return jsonify({"audios": audios})
+        return _ace_respond(results, temp_wavs, save_dir, stem, output_format, prompt=prompt,
+                            device=d.get("device", "0"))
 
     except Exception as e:
         import traceback
@@ -307,4 +387,336 @@ def ace_infer():
         return jsonify({"error": "Server error"}), 500
     
     
-    
\ No newline at end of file
+    
+
+def _ace_task(task: str):
+    """Shared handler for the audio-conditioned ACE-Step endpoints.
+
+    The source track is encoded through music_dcae once and cached by content
+    hash (models/ace_latent_cache.py), so repeated repaints / extends of the
+    same song only pay for diffusion + decode.
+    """
+    try:
+        d = request.json
+        if not d:
+            return jsonify({"error": "Empty payload"}), 400
+
+        print("\n" + "="*70)
+        print(f"ACE-STEP {task.upper()}")
+        print("="*70)
+
+        prompt = d.get("prompt", "").strip()
+        if not prompt:
+            return jsonify({"error": "Missing prompt"}), 400
+
+        src_audio = None
+        src_duration = None
+        if task != "retake":
+            src_audio = str(d.get("src_audio", "")).strip()
+            if not src_audio or not Path(src_audio).is_file():
+                return jsonify({"error": f"src_audio not found: {src_audio}"}), 400
+            src_audio = str(Path(src_audio).resolve())
+            src_duration = sf.info(src_audio).duration
+
+        save_path, save_dir, stem = resolve_save_target(d.get("save_path"))
+
+        steps = max(10, min(200, int(d.get("steps", 60))))
+        guidance = max(1.0, min(10.0, float(d.get("guidance", 3.5))))
+        scheduler = d.get("scheduler", "euler")
+        cfg_type = d.get("cfg_type", "cfg")
+        omega = float(d.get("omega", 1.0))
+        num_waveforms = max(1, min(4, int(d.get("num_waveforms_per_prompt", 1))))
+        output_format = d.get("output_format", "wav").lower()
+        loras = _parse_loras(d)
+        unknown = [n for n, _ in loras if n not in lora_status()["registered"]]
+        if unknown:
+            return jsonify({"error": f"LoRA not registered: {', '.join(unknown)}"}), 400
+
+        raw_seed = d.get("seed", "-1")
+        seed = str(random.randint(0, 2**32 - 1)) if raw_seed in ("-1", "", None, -1) else str(int(raw_seed))
+        raw_retake_seed = d.get("retake_seed", "-1")
+        use_random_retake = raw_retake_seed in ("-1", "", None, -1)
+
+        retake_variance = max(0.0, min(1.0, float(d.get("retake_variance", 1.0 if task == "extend" else 0.2))))
+        ref_strength = max(0.0, min(1.0, float(d.get("ref_audio_strength", 0.5))))
+
+        repaint_start = repaint_end = 0.0
+        if task == "retake":
+            duration = max(1.0, min(ACE_LONG_FORM_MAX_DURATION, float(d.get("duration", 10.0))))
+        elif task == "repaint":
+            repaint_start = max(0.0, float(d.get("repaint_start", 0.0)))
+            repaint_end = min(src_duration, float(d.get("repaint_end", src_duration)))
+            if repaint_end <= repaint_start:
+                return jsonify({"error": "repaint_end must be after repaint_start"}), 400
+            if src_duration > ACE_LONG_FORM_MAX_DURATION:
+                return jsonify({"error": f"src_audio is {src_duration:.0f}s, max {ACE_LONG_FORM_MAX_DURATION:.0f}s"}), 400
+            duration = src_duration
+        elif task == "extend":
+            left = max(0.0, float(d.get("extend_left", 0.0)))
+            right = max(0.0, float(d.get("extend_right", 30.0)))
+            if left + right <= 0:
+                return jsonify({"error": "extend_left or extend_right must be > 0"}), 400
+            duration = src_duration + left + right
+            if duration > ACE_LONG_FORM_MAX_DURATION:
+                room = max(0.0, ACE_LONG_FORM_MAX_DURATION - src_duration)
+                return jsonify({"error": f"Extended track would be {duration:.0f}s, max "
+                                         f"{ACE_LONG_FORM_MAX_DURATION:.0f}s ({room:.0f}s of extension left)"}), 400
+            repaint_start = -left
+            repaint_end = src_duration + right
+        else:
+            if src_duration > ACE_LONG_FORM_MAX_DURATION:
+                return jsonify({"error": f"src_audio is {src_duration:.0f}s, max {ACE_LONG_FORM_MAX_DURATION:.0f}s"}), 400
+            duration = src_duration
+        long_form = duration > ACE_MAX_DURATION
+
+        print(f"   Source             : {src_audio or 'seed ' + seed}")
+        print(f"   Duration           : {duration:.1f}s" + (f" (source {src_duration:.1f}s)" if src_duration else ""))
+        if task in ("repaint", "extend"):
+            print(f"   Section            : {repaint_start:.2f}s → {repaint_end:.2f}s")
+        print(f"   Variance / Strength: {retake_variance:.2f} / {ref_strength:.2f}")
+        print(f"   Steps / Guidance   : {steps} / {guidance:.2f}")
+        print(f"   Variants           : {num_waveforms}")
+        print(f"   Save Path          : {save_path or 'Play in browser'}")
+
+        if not is_model_loaded():
+            device_raw = d.get("device", "0")
+            print(f"[MUSIC] Loading model on GPU {device_raw}...")
+            if not load_ace(device_raw):
+                return jsonify({"error": "Failed to load model"}), 500
+
+        temp_wavs = []
+        results = []
+        for i in range(num_waveforms):
+            tmp = OUTPUT_DIR / f"ace_{task}_{uuid.uuid4().hex}.wav"
+            temp_wavs.append(tmp)
+            retake_seed = str(random.randint(0, 2**32 - 1)) if use_random_retake else str(int(raw_retake_seed) + i)
+            print(f"[VARIANT {i+1}/{num_waveforms}] Seed: {seed} | Retake seed: {retake_seed}")
+
+            ace_generate(
+                prompt=prompt,
+                duration=duration,
+                output=str(tmp),
+                infer_step=steps,
+                guidance_scale=guidance,
+                scheduler_type=scheduler,
+                cfg_type=cfg_type,
+                omega_scale=omega,
+                manual_seeds=seed,
+                long_form=long_form,
+                loras=loras,
+                task=task,
+                src_audio_path=src_audio if task in ("repaint", "extend") else None,
+                repaint_start=repaint_start,
+                repaint_end=repaint_end,
+                retake_seeds=retake_seed,
+                retake_variance=retake_variance,
+                ref_audio_input=src_audio if task == "audio2audio" else None,
+                ref_audio_strength=ref_strength,
+            )
+
+            if long_form:
+                processed = ace_post_process_blocks(str(tmp))
+                info = sf.info(processed)
+                excerpt = int(ACE_CLAP_EXCERPT_SECONDS * info.samplerate)
+                data, rate = sf.read(processed, start=max(0, (info.frames - excerpt) // 2), frames=excerpt)
+            else:
+                processed = ace_post_process(str(tmp))
+                data, rate = sf.read(processed)
+            score = score_with_clap(data, prompt, rate)
+
+            results.append({"score": score, "path": processed, "seed": f"{seed}/{retake_seed}"})
+            print(f"[VARIANT {i+1}] CLAP: {score:.4f} | {Path(tmp).name}")
+            torch.cuda.empty_cache()
+
+        return _ace_respond(results, temp_wavs, save_dir, stem, output_format,
+                            extra={"task": task, "latent_cache": latent_cache.status()}, prompt=prompt,
+                            device=d.get("device", "0"))
+
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        return jsonify({"error": "Server error"}), 500
+
+
+@bp.route("/ace_retake", methods=["POST"])
+def ace_retake():
+    """Variation of an earlier generation: same prompt + "seed", new "retake_seed", "retake_variance" (0–1, default 0.2)."""
+    return _ace_task("retake")
+
+
+@bp.route("/ace_repaint", methods=["POST"])
+def ace_repaint():
+    """Regenerate "repaint_start"–"repaint_end" (seconds) of "src_audio" (≤ 240 s), keeping the rest of the track."""
+    return _ace_task("repaint")
+
+
+@bp.route("/ace_extend", methods=["POST"])
+def ace_extend():
+    """Extend "src_audio" by "extend_left" / "extend_right" seconds (total ≤ 240 s)."""
+    return _ace_task("extend")
+
+
+@bp.route("/ace_audio2audio", methods=["POST"])
+def ace_audio2audio():
+    """New track guided by "src_audio" (≤ 240 s) as reference ("ref_audio_strength" 0–1, default 0.5)."""
+    return _ace_task("audio2audio")
+
+
+@bp.route("/ace_latent_cache", methods=["GET", "DELETE"])
+def ace_latent_cache():
+    """GET → cache stats. DELETE → clear memory entries (add ?disk=1 to delete cached latents on disk)."""
+    if request.method == "DELETE":
+        removed = latent_cache.clear(disk=request.args.get("disk") == "1")
+        return jsonify({"cleared": True, "removed_files": removed})
+    return jsonify(latent_cache.status())
+
+
+@bp.route("/ace_preview_refine", methods=["POST"])
+def ace_preview_refine():
+    """Two-phase seed search: cheap previews ranked by CLAP, then full renders of the winners.
+
+    Phase 1 renders "preview_count" seeds in diffusion batches of "preview_batch"
+    with "preview_steps", "preview_duration" and "preview_scheduler" (pingpong by
+    default). Raw previews are scored with CLAP and thrown away. Phase 2 renders the
+    best "keep_top" seeds again with the normal /ace_infer quality fields (duration,
+    steps, scheduler, guidance, ...) and the same seed.
+
+    Note: a preview_duration shorter than duration changes the latent noise layout, so
+    the preview is a proxy for the seed's character, not the exact final track.
+
+    Extra request fields (everything else as /ace_infer):
+        preview_count (int)      – Seeds to try, 2–32 (default 8)
+        preview_batch (int)      – Seeds per diffusion batch, 1–8 (default 4)
+        preview_steps (int)      – 5–60 (default 15)
+        preview_duration (float) – Seconds (default min(duration, 20))
+        preview_scheduler (str)  – default "pingpong"
+        keep_top (int)           – Seeds refined at full quality, 1–4 (default 1)
+
+    Returns: same shape as /ace_infer plus
+        "preview": [ { "seed", "score" }, ... ] (best first)
+        "timing":  { "preview_s", "refine_s", "total_s", "preview_per_seed_s", "refine_per_seed_s" }
+    """
+    try:
+        d = request.json
+        if not d:
+            return jsonify({"error": "Empty payload"}), 400
+
+        print("\n" + "="*70)
+        print("ACE-STEP PREVIEW → REFINE")
+        print("="*70)
+
+        prompt = d.get("prompt", "").strip()
+        if not prompt:
+            return jsonify({"error": "Missing prompt"}), 400
+
+        save_path, save_dir, stem = resolve_save_target(d.get("save_path"))
+
+        duration = max(1.0, min(ACE_MAX_DURATION, float(d.get("duration", 10.0))))
+        steps = max(10, min(200, int(d.get("steps", 60))))
+        guidance = max(1.0, min(10.0, float(d.get("guidance", 3.5))))
+        scheduler = d.get("scheduler", "euler")
+        cfg_type = d.get("cfg_type", "cfg")
+        omega = float(d.get("omega", 1.0))
+        output_format = d.get("output_format", "wav").lower()
+        loras = _parse_loras(d)
+        unknown = [n for n, _ in loras if n not in lora_status()["registered"]]
+        if unknown:
+            return jsonify({"error": f"LoRA not registered: {', '.join(unknown)}"}), 400
+
+        preview_count = max(2, min(32, int(d.get("preview_count", 8))))
+        preview_batch = max(1, min(8, int(d.get("preview_batch", 4))))
+        preview_steps = max(5, min(60, int(d.get("preview_steps", 15))))
+        preview_duration = max(1.0, min(duration, float(d.get("preview_duration", min(duration, 20.0)))))
+        preview_scheduler = d.get("preview_scheduler", "pingpong")
+        keep_top = max(1, min(4, preview_count, int(d.get("keep_top", 1))))
+
+        print(f"   Preview            : {preview_count} seeds × {preview_steps} steps × {preview_duration:.1f}s ({preview_scheduler}, batch {preview_batch})")
+        print(f"   Refine             : top {keep_top} × {steps} steps × {duration:.1f}s ({scheduler})")
+        print(f"   Save Path          : {save_path or 'Play in browser'}")
+
+        if not is_model_loaded():
+            device_raw = d.get("device", "0")
+            print(f"[MUSIC] Loading model on GPU {device_raw}...")
+            if not load_ace(device_raw):
+                return jsonify({"error": "Failed to load model"}), 500
+
+        seeds = [random.randint(0, 2**32 - 1) for _ in range(preview_count)]
+        common = dict(
+            prompt=prompt,
+            guidance_scale=guidance,
+            cfg_type=cfg_type,
+            omega_scale=omega,
+            loras=loras,
+        )
+
+        # PHASE 1 – PREVIEW
+        t0 = time.perf_counter()
+        preview = []
+        for b in range(0, preview_count, preview_batch):
+            batch_seeds = seeds[b:b + preview_batch]
+            batch_dir = OUTPUT_DIR / f"ace_preview_{uuid.uuid4().hex}"
+            paths = ace_generate(
+                duration=preview_duration,
+                output=str(batch_dir) if len(batch_seeds) > 1 else str(batch_dir.with_suffix(".wav")),
+                infer_step=preview_steps,
+                scheduler_type=preview_scheduler,
+                manual_seeds=",".join(map(str, batch_seeds)) if len(batch_seeds) > 1 else str(batch_seeds[0]),
+                batch_size=len(batch_seeds),
+                **common,
+            )
+            if isinstance(paths, str):
+                paths = [paths]
+            for seed, path in zip(batch_seeds, paths):
+                data, rate = sf.read(path)
+                score = score_with_clap(data, prompt, rate)
+                preview.append({"seed": str(seed), "score": score})
+                print(f"[PREVIEW] Seed {seed} | CLAP: {score:.4f}")
+                Path(path).unlink(missing_ok=True)
+                Path(path).with_name(Path(path).stem + "_input_params.json").unlink(missing_ok=True)
+            if batch_dir.is_dir():
+                shutil.rmtree(batch_dir, ignore_errors=True)
+            torch.cuda.empty_cache()
+        preview_s = time.perf_counter() - t0
+        preview.sort(key=lambda x: x["score"], reverse=True)
+
+        # PHASE 2 – REFINE
+        t1 = time.perf_counter()
+        temp_wavs = []
+        results = []
+        for p in preview[:keep_top]:
+            tmp = OUTPUT_DIR / f"ace_tmp_{uuid.uuid4().hex}.wav"
+            temp_wavs.append(tmp)
+            print(f"[REFINE] Seed {p['seed']} (preview CLAP {p['score']:.4f})")
+            ace_generate(
+                duration=duration,
+                output=str(tmp),
+                infer_step=steps,
+                scheduler_type=scheduler,
+                manual_seeds=p["seed"],
+                **common,
+            )
+            processed = ace_post_process(str(tmp))
+            data, rate = sf.read(processed)
+            score = score_with_clap(data, prompt, rate)
+            results.append({"score": score, "path": processed, "seed": p["seed"]})
+            print(f"[REFINE] Seed {p['seed']} | CLAP: {score:.4f}")
+            torch.cuda.empty_cache()
+        refine_s = time.perf_counter() - t1
+
+        timing = {
+            "preview_s": round(preview_s, 2),
+            "refine_s": round(refine_s, 2),
+            "total_s": round(preview_s + refine_s, 2),
+            "preview_per_seed_s": round(preview_s / preview_count, 2),
+            "refine_per_seed_s": round(refine_s / keep_top, 2),
+        }
+        print(f"[PREVIEW→REFINE] {timing}")
+
+        return _ace_respond(results, temp_wavs, save_dir, stem, output_format,
+                            extra={"preview": preview, "timing": timing}, prompt=prompt,
+                            device=d.get("device", "0"))
+
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        return jsonify({"error": "Server error"}), 500
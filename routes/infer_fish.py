@@ -32,9 +32,11 @@ from . import bp
 from save_utils import handle_save
 from config import (
     OUTPUT_DIR, VOICE_DIR, PROJECTS_OUTPUT, FISH_AUTO_TRIGGER_JOB_RECOVERY_ATTEMPTS,
-    FFMPEG_BIN, FISH_INTER_PAUSE, FISH_PADDING_SECONDS, resolve_device
+    FFMPEG_BIN, FISH_INTER_PAUSE, FISH_PADDING_SECONDS, FISH_DECODE_BATCH,
+    FISH_SINGLE_SESSION, resolve_device
 )
 import models.fish as fish_mod
+import models.fish_engine as fish_engine
 import models.whisper as whisper_mod
 from text_utils import split_text_fish
 from audio_post_FISH import verify_with_whisper, _trim_silence_fish, post_process_fish
@@ -260,7 +262,16 @@ def fish_infer():
                 if whisper_mod.whisper_model is not None:
                     print(f"[MODEL] verify_whisper=False → unloading Whisper to free VRAM")
                     whisper_mod.unload_whisper()
-                    
+
+            # Resident engine: render chunks in windows so the DAC decodes them as one batch,
+            # with codes from one text2semantic session for the whole job
+            decode_batch = max(1, int(d.get("decode_batch", FISH_DECODE_BATCH)))
+            prepared = {}   # chunk index → (path, dur) rendered ahead; retries render alone
+            session = None
+            if fish_engine.engine is not None and d.get("single_session", FISH_SINGLE_SESSION):
+                session = demo.codes_session(chunks[start_from_chunk:], first_index=start_from_chunk)
+                print(f"[{_ts()} FISH] Single session over chunks {start_from_chunk}-{len(chunks) - 1}")
+
             for i in range(start_from_chunk, len(chunks)):
                 if is_cancelled():
                     return jsonify({"error": "Cancelled"}), 499
@@ -268,10 +279,33 @@ def fish_infer():
                 chunk_text = chunks[i]
                 retry_count = 0
 
+                if (decode_batch > 1 or session is not None) and fish_engine.engine is not None and i not in prepared:
+                    window = list(range(i, min(i + decode_batch, len(chunks))))
+                    outs = [str(job_dir / f"temp_{k}_{uuid.uuid4().hex}.wav") for k in window]
+                    try:
+                        codes = None
+                        if session is not None:
+                            codes = []
+                            for k in window:
+                                idx, c = next(session)
+                                if idx != k:
+                                    raise RuntimeError(f"session out of step at chunk {k}")
+                                codes.append(c)
+                        results = demo.infer_batch([chunks[k] for k in window], outs, codes=codes)
+                        prepared.update(zip(window, results))
+                    except Exception as e:
+                        if session is not None:
+                            session.close()
+                            session = None
+                        print(f"[{_ts()} FISH] Batched render of chunks {window[0]}-{window[-1]} failed ({e}) → one by one")
+
                 while True:
                     try:
-                        out_wav = job_dir / f"temp_{i}_{uuid.uuid4().hex}.wav"
-                        path, dur = demo.infer(text=chunk_text, output_wav=str(out_wav))
+                        if i in prepared:
+                            path, dur = prepared.pop(i)
+                        else:
+                            out_wav = job_dir / f"temp_{i}_{uuid.uuid4().hex}.wav"
+                            path, dur = demo.infer(text=chunk_text, output_wav=str(out_wav))
 
                         processed = path
                         if not skip_post_process:
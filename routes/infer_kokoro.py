@@ -32,9 +32,12 @@ from save_utils import handle_save
 from config import (
     OUTPUT_DIR, VOICE_DIR, PROJECTS_OUTPUT, KOKORO_AUTO_TRIGGER_JOB_RECOVERY_ATTEMPTS,
     FFMPEG_BIN, KOKORO_INTER_PAUSE, KOKORO_FRONT_PAD,
-    KOKORO_PADDING_SECONDS, resolve_device
+    KOKORO_PADDING_SECONDS, KOKORO_BATCH_SIZE, resolve_device
 )
 import models.kokoro as kokoro_mod
+import models.kokoro_batch as kokoro_batch
+import models.kokoro_pool as kokoro_pool
+from models.kokoro_g2p_cache import g2p_cache
 import models.whisper as whisper_mod
 from text_utils import split_text_kokoro
 from save_utils import handle_save
@@ -64,10 +67,23 @@ def kokoro_status():
     return jsonify({
         "loaded": loaded,
         "device": device,
-        "model": "kokoro"
+        "backend": kokoro_mod.backend,
+        "pool": kokoro_pool.pool.status() if kokoro_pool.pool is not None else None,
+        **kokoro_mod.status(),
+        "model": "kokoro",
+        "g2p_cache": g2p_cache.status(),
     })
 
 
+@bp.route("/kokoro_g2p_cache", methods=["GET", "DELETE"])
+def kokoro_g2p_cache():
+    """GET → phoneme cache stats. DELETE → clear memory entries (add ?disk=1 to empty the SQLite store)."""
+    if request.method == "DELETE":
+        removed = g2p_cache.clear(disk=request.args.get("disk") == "1")
+        return jsonify({"cleared": True, "removed_rows": removed})
+    return jsonify(g2p_cache.status())
+
+
 @bp.route("/kokoro_voices", methods=["GET"])
 def kokoro_voices():
     ENGLISH_VOICES = [
@@ -243,6 +259,7 @@ def kokoro_infer():
     # ——————— GENERATION — SINGLE ATTEMPT ———————
     sr = 24000
     audio_parts = []
+    pending = {}   # worker pool: chunk index → Future of the raw WAV path
     try:
         # ← REQUIRED: disables gradients, saves VRAM, speeds up inference
         with torch.no_grad():
@@ -264,6 +281,22 @@ def kokoro_infer():
                     print(f"[MODEL] verify_whisper=False → unloading Whisper to free VRAM")
                     whisper_mod.unload_whisper()
 
+            # One shared model; the job's language picks (or lazily creates) its G2P pipeline
+            lang_code = (d.get("lang_code") or kokoro_mod.lang_for_voice(voice)).lower()
+            pipe = kokoro_mod.get_pipeline(lang_code) if kokoro_pool.pool is None else None
+
+            # Render chunks in windows of batch_size, one padded KModel pass per window (torch backend)
+            batch_size = max(1, int(d.get("batch_size", KOKORO_BATCH_SIZE)))
+            prepared = {}   # chunk index → raw audio rendered ahead; retries render alone
+
+            # CPU worker pool: queue every remaining chunk now, consume the results in order below
+            pool = kokoro_pool.pool
+            if pool is not None:
+                for k in range(start_from_chunk, len(chunks)):
+                    pending[k] = pool.submit(chunks[k], voice, speed,
+                                             OUTPUT_DIR / f"kokoro_pool_{k}_{uuid.uuid4().hex}.wav", lang_code)
+                print(f"[{_ts()} KOKORO] {len(pending)} chunk(s) queued on {pool.workers} worker(s)")
+
             for i in range(start_from_chunk, len(chunks)):
                 if is_cancelled():
                     return jsonify({"error": "Cancelled"}), 499
@@ -271,11 +304,30 @@ def kokoro_infer():
                 chunk = chunks[i]
                 retry_count = 0
 
+                if pool is None and batch_size > 1 and kokoro_mod.backend == "torch" and i not in prepared:
+                    window = list(range(i, min(i + batch_size, len(chunks))))
+                    try:
+                        results = kokoro_batch.infer_chunks(
+                            pipe, [chunks[k] for k in window], voice, speed, batch_size
+                        )
+                        prepared.update(zip(window, results))
+                    except Exception as e:
+                        print(f"[{_ts()} KOKORO] Batched render of chunks {window[0]}-{window[-1]} failed ({e}) → one by one")
+
                 while True:
                     try:
                         # ——— KOKORO INFERENCE ———
-                        gen = kokoro_mod.pipeline(chunk, voice=voice, speed=speed)
-                        raw_audio = np.concatenate([c for _, _, c in gen], axis=0)
+                        if i in prepared:
+                            raw_audio = prepared.pop(i)
+                        elif pool is not None:
+                            fut = pending.pop(i, None) or pool.submit(
+                                chunk, voice, speed, OUTPUT_DIR / f"kokoro_pool_{i}_{uuid.uuid4().hex}.wav", lang_code)
+                            raw_path = Path(pool.result(fut))
+                            raw_audio, _ = sf.read(raw_path, dtype="float32")
+                            raw_path.unlink(missing_ok=True)
+                        else:
+                            gen = pipe(chunk, voice=voice, speed=speed)
+                            raw_audio = np.concatenate([c for _, _, c in gen], axis=0)
                         raw_audio = np.concatenate([
                             np.zeros(int(sr * KOKORO_FRONT_PAD), dtype=np.float32),
                             raw_audio
@@ -360,6 +412,10 @@ def kokoro_infer():
             "reason": error_str,
             "job_folder": str(job_dir.name)
         }), 200
+    finally:
+        # Cancelled / failed job: don't leave its chunks queued on the workers
+        for fut in pending.values():
+            fut.cancel()
         
     # ——————— FINAL ASSEMBLY ———————
     missing_chunks = [
@@ -1,12 +1,16 @@
 # routes/model.py
 from flask import jsonify, request
 from . import bp
-from config import resolve_device
+from config import resolve_device, KOKORO_ONNX_THREADS
 
 from models.xtts import load_xtts, unload_xtts
-from models.fish import load_fish, unload_fish, fish_loaded, fish_device_id
+from models.fish import load_fish, unload_fish
+import models.fish as fish_mod
+import models.fish_engine as fish_engine
+from models.fish_code_cache import code_cache
 from models.kokoro import load_kokoro, unload_kokoro, model_loaded as kokoro_loaded
 import models.kokoro as kokoro_mod
+import models.kokoro_onnx as kokoro_onnx
 
 whisper_model = None
 load_whisper = None
@@ -27,16 +31,23 @@ except Exception as e:
 
 @bp.route("/whisper_load", methods=["POST"])
 def whisper_load():
+    """Load Whisper.
+
+    Request JSON:
+        device (str)  – "cpu" | "cuda:N" (default "cpu")
+        backend (str) – "openai" | "faster-whisper" (default: the loaded one, else WHISPER_BACKEND)
+    """
     if load_whisper is None:
         return jsonify({"error": "Whisper not available"}), 500
 
     raw_device = request.json.get("device") or "cpu"
     device = resolve_device(raw_device)  
-    success = load_whisper(device)    
+    success = load_whisper(device, request.json.get("backend"))
 
     if success:
         return jsonify({"message": "Whisper loaded"})
-    return jsonify({"error": "Failed"}), 500
+    import models.whisper as whisper_mod
+    return jsonify({"error": whisper_mod.load_error or "Failed"}), 500
 
 
 @bp.route("/whisper_unload", methods=["POST"])
@@ -51,13 +62,45 @@ def whisper_unload():
 
 @bp.route("/whisper_status", methods=["GET"])
 def whisper_status():
-    """Return {"loaded": true/false} – used by the UI badge."""
+    """Return {"loaded": true/false, "backend", "fast_tier": model name | null} – used by the UI badge."""
     try:
-        from models.whisper import whisper_model
-        return jsonify({"loaded": whisper_model is not None})
+        import models.whisper as whisper_mod
+        fast = whisper_mod.WHISPER_FAST_PATH.stem if whisper_mod.fast_model is not None else None
+        return jsonify({"loaded": whisper_mod.whisper_model is not None,
+                        "backend": whisper_mod.backend, "fast_tier": fast})
     except Exception:        
         return jsonify({"loaded": False})
 
+@bp.route("/whisper_benchmark", methods=["POST"])
+def whisper_benchmark():
+    """Real-time factor of the Whisper backends for WHISPER_PATH's model on the same clips.
+
+    Request JSON:
+        files (list[str])      – audio files to transcribe (default: first 5 clips in VOICE_DIR)
+        backends (list[str])   – default ["openai", "faster-whisper"]
+        device (str)           – "cpu" | "cuda:N" (default "cpu")
+        word_timestamps (bool) – default true (the /production/transcribe path)
+
+    Response:
+        200 → { "model", "device", "clips", "audio_seconds", "results": [ { "backend",
+                 "compute_type", "load_seconds", "transcribe_seconds", "rtf", "texts",
+                 "relative": { "speed", "agreement" } }, ... ],
+                 "skipped": [ { "backend", "reason" }, ... ] }   (backends not installed)
+    """
+    from models import whisper_ct2
+    d = request.json or {}
+    try:
+        result = whisper_ct2.benchmark(
+            files=d.get("files"),
+            backends=d.get("backends") or whisper_ct2.BACKENDS,
+            device=resolve_device(d.get("device") or "cpu"),
+            word_timestamps=bool(d.get("word_timestamps", True)),
+        )
+        return jsonify(result)
+    except Exception as e:
+        print(f"[WHISPER-BENCH] Failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @bp.route("/load", methods=["POST"])
 def load():
     raw_device = request.json.get("device") 
@@ -75,19 +118,100 @@ def unload():
 
 @bp.route("/fish_load", methods=["POST"])
 def fish_load():
-    device = request.json.get("device") or "cpu"
+    """Load Fish Speech.
+
+    Request JSON:
+        device (str)    – "cpu" | "cuda:N"
+        resident (bool) – Keep models loaded in-process (optional, default FISH_RESIDENT)
+        quant (str)     – "none" | "int8" | "int4" weight-only text2semantic
+                          (optional, default FISH_QUANT; built once on first use)
+        compile (bool)  – torch.compile + warm-up during load (optional, default
+                          FISH_COMPILE; implies resident, eager fallback on failure)
+
+    Response:
+        200 → { "message", "status": { ..., "engine": { "compiled", "compile_error",
+                 "warmup": [ { "first_token_s", "steady_tokens_per_sec", ... } ] } } }
+    """
+    d = request.json or {}
+    device = d.get("device") or "cpu"
     dev = resolve_device(device)
 
     # UNLOAD IF DEVICE CHANGED
-    if fish_loaded and fish_device_id != dev:
-        print(f"[FISH] UI requested device {dev}, current {fish_device_id} → unloading")
+    if fish_mod.fish_loaded and fish_mod.fish_device_id != dev:
+        print(f"[FISH] UI requested device {dev}, current {fish_mod.fish_device_id} → unloading")
         unload_fish()
 
-    success, msg = load_fish(device)
+    success, msg = load_fish(device, resident=d.get("resident"), quant=d.get("quant"),
+                             compile=d.get("compile"))
     if success:
-        return jsonify({"message": msg or "Loaded"})
+        return jsonify({"message": msg or "Loaded", "status": _fish_status()})
     return jsonify({"error": msg or "Failed"}), 500
 
+def _fish_status() -> dict:
+    engine = fish_engine.engine
+    return {
+        "loaded": fish_mod.fish_loaded,
+        "device": fish_mod.fish_device_id,
+        "resident": fish_mod.fish_resident,
+        "quant": fish_mod.fish_quant,
+        "compile": fish_mod.fish_compile,
+        "checkpoint": fish_mod.fish_checkpoint.name,
+        "engine": engine.status() if engine is not None else None,
+        "code_cache": code_cache.status(),
+    }
+
+@bp.route("/fish_code_cache", methods=["GET", "DELETE"])
+def fish_code_cache():
+    """GET → reference-code cache stats. DELETE → clear memory entries (add ?disk=1 to delete cached codes on disk)."""
+    if request.method == "DELETE":
+        removed = code_cache.clear(disk=request.args.get("disk") == "1")
+        return jsonify({"cleared": True, "removed_files": removed})
+    return jsonify(code_cache.status())
+
+@bp.route("/fish_status", methods=["GET"])
+def fish_status():
+    """Current Fish mode plus resident-engine weights and last tokens/sec + memory."""
+    return jsonify(_fish_status())
+
+@bp.route("/fish_benchmark", methods=["POST"])
+def fish_benchmark():
+    """Compare the bf16 baseline with quantized text2semantic checkpoints.
+
+    Unloads Fish, then loads each mode resident in turn (quantized checkpoints
+    are built first if missing – the first int8/int4 run takes minutes).
+
+    Request JSON:
+        device (str)        – "cpu" | "cuda:N" (default: cuda:0 if available)
+        modes (list[str])   – default ["none", "int8"] (+ "int4" on CUDA)
+        runs (int)          – timed runs per mode, default 2
+        text (str)          – optional benchmark text
+        max_new_tokens (int)– cap per run, default 1024
+        compile (bool)      – compile every mode (warm-up counted in load_seconds)
+
+    Response:
+        200 → { "device", "runs", "results": [ { "mode", "weights_mb", "load_seconds",
+                 "tokens_per_sec", "first_token_s", "steady_tokens_per_sec",
+                 "peak_allocated_mb" | "process_rss_mb",
+                 "relative": { "speed", "weights" } }, ... ] }
+    """
+    d = request.json or {}
+    dev = resolve_device(d.get("device"))
+    modes = d.get("modes") or (["none", "int8", "int4"] if dev.startswith("cuda") else ["none", "int8"])
+    try:
+        unload_fish()
+        result = fish_engine.benchmark(
+            dev,
+            modes=modes,
+            text=d.get("text") or fish_engine.BENCH_TEXT,
+            runs=max(1, int(d.get("runs", 2))),
+            max_new_tokens=int(d.get("max_new_tokens", 1024)),
+            compile=bool(d.get("compile", False)),
+        )
+        return jsonify(result)
+    except Exception as e:
+        print(f"[FISH-BENCH] Failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @bp.route("/fish_unload", methods=["POST"])
 def fish_unload():
     print("Unloading Fish model...")
@@ -96,11 +220,50 @@ def fish_unload():
 
 @bp.route("/kokoro_load", methods=["POST"])
 def kokoro_load():
+    """Load Kokoro.
+
+    Request JSON:
+        device (str)  – "cpu" | "cuda:N" (default "cpu")
+        backend (str) – "torch" | "onnx" | "onnx-int8" (default KOKORO_BACKEND; ONNX is CPU only)
+        workers (int) – CPU worker processes, 0 = in-process pipeline (default KOKORO_POOL_WORKERS)
+    """
     device = request.json.get("device") or "cpu"
     resolved = resolve_device(device)
-    success, msg = kokoro_mod.load_kokoro(resolved)
+    workers = request.json.get("workers")
+    success, msg = kokoro_mod.load_kokoro(resolved, request.json.get("backend"),
+                                          int(workers) if workers is not None else None)
     return jsonify({"message": msg}), 200 if success else 500
 
+@bp.route("/kokoro_benchmark", methods=["POST"])
+def kokoro_benchmark():
+    """Real-time factor of the Kokoro backends on CPU (ONNX exports are built first if missing).
+
+    Request JSON:
+        backends (list[str]) – default ["torch", "onnx", "onnx-int8"]
+        runs (int)           – timed runs per backend, default 3
+        text (str)           – optional benchmark text
+        voice (str)          – default "af_heart"
+        threads (int)        – CPU threads for every backend (default KOKORO_ONNX_THREADS)
+
+    Response:
+        200 → { "threads", "runs", "results": [ { "backend", "load_seconds", "model_mb",
+                 "audio_seconds", "render_seconds", "rtf", "relative": { "speed" } }, ... ],
+                 "skipped": [ { "backend", "reason" }, ... ] }   (backends not installed)
+    """
+    d = request.json or {}
+    try:
+        result = kokoro_onnx.benchmark(
+            backends=d.get("backends") or kokoro_onnx.BACKENDS,
+            text=d.get("text") or kokoro_onnx.BENCH_TEXT,
+            voice=d.get("voice") or "af_heart",
+            runs=max(1, int(d.get("runs", 3))),
+            threads=int(d.get("threads", KOKORO_ONNX_THREADS)),
+        )
+        return jsonify(result)
+    except Exception as e:
+        print(f"[KOKORO-BENCH] Failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @bp.route("/kokoro_unload", methods=["POST"])
 def kokoro_unload():
     kokoro_mod.unload_kokoro()
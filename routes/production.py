@@ -2,12 +2,14 @@
 
 from flask import Blueprint, request, jsonify, render_template
 from werkzeug.utils import secure_filename
-from config import OUTPUT_DIR, FFMPEG_BIN
+from config import OUTPUT_DIR, FFMPEG_BIN, WHISPER_VAD_MIN_SECONDS
 from pathlib import Path
 import json
 import subprocess
 import torch
 import models.whisper as whisper_mod
+from models.whisper_audio import SAMPLE_RATE, load_audio
+from models.whisper_vad import transcribe_long
 import logging
 
 log = logging.getLogger(__name__)
@@ -96,6 +98,14 @@ def list_images():
 
 @bp.route("/transcribe", methods=["POST"])
 def transcribe():
+    """Word-timestamped transcription → {stem}_timing.json + {stem}.srt next to the file.
+
+    Request JSON:
+        filename (str)    – file in project_dir (or OUTPUT_DIR)
+        project_dir (str) – optional directory to search
+        vad (bool)        – cut at silences and transcribe the pieces in parallel
+                            (default: files of WHISPER_VAD_MIN_SECONDS or longer)
+    """
     data = request.get_json() or {}
     filename = data.get("filename")
     project_dir = data.get("project_dir", "").strip()
@@ -142,11 +152,19 @@ def transcribe():
             return jsonify({"error": "Failed to load Whisper model"}), 500
 
     try:
-        result = whisper_mod.whisper_model.transcribe(
-            str(audio_path),
-            word_timestamps=True,
-            fp16=False
-        )
+        audio = load_audio(audio_path)
+        use_vad = data.get("vad")
+        if use_vad is None:
+            use_vad = len(audio) >= WHISPER_VAD_MIN_SECONDS * SAMPLE_RATE
+        if use_vad:
+            log.info(f"VAD-segmented transcription ({len(audio) / SAMPLE_RATE:.0f}s of audio)")
+            result = transcribe_long(audio)
+        else:
+            result = whisper_mod.transcribe(
+                audio,
+                word_timestamps=True,
+                fp16=False
+            )
     except Exception as e:
         log.error(f"Whisper transcription crashed: {e}")
         return jsonify({"error": "Transcription failed"}), 500
@@ -0,0 +1,135 @@
+# routes/sfx_library.py
+import base64
+import shutil
+import uuid
+import traceback
+from pathlib import Path
+from flask import request, jsonify, make_response
+from . import bp
+from config import OUTPUT_DIR, SFX_LIBRARY_THRESHOLD
+from models.sfx_library import sfx_library
+from save_utils import handle_save
+
+
+def library_lookup(d: dict, prompt: str, source: str, save_dir, stem, length: float | None = None) -> dict | None:
+    """Pre-generation lookup shared by /stable_infer and /ace_infer.
+
+    Active only when the request has "library_lookup": true. Returns None (→ generate)
+    when nothing reaches the threshold, otherwise a response payload shaped like a
+    normal generation: the best asset is copied to save_dir as "<stem> (LIBRARY).<ext>"
+    or returned as base64, plus "library": { "hit": true, "matches": [...] }.
+    """
+    if not d.get("library_lookup"):
+        return None
+    threshold = float(d.get("library_threshold", SFX_LIBRARY_THRESHOLD))
+    try:
+        matches = sfx_library.search(prompt, top_k=int(d.get("library_top_k", 3)),
+                                     threshold=threshold, source=source, length=length,
+                                     device=d.get("device", "0"))
+    except Exception as e:
+        print(f"[SFX-LIB] Lookup failed, generating instead: {e}")
+        return None
+    if not matches:
+        print(f"[SFX-LIB] No asset ≥ {threshold:.2f} for '{prompt[:60]}' → generating")
+        return None
+
+    best = matches[0]
+    src = Path(best["path"])
+    print(f"[SFX-LIB] HIT {best['score']:.3f} → {src.name} (prompt: '{best['prompt'][:60]}')")
+    library = {"hit": True, "threshold": threshold, "matches": matches}
+
+    if save_dir is not None:
+        temp = OUTPUT_DIR / f"library_{uuid.uuid4().hex}{src.suffix}"
+        shutil.copy2(src, temp)
+        saved_path, saved_rel = handle_save(str(temp), str(save_dir / f"{stem} (LIBRARY){src.suffix}"), "library")
+        return {
+            "saved_files": [{
+                "filename": Path(saved_path).name,
+                "rel_path": saved_rel,
+                "score": best["score"],
+                "is_best": True,
+            }],
+            "num_generated": 0,
+            "library": library,
+        }
+
+    with open(src, "rb") as f:
+        b64 = base64.b64encode(f.read()).decode()
+    return {
+        "audios": [{"audio_base64": b64, "score": best["score"], "is_best": True,
+                    "format": src.suffix.lstrip(".")}],
+        "library": library,
+    }
+
+
+@bp.route("/sfx_library", methods=["GET"])
+def sfx_library_status():
+    """Size of the SFX asset index.
+
+    Response:
+        200 → { "entries", "by_source": { "stable": N, "ace": N }, "index_mb", "path" }
+    """
+    return jsonify(sfx_library.status())
+
+
+@bp.route("/sfx_library_search", methods=["POST"])
+def sfx_library_search():
+    """Find indexed assets for a prompt without generating anything.
+
+    Request JSON:
+        prompt (str)      – Required
+        top_k (int)       – Max results, default 10
+        threshold (float) – Minimum score, default 0 (everything, ranked)
+        source (str)      – "stable" | "ace" (optional)
+        length (float)    – Wanted duration in seconds (optional, ±50 %)
+
+    Response:
+        200 → { "matches": [ { "path", "prompt", "source", "duration", "score",
+                               "prompt_similarity", "audio_similarity", ... }, ... ] }
+    """
+    try:
+        d = request.json or {}
+        prompt = (d.get("prompt") or "").strip()
+        if not prompt:
+            return make_response(jsonify({"error": "Missing prompt"}), 400)
+        matches = sfx_library.search(
+            prompt,
+            top_k=max(1, min(100, int(d.get("top_k", 10)))),
+            threshold=float(d.get("threshold", 0.0)),
+            source=d.get("source") or None,
+            length=float(d["length"]) if d.get("length") else None,
+        )
+        return jsonify({"matches": matches})
+    except Exception as e:
+        print(f"[ERROR]: {str(e)}\n{traceback.format_exc()}")
+        return make_response(jsonify({"error": str(e)}), 500)
+
+
+@bp.route("/sfx_library_add", methods=["POST"])
+def sfx_library_add():
+    """Index an existing file (e.g. outputs saved before the library existed).
+
+    Request JSON:
+        { "path": "...", "prompt": "...", "source": "stable" | "ace" | "import" }
+    """
+    try:
+        d = request.json or {}
+        path, prompt = d.get("path"), (d.get("prompt") or "").strip()
+        if not path or not prompt or not Path(path).exists():
+            return make_response(jsonify({"error": "Need an existing path and a prompt"}), 400)
+        entry = sfx_library.add(path, prompt, d.get("source") or "import")
+        return jsonify({"entry": entry})
+    except Exception as e:
+        print(f"[ERROR]: {str(e)}\n{traceback.format_exc()}")
+        return make_response(jsonify({"error": str(e)}), 500)
+
+
+@bp.route("/sfx_library_prune", methods=["POST"])
+def sfx_library_prune():
+    """Drop index rows for deleted or overwritten files.
+
+    Response:
+        200 → { "removed": N, "entries": N }
+    """
+    removed = sfx_library.prune()
+    return jsonify({"removed": removed, "entries": sfx_library.status()["entries"]})
@@ -6,12 +6,14 @@ import time
 import json
 import subprocess
 import soundfile as sf
-from flask import request, jsonify, make_response
+from flask import request, jsonify, make_response, Response
 from . import bp
-from config import OUTPUT_DIR, FFMPEG_BIN, PROJECTS_OUTPUT
-from models.stable_audio import generate_audio, load_stable_audio, unload_stable_audio, cancel_generation
+from config import OUTPUT_DIR, FFMPEG_BIN
+from models.stable_audio import generate_audio, generate_audio_batch, benchmark, PRESETS, SCHEDULERS, load_stable_audio, unload_stable_audio, cancel_generation
 from models.stable_audio_state import is_model_loaded
-from save_utils import handle_save
+from save_utils import handle_save, resolve_save_target
+from models.sfx_library import index_saved
+from .sfx_library import library_lookup
 from audio_post import stable_post_process
 from pathlib import Path
 import traceback
@@ -26,12 +28,122 @@ def _ffmpeg_args(fmt: str):
     if fmt == "m4a": return ["-c:a", "aac", "-b:a", "320k"]
     return []
 
+def _sampling_options(d):
+    """Resolve preset / scheduler / steps from a request; explicit fields override the preset.
+
+    Returns:
+        (preset_name|None, scheduler, steps) – raises ValueError on unknown names.
+    """
+    preset_name = d.get("preset") or None
+    if preset_name is not None and preset_name not in PRESETS:
+        raise ValueError(f"Unknown preset '{preset_name}' ({', '.join(PRESETS)})")
+    preset = PRESETS.get(preset_name, {"scheduler": "cosine_dpm", "steps": 100})
+    scheduler = d.get("scheduler") or preset["scheduler"]
+    if scheduler not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler '{scheduler}' ({', '.join(SCHEDULERS)})")
+    steps = max(10, min(200, int(d.get("steps") or preset["steps"])))
+    return preset_name, scheduler, steps
+
+def _process_variants(results, sample_rate, audio_mode, output_format):
+    """Write each variant to a temp WAV, post-process it and convert to output_format.
+
+    Returns:
+        (audios, processed_paths): audios = [{ "audio_base64", "score", "is_best" }, ...]
+    """
+    processed_paths = []
+    audios = []
+
+    for i, res in enumerate(results):
+        score = res.get("score")
+        is_best = res.get("is_best", False)
+        score_str = f"{score:.4f}" if score is not None else "N/A"
+        best_marker = " (BEST)" if is_best else ""
+        print(f" Variant {i+1}: score={score_str}{best_marker}")
+
+        audio_np = res["audio_np"]
+        temp_wav = OUTPUT_DIR / f"stable_temp_{uuid.uuid4().hex}.wav"
+        sf.write(str(temp_wav), audio_np, sample_rate, subtype="PCM_16")
+
+        processed = stable_post_process(str(temp_wav), audio_mode=audio_mode)
+
+        final_path = processed
+        if output_format != "wav":
+            conv = Path(processed).with_suffix(f".{output_format}")
+            cmd = [
+                str(FFMPEG_BIN / "ffmpeg.exe"),
+                "-i", processed,
+                *_ffmpeg_args(output_format),
+                str(conv),
+                "-y"
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode == 0:
+                final_path = str(conv)
+                os.remove(processed)
+            else:
+                print(f"FFMPEG failed: {result.stderr}")
+
+        with open(final_path, "rb") as f:
+            b64 = base64.b64encode(f.read()).decode()
+
+        audios.append({
+            "audio_base64": b64,
+            "score": score,
+            "is_best": is_best
+        })
+        processed_paths.append(final_path)
+
+    return audios, processed_paths
+
+def _finish_variants(audios, processed_paths, save_dir, stem, output_format, prompt=None, device=None) -> dict:
+    """Save processed variants (save_dir given) or keep the base64 for the browser; always removes temps.
+
+    Saved files are added to the SFX asset library under ``prompt`` (CLAP on ``device``).
+    """
+    # === SAVE OR PLAY IN BROWSER ===
+    if save_dir is not None:
+        saved_files = []
+        for i, src_path in enumerate(processed_paths):
+            info = audios[i]
+            is_best = info["is_best"]
+            suffix = " (BEST)" if is_best else f"_v{i+1}"
+            filename = f"{stem}{suffix}.{output_format}"
+            dest_path = save_dir / filename
+
+            saved_path, saved_rel = handle_save(src_path, str(dest_path), "stable")
+            index_saved(saved_path, prompt, "stable", device, score=info["score"], is_best=is_best)
+
+            saved_files.append({
+                "filename": Path(saved_path).name,
+                "rel_path": saved_rel,
+                "score": info["score"],
+                "is_best": is_best
+            })
+
+        # Clean up all temp files
+        for p in processed_paths:
+            Path(p).unlink(missing_ok=True)
+
+        return {
+            "saved_files": saved_files,
+            "num_generated": len(audios)
+        }
+
+    # Play in browser – delete temps
+    for p in processed_paths:
+        Path(p).unlink(missing_ok=True)
+
+    return {"audios": audios}
+
 @bp.route("/stable_load", methods=["POST"])
 def stable_load():
     """Load the Stable Audio model onto a specific GPU.
 
-    Request JSON:
-        { "device": "0" }  (optional, defaults to GPU 0)
+    Request JSON (all optional):
+        device (str)       – GPU index or "cpu", default "0"
+        low_vram (bool)    – GPU only, default config.STABLE_LOW_VRAM (switching reloads)
+        cpu_dtype (str)    – CPU only, "float32" | "bfloat16", default config.STABLE_CPU_DTYPE
+        cpu_threads (int)  – CPU only, torch threads, default config.STABLE_CPU_THREADS
 
     Responses:
         200 → { "message": "Loaded" }
@@ -39,7 +151,13 @@ def stable_load():
     """
     try:
         device = request.json.get("device", "0")
-        success, msg = load_stable_audio(device)
+        low_vram = request.json.get("low_vram")
+        success, msg = load_stable_audio(
+            device,
+            None if low_vram is None else bool(low_vram),
+            cpu_dtype=request.json.get("cpu_dtype"),
+            cpu_threads=request.json.get("cpu_threads"),
+        )
         return make_response(jsonify({"message": msg} if success else {"error": msg}), 200 if success else 500)
     except Exception as e:
         return make_response(jsonify({"error": str(e)}), 500)
@@ -66,6 +184,43 @@ def stable_status():
     """
     return make_response(jsonify({"loaded": is_model_loaded()}), 200)
 
+@bp.route("/stable_benchmark", methods=["POST"])
+def stable_benchmark():
+    """Measure steps/sec and real-time factor of the loaded Stable Audio model.
+
+    Request JSON (all optional):
+        steps (int)   – Steps per run, default 20
+        length (float)– Clip length in seconds, default 10
+        runs (int)    – Timed runs after one warm-up, default 2
+        scheduler (str) – Key of the scheduler list, default "cosine_dpm"
+
+    Response:
+        200 → { "device", "dtype", "threads", "scheduler", "steps", "length", "runs": [s, ...],
+                "steps_per_sec", "rtf" }
+    """
+    try:
+        d = request.json or {}
+        result = benchmark(
+            steps=max(2, min(200, int(d.get("steps", 20)))),
+            length_sec=max(1.0, min(47.0, float(d.get("length", 10.0)))),
+            runs=max(1, min(10, int(d.get("runs", 2)))),
+            scheduler=d.get("scheduler") or "cosine_dpm",
+        )
+        print(f"[STABLE-BENCH] {result}")
+        return jsonify(result)
+    except Exception as e:
+        print(f"[ERROR]: {str(e)}\n{traceback.format_exc()}")
+        return make_response(jsonify({"error": str(e)}), 500)
+
+@bp.route("/stable_presets", methods=["GET"])
+def stable_presets():
+    """List the named sampling presets and the available schedulers.
+
+    Response:
+        200 → { "presets": { name: { "scheduler", "steps" } }, "schedulers": [...] }
+    """
+    return jsonify({"presets": PRESETS, "schedulers": list(SCHEDULERS)})
+
 @bp.route("/stable_cancel", methods=["POST"])
 def stable_cancel():
     """Cancel any in-progress Stable Audio generation.
@@ -84,19 +239,31 @@ def stable_infer():
     Request JSON fields (all optional except prompt):
         prompt (str)                  – Required text prompt
         negative_prompt (str)         – Negative prompt
-        steps (int)                   – Inference steps (10–200)
+        preset (str)                  – "draft" | "fast" | "balanced" | "quality" | "max"
+                                        (sets scheduler + steps, see GET /stable_presets)
+        scheduler (str)               – "cosine_dpm" (default) | "dpmpp_2m" | "dpmpp_2m_sde" |
+                                        "dpmpp_3m" | "dpmpp_2m_karras"
+        steps (int)                   – Inference steps (10–200), default 100
         length (float)                – Duration in seconds (1–47)
         guidance_scale (float)        – CFG scale, default 7.0
         eta (float)                   – DDIM eta, default 0.0
         num_waveforms_per_prompt (int)– Number of variants (1–4), default 3
+        prune_at_step (int)           – CLAP-prune partially denoised variants at this step
+                                        (0 = off, default). Only the best prune_keep finish.
+        prune_keep (int)              – Variants kept after pruning, default 1
         seed (int)                    – Seed, -1 for random
         output_format (str)           – "wav" (default), "mp3", "ogg", "flac", "m4a"
         audio_mode (str)              – "sfx_impact" | "sfx_ambient" | "music"
         save_path (str)               – If provided, generated files are saved here
+        library_lookup (bool)         – Return an existing library asset instead of generating
+                                        when one scores ≥ library_threshold (default config)
+        library_threshold (float)     – See config.SFX_LIBRARY_THRESHOLD
 
     Responses:
         • If save_path provided → { "saved_files": [...], "num_generated": N }
         • Otherwise               → { "audios": [{ "audio_base64": "...", "score": ..., "is_best": bool }, ...] }
+        Both also carry "pruning" and "memory": { "low_vram": bool, "peak_vram_mb": float }.
+        • Library hit             → same shapes (num_generated 0) + "library": { "hit", "matches" }
     """
     try:
         d = request.json
@@ -110,11 +277,16 @@ def stable_infer():
             return make_response(jsonify({"error": "Missing prompt"}), 400)
 
         negative_prompt = d.get("negative_prompt") or ""
-        steps = max(10, min(200, int(d.get("steps", 100))))
+        try:
+            preset, scheduler, steps = _sampling_options(d)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
         length = max(1.0, min(47.0, float(d.get("length", 30.0))))
         guidance_scale = float(d.get("guidance_scale", 7.0))
         eta = float(d.get("eta", 0.0))
         num_waveforms = max(1, min(4, int(d.get("num_waveforms_per_prompt", 3))))
+        prune_at_step = max(0, min(steps - 1, int(d.get("prune_at_step", 0))))
+        prune_keep = max(1, min(num_waveforms, int(d.get("prune_keep", 1))))
         output_format = d.get("output_format", "wav").lower()
         audio_mode = d.get("audio_mode", "sfx_ambient")
 
@@ -128,29 +300,18 @@ def stable_infer():
         
         
         
-        # === FINAL, WORKING, TESTED SAVE LOGIC (copy from here down) ===
-        raw_save_path = (d.get("save_path") or "").strip()
-        save_path = raw_save_path.rstrip("/\\ ")
+        save_path, save_dir, stem = resolve_save_target(d.get("save_path"))
         should_save = bool(save_path)
 
-        if should_save:
-            p = Path(save_path)
-            if "/" in save_path or "\\" in save_path or p.is_absolute():
-                save_dir = p.expanduser().resolve()
-                stem = p.stem.split(".")[0] if p.suffix else p.name
-                if p.suffix:
-                    save_dir = save_dir.parent
-            else:
-                save_dir = PROJECTS_OUTPUT / save_path
-                stem = save_path
-            save_dir.mkdir(parents=True, exist_ok=True)
-        else:
-            save_dir = None
-            stem = None
+        hit = library_lookup(d, prompt, "stable", save_dir, stem, length)
+        if hit is not None:
+            return jsonify(hit)
 
         print(f"PROMPT: {prompt}")
-        print(f"STEPS: {steps} | LENGTH: {length}s | FORMAT: {output_format.upper()}")
+        print(f"STEPS: {steps} | SCHEDULER: {scheduler} | PRESET: {preset or '-'} | LENGTH: {length}s | FORMAT: {output_format.upper()}")
         print(f"WAVEFORMS: {num_waveforms} | SAVE: {should_save} | PATH: '{save_path or 'play in browser'}'")
+        if prune_at_step:
+            print(f"PRUNE: at step {prune_at_step}/{steps} → keep {prune_keep}")
 
         results, sample_rate, final_seed = generate_audio(
             prompt=prompt,
@@ -160,87 +321,19 @@ def stable_infer():
             seed=seed,
             guidance_scale=guidance_scale,
             num_waveforms_per_prompt=num_waveforms,
-            eta=eta
+            eta=eta,
+            prune_at_step=prune_at_step,
+            prune_keep=prune_keep,
+            scheduler=scheduler,
         )
+        pruning = results[0].get("pruning", []) if results else []
+        memory = results[0].get("memory") if results else None
 
         print(f"Generated {len(results)} waveform(s) | Seed: {final_seed}")
-        processed_paths = []
-        audios = []
-
-        for i, res in enumerate(results):
-            score = res.get("score")
-            is_best = res.get("is_best", False)
-            score_str = f"{score:.4f}" if score is not None else "N/A"
-            best_marker = " (BEST)" if is_best else ""
-            print(f" Variant {i+1}: score={score_str}{best_marker}")
-
-            audio_np = res["audio_np"]
-            temp_wav = OUTPUT_DIR / f"stable_temp_{uuid.uuid4().hex}.wav"
-            sf.write(str(temp_wav), audio_np, sample_rate, subtype="PCM_16")
-
-            processed = stable_post_process(str(temp_wav), audio_mode=audio_mode)
-
-            final_path = processed
-            if output_format != "wav":
-                conv = Path(processed).with_suffix(f".{output_format}")
-                cmd = [
-                    str(FFMPEG_BIN / "ffmpeg.exe"),
-                    "-i", processed,
-                    *_ffmpeg_args(output_format),
-                    str(conv),
-                    "-y"
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    final_path = str(conv)
-                    os.remove(processed)
-                else:
-                    print(f"FFMPEG failed: {result.stderr}")
-
-            with open(final_path, "rb") as f:
-                b64 = base64.b64encode(f.read()).decode()
-
-            audios.append({
-                "audio_base64": b64,
-                "score": score,
-                "is_best": is_best
-            })
-            processed_paths.append(final_path)
-
-        # === SAVE OR PLAY IN BROWSER ===
-        if should_save:
-            saved_files = []
-            for i, src_path in enumerate(processed_paths):
-                info = audios[i]
-                is_best = info["is_best"]
-                suffix = " (BEST)" if is_best else f"_v{i+1}"
-                filename = f"{stem}{suffix}.{output_format}"
-                dest_path = save_dir / filename
-
-                saved_path, saved_rel = handle_save(src_path, str(dest_path), "stable")
-
-                saved_files.append({
-                    "filename": Path(saved_path).name,
-                    "rel_path": saved_rel,
-                    "score": info["score"],
-                    "is_best": is_best
-                })
-
-            # Clean up all temp files
-            for p in processed_paths:
-                Path(p).unlink(missing_ok=True)
-
-            return jsonify({
-                "saved_files": saved_files,
-                "num_generated": len(audios)
-            })
-
-        else:
-            # Play in browser – delete temps
-            for p in processed_paths:
-                Path(p).unlink(missing_ok=True)
-
-            return jsonify({"audios": audios})
+        audios, processed_paths = _process_variants(results, sample_rate, audio_mode, output_format)
+        payload = _finish_variants(audios, processed_paths, save_dir, stem, output_format, prompt,
+                                   d.get("device", "0"))
+        return jsonify({**payload, "pruning": pruning, "memory": memory})
 
     except StopIteration:
         return make_response(jsonify({"error": "Cancelled"}), 200)
@@ -251,4 +344,124 @@ def stable_infer():
     
     
     
-    
\ No newline at end of file
+    
+
+@bp.route("/stable_infer_batch", methods=["POST"])
+def stable_infer_batch():
+    """Generate a list of prompts in as few diffusion runs as possible.
+
+    Items sharing the same length are batched into one pipe() call (up to
+    max_batch waveforms), so a sound-pack of short one-shots costs a handful of
+    runs instead of one per prompt. Results are streamed as NDJSON, one line per
+    item as soon as its batch finishes – lines are NOT in request order, use "index".
+
+    Request JSON:
+        items (list)                  – Required. [{ "prompt", "negative_prompt", "length",
+                                        "seed", "name" }, ...]; only prompt is required.
+        preset / scheduler / steps    – As /stable_infer, shared by every item
+        guidance_scale (float)        – CFG scale, default 7.0
+        eta (float)                   – DDIM eta, default 0.0
+        num_waveforms_per_prompt (int)– Variants per item (1–4), default 1
+        max_batch (int)               – Max waveforms per diffusion run (1–32), default 8
+        output_format (str)           – "wav" (default), "mp3", "ogg", "flac", "m4a"
+        audio_mode (str)              – "sfx_impact" | "sfx_ambient" | "music"
+        save_path (str)               – If provided, each item is saved as <name> or <stem>_<NNN>
+        library_lookup / library_threshold – As /stable_infer, checked per item before batching
+
+    Stream (application/x-ndjson), one object per line:
+        { "index", "name", "prompt", "length", "seed", "memory", "saved_files" | "audios" }
+        (library hits come first, with "library" instead of "seed"/"memory")
+        { "error": "..." }            – on failure (stream then ends)
+        { "done": true, "count": N, "elapsed": s } – last line
+    """
+    d = request.json or {}
+    raw_items = d.get("items") or []
+    if not isinstance(raw_items, list) or not raw_items:
+        return make_response(jsonify({"error": "Missing items"}), 400)
+
+    items = []
+    for i, it in enumerate(raw_items):
+        prompt = (it.get("prompt") or "").strip()
+        if not prompt:
+            return make_response(jsonify({"error": f"Item {i} has no prompt"}), 400)
+        raw_seed = it.get("seed")
+        items.append({
+            "prompt": prompt,
+            "negative_prompt": it.get("negative_prompt") or "",
+            "length_sec": max(1.0, min(47.0, float(it.get("length", 10.0)))),
+            "seed": -1 if raw_seed in (-1, "-1", "null", None) else int(raw_seed),
+            "name": (it.get("name") or "").strip(),
+        })
+
+    try:
+        preset, scheduler, steps = _sampling_options(d)
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+    guidance_scale = float(d.get("guidance_scale", 7.0))
+    eta = float(d.get("eta", 0.0))
+    num_waveforms = max(1, min(4, int(d.get("num_waveforms_per_prompt", 1))))
+    max_batch = max(1, min(32, int(d.get("max_batch", 8))))
+    output_format = d.get("output_format", "wav").lower()
+    audio_mode = d.get("audio_mode", "sfx_ambient")
+    if audio_mode not in {"sfx_impact", "sfx_ambient", "music"}:
+        audio_mode = "sfx_ambient"
+
+    save_path, save_dir, stem = resolve_save_target(d.get("save_path"))
+
+    print("\n" + "="*60)
+    print(f"STABLE AUDIO BATCH: {len(items)} item(s) | {len({it['length_sec'] for it in items})} length group(s)")
+    print(f"STEPS: {steps} | SCHEDULER: {scheduler} | WAVEFORMS: {num_waveforms} | MAX BATCH: {max_batch} | PATH: '{save_path or 'play in browser'}'")
+    print("="*60)
+
+    def item_name(idx):
+        return items[idx]["name"] or f"{stem or 'stable'}_{idx + 1:03d}"
+
+    def generate():
+        start = time.time()
+        count = 0
+        pending = list(range(len(items)))
+        try:
+            for idx in list(pending):
+                item = items[idx]
+                hit = library_lookup(d, item["prompt"], "stable", save_dir, item_name(idx), item["length_sec"])
+                if hit is None:
+                    continue
+                pending.remove(idx)
+                count += 1
+                yield json.dumps({"index": idx, "name": item_name(idx), "prompt": item["prompt"],
+                                  "length": item["length_sec"], **hit}) + "\n"
+
+            batch = generate_audio_batch(
+                [items[i] for i in pending],
+                steps=steps,
+                guidance_scale=guidance_scale,
+                num_waveforms_per_prompt=num_waveforms,
+                eta=eta,
+                max_batch=max_batch,
+                scheduler=scheduler,
+            ) if pending else []
+            for n, results, sample_rate, seed in batch:
+                idx = pending[n]
+                item = items[idx]
+                name = item_name(idx)
+                print(f"[STABLE-BATCH] Item {idx + 1}/{len(items)} done | seed {seed}")
+                audios, processed_paths = _process_variants(results, sample_rate, audio_mode, output_format)
+                payload = _finish_variants(audios, processed_paths, save_dir, name, output_format, item["prompt"],
+                                           d.get("device", "0"))
+                count += 1
+                yield json.dumps({
+                    "index": idx,
+                    "name": name,
+                    "prompt": item["prompt"],
+                    "length": item["length_sec"],
+                    "seed": seed,
+                    "memory": results[0].get("memory") if results else None,
+                    **payload,
+                }) + "\n"
+        except Exception as e:
+            print(f"[ERROR]: {str(e)}\n{traceback.format_exc()}")
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+        yield json.dumps({"done": True, "count": count, "elapsed": round(time.time() - start, 2)}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
@@ -5,6 +5,7 @@ import logging
 from pathlib import Path
 from config import VOICE_DIR, resolve_device
 import models.whisper as whisper_mod
+from models.whisper_audio import load_audio
 import threading
 import gc
 
@@ -81,8 +82,8 @@ def voice_transcribe():
 
     # Now transcribe
     try:
-        result = whisper_mod.whisper_model.transcribe(
-            str(audio_path),
+        result = whisper_mod.transcribe(
+            load_audio(audio_path),
             word_timestamps=True,
             fp16=False,
             condition_on_previous_text=False,
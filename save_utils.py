@@ -1,8 +1,9 @@
 # save_utils.py
+import hashlib
 import os
 import uuid
 from pathlib import Path
-from config import OUTPUT_DIR
+from config import OUTPUT_DIR, PROJECTS_OUTPUT
 
 def handle_save(
     temp_path: str,
@@ -39,4 +40,38 @@ def handle_save(
     except ValueError:
         saved_rel = f"{final_path.drive}{final_path.as_posix()[1:]}"
 
-    return str(final_path), saved_rel
\ No newline at end of file
+    return str(final_path), saved_rel
+
+
+def resolve_save_target(raw_save_path) -> tuple[str, Path | None, str | None]:
+    """
+    Turn a request "save_path" into (save_path, save_dir, stem).
+
+    Bare names go under PROJECTS_OUTPUT/<name>/<name>...; anything with a
+    slash or drive is used as given (a file suffix becomes the stem).
+    Returns ("", None, None) when nothing should be saved.
+    """
+    save_path = "" if raw_save_path is None else str(raw_save_path).strip().rstrip("/\\ ")
+    if not save_path:
+        return "", None, None
+
+    p = Path(save_path)
+    if "/" in save_path or "\\" in save_path or p.is_absolute():
+        save_dir = p.expanduser().resolve()
+        stem = p.stem.split(".")[0] if p.suffix else p.name
+        if p.suffix:
+            save_dir = save_dir.parent
+    else:
+        save_dir = PROJECTS_OUTPUT / save_path
+        stem = save_path
+    save_dir.mkdir(parents=True, exist_ok=True)
+    return save_path, save_dir, stem
+
+
+def file_hash(path: str | Path) -> str:
+    """SHA-256 of a file's bytes – the content key of the latent / prompt-code caches."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()